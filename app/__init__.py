@@ -20,10 +20,9 @@
 Flask app entry point
 """
 
-from copy import copy
 from datetime import date, timedelta, datetime
 import hashlib
-from flask import request
+from flask import Response, request, stream_with_context
 from flask_api import FlaskAPI, status
 from flask_csv import send_csv
 from flask_sqlalchemy import SQLAlchemy
@@ -33,6 +32,14 @@ from instance.config import APP_CONFIG
 
 DB = SQLAlchemy()
 
+# Format of the calculation timestamps exchanged with clients in delta requests (since)
+WATERMARK_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+# Timeout in seconds of the values that only change when a model is invalidated, used with a
+# shared backend only, whose invalidations reach every worker. Finite, so that a value whose
+# invalidation was missed (e.g. cache server down) does not live forever
+LONG_CACHE_TIMEOUT = 7 * 24 * 3600
+
 
 def create_app(config_name):
     """ Creates an instance of Flask based on the config name as found in instance/config.py """
@@ -41,37 +48,141 @@ def create_app(config_name):
     from app.models_query_registry import get_public_flu_models, \
         get_model_scores_for_dates, get_model_function, get_default_flu_model, \
         get_default_flu_model_half_year, get_rate_thresholds, get_flu_models_for_ids, \
-        has_valid_token, set_model_display, get_all_flu_models, \
-        get_flu_model_for_model_region_and_dates, get_flu_model_for_model_id_and_dates
+        has_valid_token, set_model_display, get_all_flu_models, get_legacy_model_ids, \
+        get_flu_model_series_for_regions, get_default_flu_model_half_year_series, \
+        get_public_flu_model_catalogue, get_public_flu_model_ids, get_model_score_batches, \
+        get_score_matrix, get_changed_score_dates, DEFAULT_REGION
     from app.response_template_registry import build_root_plink_twlink_response, \
-        build_scores_response
+        build_scores_response, build_statistics_response
+    from app.statistics_registry import build_series_statistics, classify_threshold_bands, \
+        build_band_segments
+    from app.score_series import ScoreSeries
+    from app.cache import Cache, warm_up
+    from app.cache_backends import build_backend
+    from app.term_cache import TermCache
+    from app.export_registry import EXPORT_FORMATS, EXPORT_STREAMS, has_columnar_support
+    from app.snapshot import get_fresh_snapshot, send_snapshot, discard_snapshots, \
+        RENDER_ENVIRON_KEY
 
     app = FlaskAPI(__name__, instance_relative_config=True)
     app.config.from_object(APP_CONFIG[config_name])
     app.config.from_pyfile('config.ini', silent=True)
     DB.init_app(app)
 
+    cache = Cache(
+        timeout=app.config['CACHE_TIMEOUT'],
+        enabled=app.config['CACHE_ENABLED'],
+        lock_dir=app.config['CACHE_LOCK_DIR'],
+        backend=build_backend(app.config['CACHE_URL'], app.config['CACHE_MAX_ENTRIES'])
+    )
+    app.extensions['cache'] = cache
+    app.extensions['term_cache'] = TermCache()
+
+    @cache.on_invalidate
+    def discard_stale_snapshots(_):  # pylint: disable=unused-variable
+        if app.config['SNAPSHOT_DIR']:
+            discard_snapshots(app.config['SNAPSHOT_DIR'])
+
+    cached_catalogue = cache.memoize(get_public_flu_model_catalogue)
+    cached_rate_thresholds = cache.memoize(get_rate_thresholds)
+    cached_default_series = cache.memoize(get_default_flu_model_half_year_series)
+    cached_series_for_regions = cache.memoize(get_flu_model_series_for_regions, per_model=True)
+    # None falls back to CACHE_TIMEOUT
+    long_timeout = LONG_CACHE_TIMEOUT if cache.backend.shared else None
+    cached_legacy_model_ids = cache.memoize(get_legacy_model_ids, timeout=long_timeout)
+    cached_score_matrix = cache.memoize(get_score_matrix)
+
+    def get_twlink_model_data(model_id, start_date, end_date):
+        """ Returns the metadata and scores of a model linked from Twitter, or (None, None) """
+        region_data = get_flu_model_series_for_regions(
+            model_id, start_date, end_date, [DEFAULT_REGION]
+        )
+        return region_data.get(DEFAULT_REGION, (None, None))
+    # Tweeted links point at past date ranges, kept until the scores of the model change
+    cached_twlink_model_data = cache.memoize(
+        get_twlink_model_data, timeout=long_timeout, per_model=True
+    )
+
+    def get_model_statistics(model_id, start_date, end_date, region):
+        """ Returns the metadata and statistics of a model, or None if there are no scores """
+        region_data = get_flu_model_series_for_regions(model_id, start_date, end_date, [region])
+        if region not in region_data:
+            return None
+        mod_data, mod_scores = region_data[region]
+        statistics = build_series_statistics(
+            mod_scores, cached_rate_thresholds(mod_data['start_date'])
+        )
+        return mod_data, statistics
+    cached_model_statistics = cache.memoize(get_model_statistics, per_model=True)
+
+    def parse_since():
+        """ Returns the since parameter of a delta request as a datetime, None if absent """
+        if 'since' not in request.args:
+            return None
+        since = str(request.args.get('since'))
+        try:
+            return datetime.strptime(since, WATERMARK_FORMAT)
+        except ValueError:
+            return datetime.strptime(since, '%Y-%m-%dT%H:%M:%S')
+
+    def series_for_regions(  # pylint: disable=too-many-arguments
+            model_id, start_date, end_date, regions, smoothing, since
+    ):
+        """ Returns the series per region of a model and, for delta requests, the latest
+        calculation timestamp. With since, only the points affected by scores calculated
+        after since are kept. Changes are read before the scores, bypassing the cache, so
+        a score recalculated in between is sent on the next request instead of being lost
+        """
+        if since is None:
+            return cached_series_for_regions(
+                model_id, start_date, end_date, regions, smoothing
+            ), None
+        changed_dates, watermark = get_changed_score_dates(
+            model_id, start_date, end_date, regions, since
+        )
+        region_data = get_flu_model_series_for_regions(
+            model_id, start_date, end_date, regions, smoothing
+        )
+        half_window = ScoreSeries.half_window(smoothing)
+        return {
+            region: (mod_data, mod_scores.near(changed_dates.get(region, []), half_window))
+            for region, (mod_data, mod_scores) in region_data.items()
+        }, watermark
+
+    def add_threshold_bands(response, model_data, bands):
+        """ Adds the rate threshold band of each point (bands=points) or the band segments
+        of each model (bands=segments) to a response built from model_data
+        """
+        for model_item, (mod_data, mod_scores) in zip(response['model_data'], model_data):
+            point_bands = classify_threshold_bands(
+                mod_scores, cached_rate_thresholds(mod_data['start_date'])
+            )
+            if bands == 'segments':
+                model_item['band_segments'] = build_band_segments(mod_scores, point_bands)
+                continue
+            for point, band in zip(model_item['data_points'], point_bands):
+                point['band'] = band
+        return response
+
     @app.route('/', methods=['GET'])
     def root_route():  # pylint: disable=unused-variable
         """ Default route (/). Returns the last 30 days of model scores
         for the default flu model
         """
-        model_data, model_scores = get_default_flu_model_half_year()
-        flu_models = get_public_flu_models()
+        if app.config['SNAPSHOT_DIR'] and not request.environ.get(RENDER_ENVIRON_KEY):
+            snapshot = get_fresh_snapshot(
+                app.config['SNAPSHOT_DIR'], 'root', app.config['SNAPSHOT_MAX_AGE']
+            )
+            if snapshot:
+                return send_snapshot(snapshot, request)
+        # Set default smoothing to 3 day window
+        model_data, model_scores = cached_default_series(smoothing=3)
+        flu_models = cached_catalogue()
         if not model_data or not flu_models:
             return '', status.HTTP_204_NO_CONTENT
-        # Set default smoothing to 3 day window
-        smoothing = 3
-        smooth_scores = []
-        for mod_score in model_scores:
-            copied_score = copy(mod_score)
-            copied_score.score_value, copied_score.confidence_interval_upper, \
-                copied_score.confidence_interval_lower = mod_score.moving_avg(smoothing)
-            smooth_scores.append(copied_score)
-        model_scores = smooth_scores
         response = build_root_plink_twlink_response(
             model_list=flu_models,
-            rate_thresholds=get_rate_thresholds(model_data['start_date']),
+            rate_thresholds=cached_rate_thresholds(model_data['start_date']),
             model_data=[(model_data, model_scores)]
         )
         if response:
@@ -81,7 +192,7 @@ def create_app(config_name):
     @app.route('/models', methods=['GET'])
     def models_route():  # pylint: disable=unused-variable
         """ Returns a catalogue of public models """
-        flu_models = get_public_flu_models()
+        flu_models = cached_catalogue()
         if not flu_models:
             return '', status.HTTP_204_NO_CONTENT
         results = []
@@ -101,32 +212,48 @@ def create_app(config_name):
         resolution = str(request.args.get('resolution', 'day'))
         if resolution not in ['day', 'week']:
             return '', status.HTTP_400_BAD_REQUEST
+        bands = request.args.get('bands')
+        if bands not in [None, 'points', 'segments']:
+            return '', status.HTTP_400_BAD_REQUEST
+        max_points = int(request.args.get('maxPoints', 0))
+        if max_points < 0 or 0 < max_points < 3:
+            return '', status.HTTP_400_BAD_REQUEST
         smoothing = int(request.args.get('smoothing', 0))
+        regions = request.args.getlist('region') or [DEFAULT_REGION]
+        start_date = datetime.strptime(request.args.get('startDate'), '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.args.get('endDate'), '%Y-%m-%d').date()
+        try:
+            since = parse_since()
+        except ValueError:
+            return '', status.HTTP_400_BAD_REQUEST
         model_data = []
         start_dates = []
+        watermarks = [since]
         for model_id in request.args.getlist('id'):
-            mod_data, mod_scores = get_flu_model_for_model_id_and_dates(
-                model_id,
-                datetime.strptime(request.args.get('startDate'), '%Y-%m-%d').date(),
-                datetime.strptime(request.args.get('endDate'), '%Y-%m-%d').date()
+            region_data, watermark = series_for_regions(
+                model_id, start_date, end_date, regions, smoothing, since
             )
-            if resolution == 'week':
-                mod_scores = [s for s in mod_scores if s.score_date.weekday() == 6]
-            if smoothing != 0:
-                smooth_scores = []
-                for mod_score in mod_scores:
-                    copied_score = copy(mod_score)
-                    copied_score.score_value, copied_score.confidence_interval_upper, \
-                        copied_score.confidence_interval_lower = mod_score.moving_avg(smoothing)
-                    smooth_scores.append(copied_score)
-                mod_scores = smooth_scores
-            model_data.append((mod_data, mod_scores))
-            start_dates.append(mod_data['start_date'])
+            watermarks.append(watermark)
+            for region, (mod_data, mod_scores) in region_data.items():
+                if 'region' in request.args:
+                    mod_data = dict(mod_data, region=region)
+                if resolution == 'week':
+                    mod_scores = mod_scores.weekly()
+                if max_points:
+                    mod_scores = mod_scores.downsampled(max_points)
+                model_data.append((mod_data, mod_scores))
+                start_dates.append(mod_data['start_date'])
+        if not model_data:
+            return '', status.HTTP_204_NO_CONTENT
         response = build_root_plink_twlink_response(
-            model_list=get_public_flu_models(),
-            rate_thresholds=get_rate_thresholds(min(start_dates)),
+            model_list=cached_catalogue(),
+            rate_thresholds=cached_rate_thresholds(min(start_dates)),
             model_data=model_data
         )
+        if bands:
+            add_threshold_bands(response, model_data, bands)
+        if since is not None:
+            response['watermark'] = max(w for w in watermarks if w).strftime(WATERMARK_FORMAT)
         if response:
             return response, status.HTTP_200_OK
         return '', status.HTTP_204_NO_CONTENT
@@ -146,31 +273,76 @@ def create_app(config_name):
             return '', status.HTTP_400_BAD_REQUEST
         if resolution not in ['day', 'week']:
             return '', status.HTTP_400_BAD_REQUEST
+        bands = request.args.get('bands')
+        if bands not in [None, 'points', 'segments']:
+            return '', status.HTTP_400_BAD_REQUEST
+        max_points = int(request.args.get('maxPoints', 0))
+        if max_points < 0 or 0 < max_points < 3:
+            return '', status.HTTP_400_BAD_REQUEST
+        regions = request.args.getlist('region') or [DEFAULT_REGION]
+        try:
+            since = parse_since()
+        except ValueError:
+            return '', status.HTTP_400_BAD_REQUEST
         model_data = []
+        watermarks = [since]
         for model_id in request.args.getlist('id'):
-            mod_data, mod_scores = get_flu_model_for_model_id_and_dates(
+            region_data, watermark = series_for_regions(
                 model_id,
                 datetime.strptime(start_date, '%Y-%m-%d').date(),
-                datetime.strptime(end_date, '%Y-%m-%d').date()
+                datetime.strptime(end_date, '%Y-%m-%d').date(),
+                regions,
+                smoothing,
+                since
             )
-            if not mod_data or not mod_scores:
+            watermarks.append(watermark)
+            if not region_data:
                 return '', status.HTTP_204_NO_CONTENT
-            if resolution == 'week':
-                mod_scores = [s for s in mod_scores if s.score_date.weekday() == 6]
-            if smoothing != 0:
-                smooth_scores = []
-                for mod_score in mod_scores:
-                    copied_score = copy(mod_score)
-                    copied_score.score_value, copied_score.confidence_interval_upper, \
-                        copied_score.confidence_interval_lower = mod_score.moving_avg(smoothing)
-                    smooth_scores.append(copied_score)
-                mod_scores = smooth_scores
-            model_data.append((mod_data, mod_scores))
+            for region, (mod_data, mod_scores) in region_data.items():
+                if 'region' in request.args:
+                    mod_data = dict(mod_data, region=region)
+                if resolution == 'week':
+                    mod_scores = mod_scores.weekly()
+                if max_points:
+                    mod_scores = mod_scores.downsampled(max_points)
+                model_data.append((mod_data, mod_scores))
         response = build_scores_response(model_data=model_data)
+        if bands:
+            add_threshold_bands(response, model_data, bands)
+        if since is not None:
+            response['watermark'] = max(w for w in watermarks if w).strftime(WATERMARK_FORMAT)
         if response:
             return response, status.HTTP_200_OK
         return '', status.HTTP_204_NO_CONTENT
 
+    @app.route('/stats', methods=['GET'])
+    def statistics_route():  # pylint: disable=unused-variable
+        """ Returns summary statistics of the scores of one or more models for a start and
+        end date, instead of the scores themselves
+        """
+        if not request.args.getlist('id'):
+            return '', status.HTTP_400_BAD_REQUEST
+        def_end_date = date.today() - timedelta(days=2)
+        end_date = str(request.args.get('endDate', def_end_date.strftime('%Y-%m-%d')))
+        def_start_date = datetime.strptime(end_date, '%Y-%m-%d') - timedelta(days=30)
+        start_date = str(request.args.get('startDate', def_start_date.strftime('%Y-%m-%d')))
+        if start_date > end_date:
+            return '', status.HTTP_400_BAD_REQUEST
+        region = str(request.args.get('region', DEFAULT_REGION))
+        model_data = []
+        for model_id in request.args.getlist('id'):
+            model_statistics = cached_model_statistics(
+                int(model_id),
+                datetime.strptime(start_date, '%Y-%m-%d').date(),
+                datetime.strptime(end_date, '%Y-%m-%d').date(),
+                region
+            )
+            if model_statistics is not None:
+                model_data.append(model_statistics)
+        if not model_data:
+            return '', status.HTTP_204_NO_CONTENT
+        return build_statistics_response(model_data), status.HTTP_200_OK
+
     @app.route('/twlink', methods=['GET'])
     def twitterlink_route():  # pylint: disable=unused-variable
         """ Returns the scores and metadata for a model linked from Twitter """
@@ -179,24 +351,20 @@ def create_app(config_name):
             return '', status.HTTP_400_BAD_REQUEST
         start_date = datetime.strptime(request.args.get('start'), '%Y-%m-%d').date()
         end_date = datetime.strptime(request.args.get('end'), '%Y-%m-%d').date()
-        model_data, model_scores = None, None
         if 'id' in request.args:
             model_id = int(request.args.get('id'))
-            model_data, model_scores = get_flu_model_for_model_id_and_dates(
-                model_id, start_date, end_date
-            )
-        elif 'model_regions-0' in request.args:
+        else:
             legacy_id = str(request.args.get('model_regions-0'))
-            model_data, model_scores = get_flu_model_for_model_region_and_dates(
-                legacy_id, start_date, end_date
-            )
-        model_data_list = [(model_data, model_scores)]
-        if model_data_list == [(None, None)]:
-            model_data_list = []
+            model_id = cached_legacy_model_ids().get(legacy_id)
+        if model_id is None:
+            return '', status.HTTP_204_NO_CONTENT
+        model_data, model_scores = cached_twlink_model_data(model_id, start_date, end_date)
+        if model_data is None:
+            return '', status.HTTP_204_NO_CONTENT
         response = build_root_plink_twlink_response(
-            model_list=get_public_flu_models(),
-            rate_thresholds=get_rate_thresholds(model_data['start_date']),
-            model_data=model_data_list
+            model_list=cached_catalogue(),
+            rate_thresholds=cached_rate_thresholds(model_data['start_date']),
+            model_data=[(model_data, model_scores)]
         )
         if response:
             return response, status.HTTP_200_OK
@@ -215,75 +383,106 @@ def create_app(config_name):
         resolution = str(request.args.get('resolution', 'day'))
         if resolution not in ['day', 'week']:
             return '', status.HTTP_400_BAD_REQUEST
+        region = str(request.args.get('region', DEFAULT_REGION))
+        bands = request.args.get('bands')
+        if bands not in [None, 'points']:
+            return '', status.HTTP_400_BAD_REQUEST
         flu_models = get_flu_models_for_ids(ids)
-        if flu_models:
-            model_list = []
-            date_list = []
-            for model in flu_models:
-                model_function = get_model_function(model.id)
-                model_scores = get_model_scores_for_dates(
-                    model.id,
-                    datetime.strptime(start_date, '%Y-%m-%d').date(),
-                    datetime.strptime(end_date, '%Y-%m-%d').date()
-                )
-                if model_scores is None:
-                    return '', status.HTTP_204_NO_CONTENT
-                if resolution == 'week':
-                    model_scores = [s for s in model_scores if s.score_date.weekday() == 6]
-                model_datapoints = []
-                for model_score in model_scores:
-                    child = {
-                        'score_date': model_score.score_date.strftime('%Y-%m-%d'),
-                        'score_value': model_score.score_value
-                    }
-                    if model_function.has_confidence_interval:
-                        confidence_interval = {
-                            'confidence_interval_upper': model_score.confidence_interval_upper,
-                            'confidence_interval_lower': model_score.confidence_interval_lower
-                        }
-                        child.update(confidence_interval)
-                    model_datapoints.append(child)
-                model_list.append({
-                    'name': model.name,
-                    'datapoints': model_datapoints
-                })
-                date_list += [
-                    d.score_date.strftime('%Y-%m-%d')
-                    for d in model_scores if d.score_date not in date_list
-                ]
-            if not model_list:
-                return '', status.HTTP_204_NO_CONTENT
-            datapoints = []
-            for score_date in date_list:
-                point = dict()
-                point['score_date'] = score_date
-                for model in model_list:
-                    score_key = 'score_%s' % model['name']
-                    # TODO: should be in try/catch
-                    score_value = next(
-                        s['score_value']
-                        for s in model['datapoints'] if s['score_date'] == score_date
-                    )
-                    point[score_key] = score_value
-                    if 'confidence_interval_upper' in model:
-                        conf_upper_key = 'confidence_upper_%s' % model['name']
-                        conf_lower_key = 'confidence_lower_%s' % model['name']
-                        # TODO: should be in try/catch
-                        conf_upper_val = next(
-                            s['confidence_interval_upper']
-                            for s in model['datapoints'] if s['score_date'] == score_date
-                        )
-                        conf_lower_val = next(
-                            s['confidence_interval_lower']
-                            for s in model['datapoints'] if s['score_date'] == score_date
-                        )
-                        point[conf_upper_key] = conf_upper_val
-                        point[conf_lower_key] = conf_lower_val
-                datapoints.append(point)
-            fields = datapoints[0].keys()
-            filename = 'RawScores-%d.csv' % round(datetime.now().timestamp() * 1000)
-            return send_csv(datapoints, filename=filename, fields=fields), status.HTTP_200_OK
-        return '', status.HTTP_204_NO_CONTENT
+        if not flu_models:
+            return '', status.HTTP_204_NO_CONTENT
+        matrix = cached_score_matrix(
+            [model.id for model in flu_models],
+            datetime.strptime(start_date, '%Y-%m-%d').date(),
+            datetime.strptime(end_date, '%Y-%m-%d').date(),
+            region
+        )
+        if resolution == 'week':
+            matrix = matrix.weekly()
+        if not matrix:
+            return '', status.HTTP_204_NO_CONTENT
+        columns = {'score_date': [str(d) for d in matrix.dates]}
+        for model, row in zip(flu_models, matrix.rows()):
+            columns['score_%s' % model.name] = row
+            if bands:
+                model_series = matrix.series(model.id)
+                band_by_date = dict(zip(model_series.dates, classify_threshold_bands(
+                    model_series, cached_rate_thresholds(model_series.dates[-1].astype(object))
+                ))) if model_series else {}
+                columns['band_%s' % model.name] = [band_by_date.get(d) for d in matrix.dates]
+        datapoints = [dict(zip(columns, values)) for values in zip(*columns.values())]
+        filename = 'RawScores-%d.csv' % round(datetime.now().timestamp() * 1000)
+        return send_csv(datapoints, filename=filename, fields=list(columns)), status.HTTP_200_OK
+
+    @app.route('/matrix', methods=['GET'])
+    def matrix_route():  # pylint: disable=unused-variable
+        """ Returns the scores of several public models for a start and end date aligned on
+        a single date axis, as a models x dates matrix with null for the gaps
+        """
+        if not request.args.getlist('id'):
+            return '', status.HTTP_400_BAD_REQUEST
+        def_end_date = date.today() - timedelta(days=2)
+        end_date = str(request.args.get('endDate', def_end_date.strftime('%Y-%m-%d')))
+        def_start_date = datetime.strptime(end_date, '%Y-%m-%d') - timedelta(days=30)
+        start_date = str(request.args.get('startDate', def_start_date.strftime('%Y-%m-%d')))
+        if start_date > end_date:
+            return '', status.HTTP_400_BAD_REQUEST
+        resolution = str(request.args.get('resolution', 'day'))
+        if resolution not in ['day', 'week']:
+            return '', status.HTTP_400_BAD_REQUEST
+        public_ids = get_public_flu_model_ids([int(i) for i in request.args.getlist('id')])
+        model_ids = [int(i) for i in request.args.getlist('id') if int(i) in public_ids]
+        if not model_ids:
+            return '', status.HTTP_204_NO_CONTENT
+        matrix = cached_score_matrix(
+            model_ids,
+            datetime.strptime(start_date, '%Y-%m-%d').date(),
+            datetime.strptime(end_date, '%Y-%m-%d').date(),
+            str(request.args.get('region', DEFAULT_REGION))
+        )
+        if resolution == 'week':
+            matrix = matrix.weekly()
+        if not matrix:
+            return '', status.HTTP_204_NO_CONTENT
+        model_names = {model.id: model.name for model in cached_catalogue()}
+        return {
+            'models': [{'id': i, 'name': model_names.get(i)} for i in matrix.model_ids],
+            'dates': [str(d) for d in matrix.dates],
+            'values': matrix.rows()
+        }, status.HTTP_200_OK
+
+    @app.route('/export', methods=['GET'])
+    def export_route():  # pylint: disable=unused-variable
+        """ Streams the score history of one or more public models as NDJSON, Arrow IPC
+        or Parquet (the latter two need pyarrow). startDate and endDate are optional and
+        default to the whole history
+        """
+        export_format = str(request.args.get('format', 'ndjson'))
+        if not request.args.getlist('id') or export_format not in EXPORT_FORMATS:
+            return '', status.HTTP_400_BAD_REQUEST
+        if export_format != 'ndjson' and not has_columnar_support():
+            return 'Format not available, pyarrow is not installed', status.HTTP_400_BAD_REQUEST
+        start_date, end_date = None, None
+        if 'startDate' in request.args:
+            start_date = datetime.strptime(request.args.get('startDate'), '%Y-%m-%d').date()
+        if 'endDate' in request.args:
+            end_date = datetime.strptime(request.args.get('endDate'), '%Y-%m-%d').date()
+        model_ids = get_public_flu_model_ids([int(i) for i in request.args.getlist('id')])
+        if not model_ids:
+            return '', status.HTTP_204_NO_CONTENT
+        batches = get_model_score_batches(
+            model_ids,
+            str(request.args.get('region', DEFAULT_REGION)),
+            app.config['EXPORT_BATCH_SIZE'],
+            start_date,
+            end_date
+        )
+        mimetype, extension = EXPORT_FORMATS[export_format]
+        filename = 'ModelScores-%d.%s' % (round(datetime.now().timestamp() * 1000), extension)
+        return Response(
+            stream_with_context(EXPORT_STREAMS[export_format](batches)),
+            mimetype=mimetype,
+            headers={'Content-Disposition': 'attachment; filename=%s' % filename}
+        )
 
     @app.route('/config', methods=['POST'])
     def config_route():  # pylint: disable=unused-variable
@@ -299,6 +498,7 @@ def create_app(config_name):
                 return 'Parameters missing', status.HTTP_400_BAD_REQUEST
             if set_model_display(int(request.form['model_id']),
                                  request.form['is_displayed'] == 'True'):
+                cache.invalidate(int(request.form['model_id']))
                 return '', status.HTTP_200_OK
         return '', status.HTTP_400_BAD_REQUEST
 
@@ -325,4 +525,7 @@ def create_app(config_name):
             return results, status.HTTP_200_OK
         return '', status.HTTP_400_BAD_REQUEST
 
+    if app.config['CACHE_WARMUP']:
+        warm_up(app)
+
     return app
@@ -0,0 +1,249 @@
+# i-sense flu api: REST API, and data processors for the i-sense flu service from UCL.
+# (c) 2019, UCL <https://www.ucl.ac.uk/
+#
+# This file is part of i-sense flu api
+#
+# i-sense flu api is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# i-sense flu api is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with i-sense flu api.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+ Cache for the results of the data access functions used by the routes, kept in the
+ process or shared between workers and nodes depending on the backend. Cached values
+ are shared between requests and must not be modified by the callers. Concurrent misses
+ on the same key are coalesced so the value is computed once
+"""
+
+import hashlib
+import os
+from contextlib import contextmanager
+from functools import wraps
+from logging import INFO, WARNING, log
+from threading import Event, Lock
+from typing import Any, Callable, Hashable, Iterator, Tuple
+
+from flask_api import FlaskAPI
+
+from app import DB
+from app.cache_backends import MemoryBackend
+
+_MISSING = object()
+
+_ALL_GENERATION = ('generation', '*')
+_ANY_MODEL_GENERATION = ('generation', 'models')
+
+# Number of lock files in lock_dir. Keys share them by hash, so the directory does not grow
+# with the number of keys ever missed
+_LOCK_FILES = 64
+
+
+def _generation_key(model_id: Any) -> Tuple:
+    return ('generation', str(model_id))
+
+
+def make_key(name: str, args: Tuple, kwargs: dict) -> Tuple:
+    """
+    Builds a hashable cache key from a function name and its arguments. Lists are
+    converted into tuples
+    """
+    def normalise(value):
+        if isinstance(value, (list, tuple)):
+            return tuple(normalise(v) for v in value)
+        return value
+    return (name,) \
+        + tuple(normalise(a) for a in args) \
+        + tuple((k, normalise(v)) for k, v in sorted(kwargs.items()))
+
+
+class _Flight:
+    """ Computation of a missing value that other threads asking for the same key wait on """
+
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = Event()
+        self.value = None
+        self.error = None
+
+
+class Cache:
+    """
+    Cache of values that expire after a timeout in seconds, stored in a backend from
+    app.cache_backends (in the process by default). Keys are namespaced by generation
+    counters: invalidating a model orphans the values cached for it and the values not
+    tied to a model, while values of other models stay warm. When lock_dir is set,
+    misses are also serialised across processes with a file lock shared by a hash of the key
+    """
+
+    def __init__(
+            self,
+            timeout: int = 3600,
+            max_entries: int = 1024,
+            enabled: bool = True,
+            lock_dir: str = '',
+            backend=None
+    ):
+        self.timeout = timeout
+        self.enabled = enabled
+        self.lock_dir = lock_dir
+        self.backend = backend if backend is not None else MemoryBackend(max_entries)
+        self._invalidation_hooks = []
+        self._flights = {}
+        self._lock = Lock()
+
+    def get(self, key: Hashable, default: Any = None, model_id: Any = None) -> Any:
+        """ Returns the value stored under key or default if missing or expired """
+        return self.backend.get(self._namespaced(key, model_id), default)
+
+    def set(self, key: Hashable, value: Any, timeout: int = None, model_id: Any = None):
+        """ Stores a value under key. A timeout of 0 keeps the value until it is evicted """
+        if self.enabled:
+            self._store(self._namespaced(key, model_id), value, timeout)
+
+    def delete(self, key: Hashable, model_id: Any = None):
+        """ Removes the value stored under key """
+        self.backend.delete(self._namespaced(key, model_id))
+
+    def clear(self):
+        """ Invalidates all values. Shared backends are not flushed, values left behind expire """
+        self.backend.incr(_ALL_GENERATION)
+        self.backend.clear()
+
+    def invalidate(self, model_id: Any):
+        """
+        Invalidates the values cached for a model and the values not tied to a model, then
+        calls the functions registered with on_invalidate
+        """
+        self.backend.incr(_generation_key(model_id))
+        self.backend.incr(_ANY_MODEL_GENERATION)
+        for hook in self._invalidation_hooks:
+            hook(model_id)
+
+    def on_invalidate(self, hook: Callable[[Any], None]) -> Callable[[Any], None]:
+        """ Registers a function called with the model id each time a model is invalidated """
+        self._invalidation_hooks.append(hook)
+        return hook
+
+    def get_or_set(
+            self,
+            key: Hashable,
+            compute: Callable[[], Any],
+            timeout: int = None,
+            model_id: Any = None
+    ) -> Any:
+        """
+        Returns the value stored under key, computing and storing it if missing. Only one
+        thread computes a missing value, the others asking for the same key in the meantime
+        wait for it and get the same value (or exception)
+        """
+        key = self._namespaced(key, model_id)
+        value = self.backend.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        with self._lock:
+            flight = self._flights.get(key)
+            is_leader = flight is None
+            if is_leader:
+                flight = self._flights[key] = _Flight()
+        if not is_leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            with self._process_lock(key):
+                # Another process holding the lock may have stored the value meanwhile
+                value = self.backend.get(key, _MISSING)
+                if value is _MISSING:
+                    value = compute()
+                    if self.enabled:
+                        self._store(key, value, timeout)
+            flight.value = value
+            return value
+        except Exception as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def memoize(self, func: Callable, timeout: int = None, per_model: bool = False) -> Callable:
+        """
+        Wraps a function so its results are cached by function name and arguments. With
+        per_model, the first argument is the model id the results belong to
+        """
+        if not self.enabled:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = make_key(func.__name__, args, kwargs)
+            model_id = args[0] if per_model else None
+            return self.get_or_set(key, lambda: func(*args, **kwargs), timeout, model_id)
+        return wrapper
+
+    def _namespaced(self, key: Hashable, model_id: Any) -> Tuple:
+        """ Prefixes key with the current generations of the whole cache and of the model """
+        scope = _ANY_MODEL_GENERATION if model_id is None else _generation_key(model_id)
+        return tuple(self.backend.get_counters([_ALL_GENERATION, scope])) + (key,)
+
+    def _store(self, key: Tuple, value: Any, timeout: int = None):
+        self.backend.set(key, value, self.timeout if timeout is None else timeout)
+
+    @contextmanager
+    def _process_lock(self, key: Hashable) -> Iterator[None]:
+        """ Holds an exclusive lock on one of the lock files chosen by key, if lock_dir is set """
+        if not self.lock_dir:
+            yield
+            return
+        import fcntl  # pylint: disable=import-outside-toplevel
+        digest = hashlib.sha1(repr(key).encode('utf-8')).digest()
+        slot = int.from_bytes(digest[:4], 'big') % _LOCK_FILES
+        path = os.path.join(self.lock_dir, 'cache-%02d.lock' % slot)
+        with open(path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def close(self):
+        """ Releases the connections of the backend, they are reopened on next use """
+        self.backend.close()
+
+    def __len__(self):
+        return len(self.backend)
+
+
+def warm_up(app: FlaskAPI):
+    """
+    Requests the default view, the model catalogue and the paths listed in
+    CACHE_WARMUP_QUERIES so their data is cached before the app accepts traffic. When
+    gunicorn runs with preload_app, workers forked afterwards share the warmed cache.
+    Database and cache server connections opened here are closed so that they are not
+    shared with the workers
+    """
+    paths = ['/', '/models'] + list(app.config.get('CACHE_WARMUP_QUERIES', []))
+    with app.test_client() as client:
+        for path in paths:
+            try:
+                response = client.get(path)
+            except Exception as error:  # pylint: disable=broad-except
+                log(WARNING, 'Cache warm-up of %s failed: %s', path, error)
+                continue
+            if response.status_code >= 400:
+                log(WARNING, 'Cache warm-up of %s returned %d', path, response.status_code)
+    with app.app_context():
+        DB.engine.dispose()
+    app.extensions['cache'].close()
+    log(INFO, 'Cache warmed up with %d paths', len(paths))
@@ -0,0 +1,259 @@
+# i-sense flu api: REST API, and data processors for the i-sense flu service from UCL.
+# (c) 2019, UCL <https://www.ucl.ac.uk/
+#
+# This file is part of i-sense flu api
+#
+# i-sense flu api is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# i-sense flu api is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with i-sense flu api.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+ Storage backends for app.cache.Cache. MemoryBackend keeps the values in the process,
+ RedisBackend shares them between the workers and nodes through a server speaking the
+ Redis protocol (RESP). A stand-in for such a server is in app.local_servers
+"""
+
+import hashlib
+import os
+import pickle
+import socket
+import time
+from logging import WARNING, log
+from threading import Lock, local
+from typing import Any, Hashable, List
+from urllib.parse import urlparse
+
+
+class CacheBackendError(Exception):
+    """ Error reply sent by the cache server """
+
+
+class MemoryBackend:
+    """
+    Thread-safe dictionary of values that expire after a timeout in seconds. Once
+    max_entries is reached the oldest entry is evicted. Counters are kept apart and are
+    never evicted
+    """
+
+    shared = False
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._counters = {}
+        self._lock = Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """ Returns the value stored under key or default if missing or expired """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+            return value
+
+    def set(self, key: Hashable, value: Any, timeout: int):
+        """ Stores a value under key. A timeout of 0 keeps the value until it is evicted """
+        expires_at = time.monotonic() + timeout if timeout else None
+        with self._lock:
+            self._entries.pop(key, None)
+            while self._entries and len(self._entries) >= self.max_entries:
+                del self._entries[next(iter(self._entries))]
+            self._entries[key] = (expires_at, value)
+
+    def delete(self, key: Hashable):
+        """ Removes the value stored under key """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def get_counters(self, keys: List[Hashable]) -> List[int]:
+        """ Returns the current value of each counter, 0 if it was never incremented """
+        with self._lock:
+            return [self._counters.get(key, 0) for key in keys]
+
+    def incr(self, key: Hashable) -> int:
+        """ Increments a counter and returns its new value """
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def clear(self):
+        """ Removes all values and counters """
+        with self._lock:
+            self._entries.clear()
+            self._counters.clear()
+
+    def close(self):
+        """ Nothing to release, values live in the process """
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    """
+    Stores pickled values on a server speaking the Redis protocol, given as a URL such as
+    redis://:password@host:6379/0. Keys are hashed and prefixed. Connection errors are
+    logged and treated as cache misses so the routes fall back to the database. Counters
+    have no expiry, the server should evict keys with a volatile-* policy. Connections are
+    opened per thread and per process, a forked worker never reuses the socket of its parent
+    """
+
+    shared = True
+
+    def __init__(self, url: str, prefix: str = 'isenseflu:', socket_timeout: float = 1.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.strip('/') or 0)
+        self.prefix = prefix
+        self.socket_timeout = socket_timeout
+        self._local = local()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """ Returns the value stored under key or default if missing or unreachable """
+        try:
+            data = self.execute('GET', self._key(key))
+        except (OSError, CacheBackendError) as error:
+            log(WARNING, 'Cache server unavailable: %s', error)
+            return default
+        return default if data is None else pickle.loads(data)
+
+    def set(self, key: Hashable, value: Any, timeout: int):
+        """ Stores a value under key. A timeout of 0 keeps the value until it is evicted """
+        args = ['SET', self._key(key), pickle.dumps(value, pickle.HIGHEST_PROTOCOL)]
+        if timeout:
+            args += ['EX', int(timeout)]
+        try:
+            self.execute(*args)
+        except (OSError, CacheBackendError) as error:
+            log(WARNING, 'Cache server unavailable: %s', error)
+
+    def delete(self, key: Hashable):
+        """ Removes the value stored under key, if the server is reachable """
+        try:
+            self.execute('DEL', self._key(key))
+        except (OSError, CacheBackendError) as error:
+            log(WARNING, 'Cache server unavailable: %s', error)
+
+    def get_counters(self, keys: List[Hashable]) -> List[int]:
+        """ Returns the current value of each counter, 0 if missing or unreachable """
+        try:
+            values = self.execute('MGET', *[self._key(key) for key in keys])
+        except (OSError, CacheBackendError) as error:
+            log(WARNING, 'Cache server unavailable: %s', error)
+            return [0] * len(keys)
+        return [int(value or 0) for value in values]
+
+    def incr(self, key: Hashable) -> int:
+        """ Increments a counter and returns its new value, 0 if the server is unreachable """
+        try:
+            return self.execute('INCR', self._key(key))
+        except (OSError, CacheBackendError) as error:
+            log(WARNING, 'Cache server unavailable: %s', error)
+            return 0
+
+    def clear(self):
+        """ Shared values are not flushed, app.cache.Cache orphans them instead """
+
+    def close(self):
+        """ Closes the connection of the current thread """
+        self._disconnect()
+
+    def __len__(self):
+        # The server is shared with other applications and workers, its keys are not counted
+        return 0
+
+    def _key(self, key: Hashable) -> str:
+        return self.prefix + hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+    def execute(self, *args) -> Any:
+        """ Sends a command and returns the reply, reconnecting once if the connection dropped """
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                connection.sendall(_encode_command(args))
+                return read_reply(self._local.reader)
+            except OSError:
+                self._disconnect()
+                if attempt:
+                    raise
+        return None
+
+    def _connection(self) -> socket.socket:
+        """ Connection of the current thread, opened on first use """
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid != os.getpid():
+            # Inherited from the parent process: closing our copy leaves the parent's open
+            self._disconnect()
+            connection = None
+        if connection is None:
+            connection = socket.create_connection((self.host, self.port), self.socket_timeout)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+            self._local.reader = connection.makefile('rb')
+            if self.password:
+                self.execute('AUTH', self.password)
+            if self.db:
+                self.execute('SELECT', self.db)
+        return connection
+
+    def _disconnect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            self._local.reader.close()
+            connection.close()
+        self._local.connection = None
+
+
+def build_backend(url: str, max_entries: int):
+    """ Returns a RedisBackend for redis:// URLs and a MemoryBackend otherwise """
+    if url.startswith('redis://'):
+        return RedisBackend(url)
+    return MemoryBackend(max_entries)
+
+
+def _encode_command(args) -> bytes:
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode('utf-8')
+        parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+    return b''.join(parts)
+
+
+def read_reply(reader) -> Any:
+    """ Reads one value encoded in the Redis protocol, a reply or a command """
+    line = reader.readline()
+    if not line:
+        raise ConnectionError('Connection closed by the cache server')
+    kind, body = line[:1], line[1:-2]
+    if kind == b'+':
+        return body.decode('utf-8')
+    if kind == b'-':
+        raise CacheBackendError(body.decode('utf-8'))
+    if kind == b':':
+        return int(body)
+    if kind == b'$':
+        if int(body) < 0:
+            return None
+        data = reader.read(int(body) + 2)
+        return data[:-2]
+    if kind == b'*':
+        if int(body) < 0:
+            return None
+        return [read_reply(reader) for _ in range(int(body))]
+    raise CacheBackendError('Unexpected reply %r' % line)
@@ -0,0 +1,144 @@
+# i-sense flu api: REST API, and data processors for the i-sense flu service from UCL.
+# (c) 2019, UCL <https://www.ucl.ac.uk/
+#
+# This file is part of i-sense flu api
+#
+# i-sense flu api is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# i-sense flu api is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with i-sense flu api.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+ Registry of serialisation functions used to stream bulk exports of model scores.
+ Each function consumes batches of rows as returned by
+ app.models_query_registry.get_model_score_batches and yields chunks of bytes.
+ The Arrow and Parquet formats require pyarrow, which is imported when first used
+"""
+
+import io
+import json
+from typing import Iterator, List, Tuple
+
+EXPORT_COLUMNS = [
+    'model_id',
+    'region',
+    'score_date',
+    'score_value',
+    'confidence_interval_lower',
+    'confidence_interval_upper'
+]
+
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet')
+}
+
+_COMPRESSION = 'zstd'
+
+
+def has_columnar_support() -> bool:
+    """ Checks whether pyarrow is available for the Arrow and Parquet formats """
+    try:
+        import pyarrow  # pylint: disable=unused-import,import-outside-toplevel
+    except ImportError:
+        return False
+    return True
+
+
+def ndjson_stream(batches: Iterator[List[Tuple]]) -> Iterator[bytes]:
+    """ Serialises each row as a JSON object on its own line, one chunk per batch """
+    for rows in batches:
+        lines = []
+        for row in rows:
+            point = dict(zip(EXPORT_COLUMNS, row))
+            point['score_date'] = point['score_date'].strftime('%Y-%m-%d')
+            lines.append(json.dumps(point))
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def arrow_stream(batches: Iterator[List[Tuple]]) -> Iterator[bytes]:
+    """ Serialises the rows in the Arrow IPC streaming format, one record batch per batch """
+    import pyarrow as pa  # pylint: disable=import-outside-toplevel
+    sink = _ChunkSink()
+    options = pa.ipc.IpcWriteOptions(compression=_COMPRESSION)
+    with pa.ipc.new_stream(sink, _schema(), options=options) as writer:
+        for rows in batches:
+            writer.write_batch(_record_batch(rows))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def parquet_stream(batches: Iterator[List[Tuple]]) -> Iterator[bytes]:
+    """ Serialises the rows as a compressed Parquet file, one row group per batch """
+    import pyarrow.parquet as pq  # pylint: disable=import-outside-toplevel
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, _schema(), compression=_COMPRESSION) as writer:
+        for rows in batches:
+            writer.write_batch(_record_batch(rows))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def _schema():
+    import pyarrow as pa  # pylint: disable=import-outside-toplevel
+    return pa.schema([
+        ('model_id', pa.int32()),
+        ('region', pa.string()),
+        ('score_date', pa.date32()),
+        ('score_value', pa.float64()),
+        ('confidence_interval_lower', pa.float64()),
+        ('confidence_interval_upper', pa.float64())
+    ])
+
+
+def _record_batch(rows: List[Tuple]):
+    import pyarrow as pa  # pylint: disable=import-outside-toplevel
+    schema = _schema()
+    columns = list(zip(*rows))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(columns[idx], type=field.type) for idx, field in enumerate(schema)],
+        schema=schema
+    )
+
+
+class _ChunkSink(io.RawIOBase):
+    """ Write-only file object that buffers what the writers produce until drained """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        """ Returns and forgets the bytes written since the last call """
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+EXPORT_STREAMS = {
+    'ndjson': ndjson_stream,
+    'arrow': arrow_stream,
+    'parquet': parquet_stream
+}
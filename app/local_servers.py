@@ -0,0 +1,157 @@
+# i-sense flu api: REST API, and data processors for the i-sense flu service from UCL.
+# (c) 2019, UCL <https://www.ucl.ac.uk/
+#
+# This file is part of i-sense flu api
+#
+# i-sense flu api is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# i-sense flu api is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with i-sense flu api.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+ Local stand-ins for the servers the app and the scheduler talk to, to be used in tests,
+ benchmarks and local development. LocalRespServer speaks the Redis protocol for
+ app.cache_backends.RedisBackend
+"""
+
+import socketserver
+import time
+from threading import Lock, Thread
+from typing import List, Optional
+
+from app.cache_backends import read_reply
+
+
+class LocalServer:
+    """
+    Base of the local stand-in servers. Subclasses set _server to a socketserver server,
+    which is served from a background thread between start and stop, or within a with block
+    """
+
+    _server = None
+    _thread = None
+
+    def start(self):
+        """ Serves requests from a background thread """
+        self._thread = Thread(
+            target=self._server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """ Stops serving and closes the listening socket """
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class LocalRespServer(LocalServer):
+    """
+    Minimal in-memory server speaking the Redis protocol, with the commands used by
+    RedisBackend. It listens on localhost, on a free port unless one is given
+    """
+
+    def __init__(self, port: int = 0):
+        self._data = {}
+        self._lock = Lock()
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            """ Serves the commands of one connection """
+            def handle(self):
+                while True:
+                    try:
+                        args = read_reply(self.rfile)
+                    except (ConnectionError, ValueError):
+                        return
+                    self.wfile.write(server.reply(args))
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self._server = socketserver.ThreadingTCPServer(('127.0.0.1', port), Handler)
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        """ URL to pass to RedisBackend """
+        return 'redis://127.0.0.1:%d/0' % self._server.server_address[1]
+
+    def reply(self, args: List[bytes]) -> bytes:
+        """ Runs a command and returns the encoded reply """
+        command = args[0].decode('utf-8').upper()
+        handler = getattr(self, '_cmd_' + command.lower(), None)
+        if handler is None:
+            return b"-ERR unknown command '%s'\r\n" % command.encode('utf-8')
+        with self._lock:
+            return _encode_reply(handler(*args[1:]))
+
+    def _value(self, key: bytes) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[0] is not None and entry[0] <= time.monotonic():
+            del self._data[key]
+            return None
+        return entry[1]
+
+    def _cmd_ping(self):
+        return 'PONG'
+
+    def _cmd_auth(self, *_):
+        return 'OK'
+
+    def _cmd_select(self, _):
+        return 'OK'
+
+    def _cmd_get(self, key):
+        return self._value(key)
+
+    def _cmd_mget(self, *keys):
+        return [self._value(key) for key in keys]
+
+    def _cmd_set(self, key, value, *options):
+        expires_at = None
+        if options and options[0].upper() == b'EX':
+            expires_at = time.monotonic() + int(options[1])
+        self._data[key] = (expires_at, value)
+        return 'OK'
+
+    def _cmd_del(self, *keys):
+        return sum(1 for key in keys if self._data.pop(key, None) is not None)
+
+    def _cmd_incr(self, key):
+        value = int(self._value(key) or 0) + 1
+        self._data[key] = (None, str(value).encode('utf-8'))
+        return value
+
+    def _cmd_dbsize(self):
+        return len(self._data)
+
+    def _cmd_flushdb(self):
+        self._data.clear()
+        return 'OK'
+
+
+def _encode_reply(value) -> bytes:
+    if value is None:
+        return b'$-1\r\n'
+    if isinstance(value, str):
+        return b'+%s\r\n' % value.encode('utf-8')
+    if isinstance(value, int):
+        return b':%d\r\n' % value
+    if isinstance(value, bytes):
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+    return b'*%d\r\n' % len(value) + b''.join(_encode_reply(v) for v in value)
@@ -22,6 +22,8 @@ Data model used by the app (SQLAlchemy is used as ORM)
 
 from datetime import date, timedelta
 
+from sqlalchemy import Index
+
 from app import DB
 
 
@@ -38,7 +40,7 @@ class FluModel(DB.Model):
     is_public = DB.Column(DB.Boolean, nullable=False)
     is_displayed = DB.Column(DB.Boolean, nullable=False)
     calculation_parameters = DB.Column(DB.Text, nullable=True)
-    model_region_id = DB.Column(DB.Text, nullable=True)
+    model_region_id = DB.Column(DB.Text, nullable=True, index=True)
     model_scores = DB.relationship('ModelScore')
     model_function = DB.relationship('ModelFunction')
 
@@ -101,6 +103,11 @@ class ModelScore(DB.Model):
     ORM Model representing a data point of a model score
     """
 
+    __table_args__ = (
+        Index('ix_model_score_model_region_date', 'flu_model_id', 'region', 'score_date'),
+        Index('ix_model_score_model_calculation', 'flu_model_id', 'calculation_timestamp'),
+    )
+
     calculation_timestamp = DB.Column(DB.DateTime, default=DB.func.current_timestamp())
     score_date = DB.Column(DB.Date, primary_key=True)
     region = DB.Column(DB.Text, primary_key=True)
@@ -253,3 +260,30 @@ class TokenInfo(DB.Model):  # pylint: disable=too-few-public-methods
         """ Convenience method to save current instance """
         DB.session.add(self)
         DB.session.commit()
+
+
+class GoogleApiUsage(DB.Model):  # pylint: disable=too-few-public-methods
+    """
+    ORM Model representing the calls made to Google API with an API key on a day, and the
+    number of lines (terms times days) requested. The key is stored as a digest
+    """
+
+    key_id = DB.Column(DB.Text, primary_key=True)
+    usage_date = DB.Column(DB.Date, primary_key=True)
+    calls = DB.Column(DB.Integer, nullable=False, default=0)
+    lines = DB.Column(DB.Integer, nullable=False, default=0)
+    is_exhausted = DB.Column(DB.Boolean, nullable=False, default=False)
+
+
+class GoogleBatchCheckpoint(DB.Model):  # pylint: disable=too-few-public-methods
+    """
+    ORM Model representing a request to Google API (a batch of terms and a date range)
+    whose scores have been persisted, so an interrupted run resumes after it. The batch is
+    identified by a digest of its terms and dates
+    """
+
+    batch_key = DB.Column(DB.Text, primary_key=True)
+    start_date = DB.Column(DB.Date, nullable=False)
+    end_date = DB.Column(DB.Date, nullable=False)
+    term_count = DB.Column(DB.Integer, nullable=False)
+    completion_timestamp = DB.Column(DB.DateTime, default=DB.func.current_timestamp())
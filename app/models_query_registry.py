@@ -22,17 +22,38 @@
 """
 
 # pylint: disable=no-member
-from datetime import date, timedelta
-from typing import List, Tuple, Dict
+from datetime import date, datetime, timedelta
+from itertools import groupby
+from typing import Iterator, List, NamedTuple, Tuple, Dict
 
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.sql import func
 
 from app import DB
-from app.models import FluModel, ModelScore, GoogleDate, GoogleScore, GoogleTerm, \
-    FluModelGoogleTerm, ModelFunction, DefaultFluModel, RateThresholdSet, TokenInfo
+from app.models import (
+    FluModel, ModelScore, GoogleDate, GoogleScore, GoogleTerm, FluModelGoogleTerm, ModelFunction,
+    DefaultFluModel, RateThresholdSet, TokenInfo, GoogleApiUsage, GoogleBatchCheckpoint
+)
+from app.score_series import ScoreMatrix, ScoreSeries
 
+DEFAULT_REGION = 'e'  # England, the region of the Google data
 
-def get_default_flu_model_half_year() -> Tuple[Dict, List[ModelScore]]:
+# Rows per multi-row INSERT. Each statement is further capped to the rows whose values fit in
+# the 999 bound parameters allowed by older SQLite, e.g. 142 rows of the 7 ModelScore columns
+BULK_INSERT_CHUNK_SIZE = 250
+_MAX_BOUND_PARAMETERS = 999
+
+
+class ModelSummary(NamedTuple):
+    """ Id and name of a model, detached from the session so it can be cached """
+    id: int
+    name: str
+
+
+def get_default_flu_model_half_year(
+        region: str = DEFAULT_REGION
+) -> Tuple[Dict, List[ModelScore]]:
     """ Returns the last half a year of data for the default Flu Model """
     default_flu_model = FluModel.query.filter_by(is_public=True, is_displayed=True)\
         .join(DefaultFluModel)\
@@ -40,8 +61,10 @@ def get_default_flu_model_half_year() -> Tuple[Dict, List[ModelScore]]:
         .first()
     if not default_flu_model:
         return None, None
-    model_scores = ModelScore.query.filter(ModelScore.flu_model_id == default_flu_model.id)\
-        .order_by(ModelScore.score_date.desc())\
+    model_scores = ModelScore.query.filter(
+        ModelScore.flu_model_id == default_flu_model.id,
+        ModelScore.region == region
+    ).order_by(ModelScore.score_date.desc())\
         .limit(182)\
         .all()
     if not model_scores:
@@ -50,10 +73,30 @@ def get_default_flu_model_half_year() -> Tuple[Dict, List[ModelScore]]:
     return flu_model_meta, model_scores
 
 
+def get_default_flu_model_half_year_series(
+        smoothing: int = 0,
+        region: str = DEFAULT_REGION
+) -> Tuple[Dict, ScoreSeries]:
+    """ Returns the last half a year of data for the default Flu Model as a detached series """
+    flu_model_meta, model_scores = get_default_flu_model_half_year(region)
+    if not flu_model_meta:
+        return None, None
+    if not smoothing:
+        return flu_model_meta, ScoreSeries.from_model_scores(model_scores)
+    return flu_model_meta, get_model_score_series(
+        flu_model_meta['id'],
+        flu_model_meta['start_date'],
+        flu_model_meta['end_date'],
+        smoothing,
+        region
+    )
+
+
 def get_flu_model_for_model_region_and_dates(
         model_region_id: str,
         start_date: date,
-        end_date: date
+        end_date: date,
+        region: str = DEFAULT_REGION
 ) -> Tuple[Dict, List[ModelScore]]:
     """ Returns model data for the period start_date to end_date
     and corresponding model_region_id
@@ -65,6 +108,7 @@ def get_flu_model_for_model_region_and_dates(
         return None, None
     model_scores = ModelScore.query.filter(
         ModelScore.flu_model_id == flu_model.id,
+        ModelScore.region == region,
         ModelScore.score_date >= start_date,
         ModelScore.score_date <= end_date
     ).order_by(ModelScore.score_date.desc()).all()
@@ -77,7 +121,8 @@ def get_flu_model_for_model_region_and_dates(
 def get_flu_model_for_model_id_and_dates(
         model_id: int,
         start_date: date,
-        end_date: date
+        end_date: date,
+        region: str = DEFAULT_REGION
 ) -> Tuple[Dict, List[ModelScore]]:
     """ Returns model data for the period start_date to end_date and corresponding model_id """
     flu_model = FluModel.query.filter_by(is_public=True, is_displayed=True, id=model_id).first()
@@ -85,6 +130,7 @@ def get_flu_model_for_model_id_and_dates(
         return None, None
     model_scores = ModelScore.query.filter(
         ModelScore.flu_model_id == flu_model.id,
+        ModelScore.region == region,
         ModelScore.score_date >= start_date,
         ModelScore.score_date <= end_date
     ).order_by(ModelScore.score_date.desc()).all()
@@ -117,20 +163,190 @@ def get_public_flu_models() -> List[FluModel]:
     return FluModel.query.filter_by(is_public=True).all()
 
 
+def get_public_flu_model_catalogue() -> List[ModelSummary]:
+    """ Returns id and name of all public models """
+    return [
+        ModelSummary(*row)
+        for row in DB.session.query(FluModel.id, FluModel.name).filter_by(is_public=True).all()
+    ]
+
+
+def get_legacy_model_ids() -> Dict[str, int]:
+    """ Maps the legacy model_region_id used by old Twitter links to the id of the public
+    and displayed models
+    """
+    return dict(
+        DB.session.query(FluModel.model_region_id, FluModel.id).filter(
+            FluModel.is_public.is_(True),
+            FluModel.is_displayed.is_(True),
+            FluModel.model_region_id.isnot(None)
+        ).all()
+    )
+
+
 def get_all_flu_models() -> List[FluModel]:
     """ Returns all models, public and private """
     return FluModel.query.all()
 
 
-def get_model_scores_for_dates(model_id: int, start_date: date, end_date: date) -> List[ModelScore]:
+def get_flu_model_series_for_regions(
+        model_id: int,
+        start_date: date,
+        end_date: date,
+        regions: List[str],
+        smoothing: int = 0
+) -> Dict[str, Tuple[Dict, ScoreSeries]]:
+    """ Returns model data for the period start_date to end_date and corresponding model_id,
+    keyed by region. The scores for all the regions are read in a single query. Regions
+    without scores in the period are left out
+    """
+    flu_model = FluModel.query.filter_by(is_public=True, is_displayed=True, id=model_id).first()
+    if not flu_model:
+        return {}
+    region_series = __get_padded_score_series(model_id, start_date, end_date, regions, smoothing)
+    result = {}
+    for region in regions:
+        if region not in region_series:
+            continue
+        raw_series = region_series[region].clipped(start_date, end_date)
+        if not raw_series:
+            continue
+        model_series = raw_series
+        if smoothing:
+            model_series = region_series[region].smoothed(smoothing).clipped(start_date, end_date)
+        result[region] = (__build_flu_model_meta(flu_model, list(raw_series)), model_series)
+    return result
+
+
+def get_changed_score_dates(
+        model_id: int,
+        start_date: date,
+        end_date: date,
+        regions: List[str],
+        since: datetime
+) -> Tuple[Dict[str, List[date]], datetime]:
+    """ Returns, per region, the dates between start_date and end_date with scores calculated
+    or recalculated after since, along with the latest calculation timestamp found (None if
+    nothing changed)
+    """
+    rows = DB.session.query(
+        ModelScore.region,
+        ModelScore.score_date,
+        ModelScore.calculation_timestamp
+    ).filter(
+        ModelScore.flu_model_id == model_id,
+        ModelScore.calculation_timestamp > since,
+        ModelScore.region.in_(regions),
+        ModelScore.score_date >= start_date,
+        ModelScore.score_date <= end_date
+    ).all()
+    changed_dates = {}
+    for region, score_date, _ in rows:
+        changed_dates.setdefault(region, []).append(score_date)
+    return changed_dates, max((r[2] for r in rows), default=None)
+
+
+def get_model_scores_for_dates(
+        model_id: int,
+        start_date: date,
+        end_date: date,
+        region: str = DEFAULT_REGION
+) -> List[ModelScore]:
     """ Returns a list of model scores for a model id, start and end date """
     return ModelScore.query.filter(
         ModelScore.flu_model_id == model_id,
+        ModelScore.region == region,
         ModelScore.score_date >= start_date,
         ModelScore.score_date <= end_date
     ).order_by(ModelScore.score_date.desc()).all()
 
 
+def get_score_matrix(
+        model_ids: List[int],
+        start_date: date,
+        end_date: date,
+        region: str = DEFAULT_REGION
+) -> ScoreMatrix:
+    """ Returns the scores of several models for a start and end date aligned on a single
+    date axis, read in one query
+    """
+    rows = DB.session.query(
+        ModelScore.flu_model_id,
+        ModelScore.score_date,
+        ModelScore.score_value
+    ).filter(
+        ModelScore.flu_model_id.in_(model_ids),
+        ModelScore.region == region,
+        ModelScore.score_date >= start_date,
+        ModelScore.score_date <= end_date
+    ).order_by(ModelScore.score_date.desc(), ModelScore.flu_model_id).all()
+    return ScoreMatrix.from_rows(model_ids, rows)
+
+
+def get_model_score_series(
+        model_id: int,
+        start_date: date,
+        end_date: date,
+        smoothing: int = 0,
+        region: str = DEFAULT_REGION
+) -> ScoreSeries:
+    """ Returns a detached series of model scores for a model id, start and end date.
+    When smoothing is set, the neighbouring scores needed by the moving average window
+    are read as well and the smoothed series is clipped back to the requested dates
+    """
+    model_series = __get_padded_score_series(
+        model_id, start_date, end_date, [region], smoothing
+    ).get(region, ScoreSeries.from_rows([]))
+    if smoothing:
+        return model_series.smoothed(smoothing).clipped(start_date, end_date)
+    return model_series
+
+
+def get_public_flu_model_ids(model_ids: List[int]) -> List[int]:
+    """ Returns the ids of the public models among model_ids """
+    return [
+        row[0] for row in DB.session.query(FluModel.id)
+        .filter(FluModel.id.in_(model_ids), FluModel.is_public.is_(True))
+        .order_by(FluModel.id)
+        .all()
+    ]
+
+
+def get_model_score_batches(
+        model_ids: List[int],
+        region: str,
+        batch_size: int,
+        start_date: date = None,
+        end_date: date = None
+) -> Iterator[List[Tuple]]:
+    """ Returns a generator of batches of (flu_model_id, region, score_date, score_value,
+    confidence_interval_lower, confidence_interval_upper) rows ordered by model and date.
+    Rows are read through a server-side cursor so the whole history is never held in memory
+    """
+    query = DB.session.query(
+        ModelScore.flu_model_id,
+        ModelScore.region,
+        ModelScore.score_date,
+        ModelScore.score_value,
+        ModelScore.confidence_interval_lower,
+        ModelScore.confidence_interval_upper
+    ).filter(ModelScore.flu_model_id.in_(model_ids), ModelScore.region == region)
+    if start_date:
+        query = query.filter(ModelScore.score_date >= start_date)
+    if end_date:
+        query = query.filter(ModelScore.score_date <= end_date)
+    statement = query.order_by(ModelScore.flu_model_id, ModelScore.score_date)\
+        .statement.execution_options(stream_results=True)
+    result = DB.session.execute(statement)
+    try:
+        rows = result.fetchmany(batch_size)
+        while rows:
+            yield rows
+            rows = result.fetchmany(batch_size)
+    finally:
+        result.close()
+
+
 def has_model(model_id) -> bool:
     """ Checks if the model exists """
     return DB.session.query(FluModel.query.filter_by(id=model_id).exists()).scalar()
@@ -152,6 +368,18 @@ def get_last_google_date(model_id: int) -> DB.Date:
         .score_date
 
 
+def get_last_google_dates(model_ids: List[int]) -> Dict[int, date]:
+    """
+    Returns the last Google date of each model, in one query. Models without any Google
+    date are left out
+    """
+    rows = DB.session.query(GoogleDate.flu_model_id, func.max(GoogleDate.score_date))\
+        .filter(GoogleDate.flu_model_id.in_(model_ids))\
+        .group_by(GoogleDate.flu_model_id)\
+        .all()
+    return dict(rows)
+
+
 def get_existing_google_dates(model_id: int, start: date, end: date) -> List[Tuple[date]]:
     """ Returns dates with existing Google scores for a particular model ID between two dates """
     return DB.session.query(GoogleDate.score_date).distinct()\
@@ -161,6 +389,24 @@ def get_existing_google_dates(model_id: int, start: date, end: date) -> List[Tup
         .all()
 
 
+def get_google_terms_missing_scores(terms: List[str], start: date, end: date) -> List[str]:
+    """ Returns the terms without a score for at least one date between start and end """
+    if not terms:
+        return []
+    days = (end - start).days + 1
+    complete = {
+        term for term, count in DB.session.query(
+            GoogleTerm.term, func.count(GoogleScore.score_date.distinct())
+        ).join(GoogleScore)
+        .filter(GoogleTerm.term.in_(terms))
+        .filter(GoogleScore.score_date >= start)
+        .filter(GoogleScore.score_date <= end)
+        .group_by(GoogleTerm.term)
+        .all() if count >= days
+    }
+    return [term for term in terms if term not in complete]
+
+
 def get_google_terms_for_model_id(model_id: int) -> List[Tuple[str]]:
     """ Returns Google terms for which a model was created against """
     return DB.session.query(GoogleTerm.term)\
@@ -169,17 +415,44 @@ def get_google_terms_for_model_id(model_id: int) -> List[Tuple[str]]:
         .all()
 
 
+def get_google_term_ids(terms: List[str] = None) -> Dict[str, int]:
+    """ Returns the ids of Google terms by their text, for all the terms if none is given """
+    query = DB.session.query(GoogleTerm.term, GoogleTerm.id)
+    if terms is not None:
+        query = query.filter(GoogleTerm.term.in_(terms))
+    return dict(query.all())
+
+
+def set_google_terms(terms: List[str], chunk_size: int = BULK_INSERT_CHUNK_SIZE):
+    """ Persists Google terms with one INSERT per chunk, skipping the ones already stored """
+    __insert_ignoring_duplicates(GoogleTerm, [{'term': term} for term in terms], chunk_size)
+
+
+def ensure_google_terms(terms: List[str]) -> Dict[str, int]:
+    """ Persists the Google terms not stored yet, e.g. when registering a new model, and
+    returns the ids of all the terms. The term dictionary of the process is kept up to date
+    """
+    return current_app.extensions['term_cache'].ensure_terms(terms)
+
+
 def set_google_scores_for_term(term: str, points: List[Tuple[date, float]]):
     """ Persists score data (date, score) for a particular term """
-    term_id = GoogleTerm.query.filter_by(term=term).first().id
-    for point in points:
-        entity_exists = GoogleScore.query\
-            .filter(GoogleScore.score_date == point[0])\
-            .filter(GoogleScore.term_id == term_id).exists()
-        if not DB.session.query(entity_exists).scalar():
-            google_score = GoogleScore(term_id=term_id, score_date=point[0], score_value=point[1])
-            DB.session.add(google_score)
-    DB.session.commit()
+    set_google_scores_for_terms([(term, points)])
+
+
+def set_google_scores_for_terms(
+        term_points: List[Tuple[str, List[Tuple[date, float]]]],
+        chunk_size: int = BULK_INSERT_CHUNK_SIZE
+):
+    """ Persists score data (date, score) for several terms with one INSERT per chunk of
+    rows. Scores already stored for a term and date are left untouched
+    """
+    term_ids = current_app.extensions['term_cache'].get_ids([term for term, _ in term_points])
+    rows = [
+        {'term_id': term_ids[term], 'score_date': score_date, 'score_value': score_value}
+        for term, points in term_points for score_date, score_value in points
+    ]
+    __insert_ignoring_duplicates(GoogleScore, rows, chunk_size)
 
 
 def set_google_date_for_model_id(model_id: int, google_date: date):
@@ -197,20 +470,79 @@ def set_google_date_for_model_id(model_id: int, google_date: date):
     google_date.save()
 
 
-def get_existing_model_dates(model_id: int, start: date, end: date) -> List[Tuple[date]]:
+def set_google_dates_for_model_id(
+        model_id: int,
+        google_dates: List[date]
+) -> Dict[date, List[str]]:
+    """ Persists, in one transaction, the dates for which scores have been retrieved for all
+    the terms of a model. The term coverage of every date is counted in one grouped query.
+    Returns the remaining dates with the terms missing a score
+    """
+    if not google_dates:
+        return {}
+    model_terms = dict(
+        DB.session.query(FluModelGoogleTerm.google_term_id, GoogleTerm.term)
+        .outerjoin(GoogleTerm, GoogleTerm.id == FluModelGoogleTerm.google_term_id)
+        .filter(FluModelGoogleTerm.flu_model_id == model_id)
+        .all()
+    )
+    coverage = dict(
+        DB.session.query(GoogleScore.score_date, func.count(GoogleScore.term_id.distinct()))
+        .join(FluModelGoogleTerm, FluModelGoogleTerm.google_term_id == GoogleScore.term_id)
+        .filter(FluModelGoogleTerm.flu_model_id == model_id)
+        .filter(GoogleScore.score_date >= min(google_dates))
+        .filter(GoogleScore.score_date <= max(google_dates))
+        .group_by(GoogleScore.score_date)
+        .all()
+    )
+    complete = [d for d in google_dates if coverage.get(d, 0) == len(model_terms)]
+    incomplete = sorted(set(google_dates) - set(complete))
+    rows = [{'flu_model_id': model_id, 'score_date': d} for d in complete]
+    chunk_size = __rows_per_insert(GoogleDate.__table__, BULK_INSERT_CHUNK_SIZE)
+    for idx in range(0, len(rows), chunk_size):
+        DB.session.execute(GoogleDate.__table__.insert().values(rows[idx:idx + chunk_size]))
+    DB.session.commit()
+    if not incomplete:
+        return {}
+    scored_terms = set(
+        DB.session.query(GoogleScore.score_date, GoogleScore.term_id)
+        .filter(GoogleScore.term_id.in_(list(model_terms)))
+        .filter(GoogleScore.score_date.in_(incomplete))
+        .all()
+    )
+    return {
+        d: sorted(
+            model_terms[term_id] or str(term_id) for term_id in model_terms
+            if (d, term_id) not in scored_terms
+        ) for d in incomplete
+    }
+
+
+def get_existing_model_dates(
+        model_id: int,
+        start: date,
+        end: date,
+        region: str = DEFAULT_REGION
+) -> List[Tuple[date]]:
     """ Returns dates with existing model scores for a particular model ID between two dates """
     return DB.session.query(ModelScore.score_date).distinct()\
         .filter(ModelScore.flu_model_id == model_id)\
+        .filter(ModelScore.region == region)\
         .filter(ModelScore.score_date >= start)\
         .filter(ModelScore.score_date <= end)\
         .all()
 
 
-def set_model_score(model_id: int, score_date: date, score_value: float):
+def set_model_score(
+        model_id: int,
+        score_date: date,
+        score_value: float,
+        region: str = DEFAULT_REGION
+):
     """ Persists a model score entity """
     model_score = ModelScore()
     model_score.flu_model_id = model_id
-    model_score.region = 'e'  # Default for Google data
+    model_score.region = region
     model_score.score_date = score_date
     model_score.score_value = score_value
     model_score.save()
@@ -220,12 +552,13 @@ def set_model_score_confidence_interval(
         model_id: int,
         score_date: date,
         score_value: float,
-        confidence_interval: Tuple[float, float]
+        confidence_interval: Tuple[float, float],
+        region: str = DEFAULT_REGION
 ):
     """ Persists a model score entity including its confidence interval """
     model_score = ModelScore()
     model_score.flu_model_id = model_id
-    model_score.region = 'e'  # Default for Google data
+    model_score.region = region
     model_score.score_date = score_date
     model_score.score_value = score_value
     model_score.confidence_interval_lower = confidence_interval[0]
@@ -233,6 +566,78 @@ def set_model_score_confidence_interval(
     model_score.save()
 
 
+def set_model_scores(rows: List[Dict], chunk_size: int = BULK_INSERT_CHUNK_SIZE):
+    """ Persists model scores, given as dictionaries of ModelScore column values, with one
+    INSERT per chunk of rows and a single commit. The transaction is rolled back on error
+    """
+    table = ModelScore.__table__
+    chunk_size = __rows_per_insert(table, chunk_size)
+    try:
+        for idx in range(0, len(rows), chunk_size):
+            DB.session.execute(table.insert().values(rows[idx:idx + chunk_size]))
+        DB.session.commit()
+    except Exception:
+        DB.session.rollback()
+        raise
+
+
+def get_google_batch_checkpoints(batch_keys: List[str]) -> List[str]:
+    """ Returns the keys of the Google API batches whose scores have been persisted """
+    if not batch_keys:
+        return []
+    return [row[0] for row in DB.session.query(GoogleBatchCheckpoint.batch_key)
+            .filter(GoogleBatchCheckpoint.batch_key.in_(batch_keys))
+            .all()]
+
+
+def set_google_batch_checkpoint(batch_key: str, start: date, end: date, term_count: int):
+    """ Records that the scores of a Google API batch have been persisted """
+    __insert_ignoring_duplicates(GoogleBatchCheckpoint, [{
+        'batch_key': batch_key, 'start_date': start, 'end_date': end, 'term_count': term_count
+    }], 1)
+
+
+def delete_google_batch_checkpoints(batch_keys: List[str]):
+    """ Removes the checkpoints of Google API batches """
+    if batch_keys:
+        GoogleBatchCheckpoint.query\
+            .filter(GoogleBatchCheckpoint.batch_key.in_(batch_keys))\
+            .delete(synchronize_session=False)
+        DB.session.commit()
+
+
+def get_google_api_usage(key_id: str, usage_date: date) -> Tuple[int, int, bool]:
+    """ Returns the calls and lines recorded for an API key on a day, and whether the daily
+    limit was reached
+    """
+    usage = GoogleApiUsage.query.filter_by(key_id=key_id, usage_date=usage_date).first()
+    if usage is None:
+        return 0, 0, False
+    return usage.calls, usage.lines, usage.is_exhausted
+
+
+def add_google_api_usage(
+        key_id: str,
+        usage_date: date,
+        calls: int,
+        lines: int,
+        is_exhausted: bool = False
+):
+    """ Adds calls and lines to the usage of an API key on a day, in one atomic UPDATE """
+    __insert_ignoring_duplicates(GoogleApiUsage, [{
+        'key_id': key_id, 'usage_date': usage_date, 'calls': 0, 'lines': 0, 'is_exhausted': False
+    }], 1)
+    values = {
+        'calls': GoogleApiUsage.calls + calls,
+        'lines': GoogleApiUsage.lines + lines
+    }
+    if is_exhausted:
+        values['is_exhausted'] = True
+    GoogleApiUsage.query.filter_by(key_id=key_id, usage_date=usage_date)\
+        .update(values, synchronize_session=False)
+    DB.session.commit()
+
+
 def get_model_function(model_id: int) -> ModelFunction:
     """ Return the model parameters """
     return ModelFunction.query.filter_by(flu_model_id=model_id).first()
@@ -315,6 +720,38 @@ def set_model_display(model_id: int, display: bool) -> bool:
     return False
 
 
+def __insert_ignoring_duplicates(model: DB.Model, rows: List[Dict], chunk_size: int):
+    """ Inserts rows in chunks, skipping the ones whose primary key is already stored. It uses
+    ON CONFLICT DO NOTHING on PostgreSQL and INSERT OR IGNORE on SQLite, and one savepoint
+    per row on other databases
+    """
+    table = model.__table__
+    dialect = DB.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert  # pylint: disable=import-outside-toplevel
+        statement = insert(table).on_conflict_do_nothing()
+    elif dialect == 'sqlite':
+        statement = table.insert().prefix_with('OR IGNORE')
+    else:
+        for row in rows:
+            try:
+                with DB.session.begin_nested():
+                    DB.session.execute(table.insert().values(row))
+            except IntegrityError:
+                pass
+        DB.session.commit()
+        return
+    chunk_size = __rows_per_insert(table, chunk_size)
+    for idx in range(0, len(rows), chunk_size):
+        DB.session.execute(statement.values(rows[idx:idx + chunk_size]))
+    DB.session.commit()
+
+
+def __rows_per_insert(table: DB.Table, chunk_size: int) -> int:
+    """ Caps chunk_size so that one multi-row INSERT binds at most _MAX_BOUND_PARAMETERS """
+    return max(1, min(chunk_size, _MAX_BOUND_PARAMETERS // len(table.columns)))
+
+
 def __build_flu_model_meta(flu_model: FluModel, model_scores: List[ModelScore]) -> Dict:
     scores = [s.score_value for s in model_scores]
     model_function = ModelFunction.query.filter_by(flu_model_id=flu_model.id).first()
@@ -326,3 +763,32 @@ def __build_flu_model_meta(flu_model: FluModel, model_scores: List[ModelScore])
         'start_date': model_scores[-1].score_date,
         'end_date': model_scores[0].score_date
     }
+
+
+def __get_padded_score_series(
+        model_id: int,
+        start_date: date,
+        end_date: date,
+        regions: List[str],
+        smoothing: int
+) -> Dict[str, ScoreSeries]:
+    """ Reads the scores of a model for several regions in one query, widening the period by
+    the half window used in smoothing
+    """
+    padding = timedelta(days=ScoreSeries.half_window(smoothing) if smoothing else 0)
+    rows = DB.session.query(
+        ModelScore.region,
+        ModelScore.score_date,
+        ModelScore.score_value,
+        ModelScore.confidence_interval_lower,
+        ModelScore.confidence_interval_upper
+    ).filter(
+        ModelScore.flu_model_id == model_id,
+        ModelScore.region.in_(regions),
+        ModelScore.score_date >= start_date - padding,
+        ModelScore.score_date <= end_date + padding
+    ).order_by(ModelScore.region, ModelScore.score_date.desc()).all()
+    return {
+        region: ScoreSeries.from_rows(r[1:] for r in region_rows)
+        for region, region_rows in groupby(rows, key=lambda r: r[0])
+    }
@@ -67,12 +67,14 @@ def build_scores_response(model_data: List[Tuple[Dict, List[ModelScore]]]) -> Di
 
 def __build_model_data(model_data: List[Tuple[Dict, List[ModelScore]]]) -> List:
     """
-    Constructs list of dictionaries containing metadata and scores from flu models
+    Constructs list of dictionaries containing metadata and scores from flu models. The
+    metadata dictionaries are copied as they may be shared through the cache
     :param model_data:
     :return: a list with the model metadata and scores
     """
     flu_model_data = []
     for model_data_item, model_scores_item in model_data:
+        model_data_item = dict(model_data_item)
         converted_model_scores = [
             {
                 'score_date': s.score_date.strftime('%Y-%m-%d'),
@@ -86,3 +88,22 @@ def __build_model_data(model_data: List[Tuple[Dict, List[ModelScore]]]) -> List:
         model_data_item['end_date'] = model_data_item['end_date'].strftime('%Y-%m-%d')
         flu_model_data.append(model_data_item)
     return flu_model_data
+
+
+def build_statistics_response(model_data: List[Tuple[Dict, Dict]]) -> Dict:
+    """
+    Constructs response for a message that contains metadata and summary statistics for a
+    list of flu models
+    :param model_data: metadata and statistics as returned by
+    app.statistics_registry.build_series_statistics
+    :return: a dictionary with the data in serialisable form
+    """
+    flu_model_data = []
+    for model_data_item, statistics in model_data:
+        model_data_item = dict(model_data_item, **statistics)
+        model_data_item['start_date'] = model_data_item['start_date'].strftime('%Y-%m-%d')
+        model_data_item['end_date'] = model_data_item['end_date'].strftime('%Y-%m-%d')
+        flu_model_data.append(model_data_item)
+    return {
+        'model_data': flu_model_data
+    }
@@ -0,0 +1,322 @@
+# i-sense flu api: REST API, and data processors for the i-sense flu service from UCL.
+# (c) 2019, UCL <https://www.ucl.ac.uk/
+#
+# This file is part of i-sense flu api
+#
+# i-sense flu api is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# i-sense flu api is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with i-sense flu api.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+ Immutable series of model scores detached from the ORM session. Derived series
+ (smoothed, weekly, clipped to a date range, downsampled) are built from arrays without
+ copying or mutating ModelScore instances. ScoreMatrix aligns the scores of several
+ models on a single date axis
+"""
+
+from datetime import date
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+_SUNDAY = 6
+
+
+class ScorePoint(NamedTuple):
+    """
+    Single data point of a ScoreSeries. It exposes the same attribute names as ModelScore
+    so it can be used wherever a list of model scores is expected
+    """
+    score_date: date
+    score_value: float
+    confidence_interval_lower: Optional[float]
+    confidence_interval_upper: Optional[float]
+
+
+def _frozen(array: np.ndarray) -> np.ndarray:
+    array.setflags(write=False)
+    return array
+
+
+def _float_array(values: Iterable[Optional[float]]) -> np.ndarray:
+    return np.array([np.nan if v is None else v for v in values], dtype=float)
+
+
+def _to_float(value: float) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
+
+
+def _is_sunday(dates: np.ndarray) -> np.ndarray:
+    # 1970-01-01, day zero of datetime64, was a Thursday (weekday 3)
+    return (dates.astype('int64') + 3) % 7 == _SUNDAY
+
+
+class ScoreSeries:
+    """
+    Read-only series of model scores. Points are kept newest first, which is the order
+    used by the queries and the API responses. Missing confidence interval bounds are
+    stored as NaN and returned as None
+    """
+
+    __slots__ = ('_dates', '_values', '_lower', '_upper')
+
+    def __init__(
+            self,
+            dates: np.ndarray,
+            values: np.ndarray,
+            lower: np.ndarray,
+            upper: np.ndarray
+    ):
+        order = np.argsort(np.asarray(dates, dtype='datetime64[D]'), kind='stable')[::-1]
+        self._dates = _frozen(np.asarray(dates, dtype='datetime64[D]')[order])
+        self._values = _frozen(np.asarray(values, dtype=float)[order])
+        self._lower = _frozen(np.asarray(lower, dtype=float)[order])
+        self._upper = _frozen(np.asarray(upper, dtype=float)[order])
+
+    @classmethod
+    def from_rows(
+            cls,
+            rows: Iterable[Tuple[date, float, Optional[float], Optional[float]]]
+    ) -> 'ScoreSeries':
+        """
+        Builds a series from (score_date, score_value, lower, upper) tuples as returned
+        by a column query on ModelScore
+        """
+        rows = list(rows or [])
+        return cls(
+            np.array([r[0] for r in rows], dtype='datetime64[D]'),
+            _float_array(r[1] for r in rows),
+            _float_array(r[2] for r in rows),
+            _float_array(r[3] for r in rows)
+        )
+
+    @classmethod
+    def from_model_scores(cls, model_scores: Iterable) -> 'ScoreSeries':
+        """ Builds a series from a list of ModelScore (or ScorePoint) instances """
+        return cls.from_rows(
+            (
+                s.score_date,
+                s.score_value,
+                s.confidence_interval_lower,
+                s.confidence_interval_upper
+            ) for s in (model_scores or [])
+        )
+
+    @staticmethod
+    def half_window(days: int) -> int:
+        """ Number of days on each side of a point covered by a smoothing window """
+        return max(0, (days - 1) // 2)
+
+    @property
+    def dates(self) -> np.ndarray:
+        """ Score dates as a read-only array of numpy.datetime64 """
+        return self._dates
+
+    @property
+    def values(self) -> np.ndarray:
+        """ Score values as a read-only array """
+        return self._values
+
+    @property
+    def lower(self) -> np.ndarray:
+        """ Lower bounds of the confidence interval as a read-only array """
+        return self._lower
+
+    @property
+    def upper(self) -> np.ndarray:
+        """ Upper bounds of the confidence interval as a read-only array """
+        return self._upper
+
+    def smoothed(self, days: int) -> 'ScoreSeries':
+        """
+        Returns a new series with the moving average over a window of days centred on each
+        point. Like ModelScore.moving_avg, missing confidence interval bounds count as zero
+        """
+        half = self.half_window(days)
+        # Dates are newest first, negating them gives an ascending key for searchsorted
+        key = -self._dates.astype('int64')
+        low_idx = np.searchsorted(key, key - half, side='left')
+        high_idx = np.searchsorted(key, key + half, side='right')
+        counts = high_idx - low_idx
+        values = np.zeros(len(self))
+        lower = np.zeros(len(self))
+        upper = np.zeros(len(self))
+        filled_lower = np.nan_to_num(self._lower)
+        filled_upper = np.nan_to_num(self._upper)
+        # Add up oldest to newest within each window, the order used by ModelScore.moving_avg
+        for offset in range(int(counts.max()) if len(self) else 0):
+            idx = high_idx - 1 - offset
+            in_window = idx >= low_idx
+            idx = np.where(in_window, idx, 0)
+            values += np.where(in_window, self._values[idx], 0.0)
+            lower += np.where(in_window, filled_lower[idx], 0.0)
+            upper += np.where(in_window, filled_upper[idx], 0.0)
+        return ScoreSeries(self._dates, values / counts, lower / counts, upper / counts)
+
+    def weekly(self) -> 'ScoreSeries':
+        """ Returns a new series with the points falling on a Sunday """
+        return self._masked(_is_sunday(self._dates))
+
+    def clipped(self, start_date: date, end_date: date) -> 'ScoreSeries':
+        """ Returns a new series with the points between start_date and end_date inclusive """
+        start, end = np.datetime64(start_date, 'D'), np.datetime64(end_date, 'D')
+        return self._masked((self._dates >= start) & (self._dates <= end))
+
+    def near(self, dates: Iterable[date], days: int = 0) -> 'ScoreSeries':
+        """ Returns a new series with the points no further than days from any of dates """
+        targets = np.sort(np.array(list(dates), dtype='datetime64[D]').astype('int64'))
+        if not len(targets):
+            return self._masked(np.zeros(len(self), dtype=bool))
+        own = self._dates.astype('int64')
+        idx = np.searchsorted(targets, own)
+        before = targets[np.clip(idx - 1, 0, len(targets) - 1)]
+        after = targets[np.clip(idx, 0, len(targets) - 1)]
+        distance = np.minimum(np.abs(own - before), np.abs(after - own))
+        return self._masked(distance <= days)
+
+    def downsampled(self, max_points: int) -> 'ScoreSeries':  # pylint: disable=too-many-locals
+        """
+        Returns a new series of at most max_points points (3 or more) picked with Largest-
+        Triangle-Three-Buckets. The first and last points are kept and the others are split
+        in max_points - 2 buckets. Points are picked whole, so their confidence interval
+        bounds are kept. To resolve every bucket at once, the left vertex of the triangles
+        is the mean of the previous bucket rather than the point picked in it
+        """
+        size = len(self)
+        if size <= max_points:
+            return self
+        # Oldest first, with the dates as the x axis
+        x = self._dates[::-1].astype('int64').astype(float)
+        y = self._values[::-1]
+        inner = np.arange(1, size - 1)
+        edges = np.linspace(1, size - 1, max_points - 1)
+        bucket = np.searchsorted(edges, inner, side='right') - 1
+        counts = np.bincount(bucket)
+        mean_x = np.bincount(bucket, weights=x[inner]) / counts
+        mean_y = np.bincount(bucket, weights=y[inner]) / counts
+        left_x = np.concatenate(([x[0]], mean_x[:-1]))[bucket]
+        left_y = np.concatenate(([y[0]], mean_y[:-1]))[bucket]
+        right_x = np.concatenate((mean_x[1:], [x[-1]]))[bucket]
+        right_y = np.concatenate((mean_y[1:], [y[-1]]))[bucket]
+        area = np.abs(
+            (left_x - right_x) * (y[inner] - left_y) - (left_x - x[inner]) * (right_y - left_y)
+        )
+        # Largest area first within each bucket, then the first point of each bucket
+        order = np.lexsort((-area, bucket))
+        is_first = np.concatenate(([True], bucket[order][1:] != bucket[order][:-1]))
+        keep = np.zeros(size, dtype=bool)
+        keep[[0, size - 1]] = True
+        keep[inner[order[is_first]]] = True
+        return self._masked(keep[::-1])
+
+    def _masked(self, mask: np.ndarray) -> 'ScoreSeries':
+        return ScoreSeries(
+            self._dates[mask], self._values[mask], self._lower[mask], self._upper[mask]
+        )
+
+    def __len__(self) -> int:
+        return len(self._dates)
+
+    def __iter__(self) -> Iterator[ScorePoint]:
+        for idx, score_date in enumerate(self._dates.astype(object)):
+            yield ScorePoint(
+                score_date,
+                float(self._values[idx]),
+                _to_float(self._lower[idx]),
+                _to_float(self._upper[idx])
+            )
+
+    def __reduce__(self):
+        # Rebuilt through the constructor so the arrays are read-only once unpickled
+        return ScoreSeries, (self._dates, self._values, self._lower, self._upper)
+
+    def __repr__(self):
+        return '<ScoreSeries %d points>' % len(self)
+
+
+class ScoreMatrix:
+    """
+    Read-only matrix of the scores of several models (rows, in the order of model_ids)
+    aligned on a single date axis (columns, newest first). Gaps are stored as NaN
+    """
+
+    __slots__ = ('_model_ids', '_dates', '_values')
+
+    def __init__(self, model_ids: Iterable[int], dates: np.ndarray, values: np.ndarray):
+        self._model_ids = tuple(model_ids)
+        self._dates = _frozen(np.asarray(dates, dtype='datetime64[D]'))
+        self._values = _frozen(np.asarray(values, dtype=float))
+
+    @classmethod
+    def from_rows(
+            cls,
+            model_ids: List[int],
+            rows: Iterable[Tuple[int, date, float]]
+    ) -> 'ScoreMatrix':
+        """
+        Builds a matrix from (model_id, score_date, score_value) tuples, scattering the
+        values into a preallocated array. Rows of models not in model_ids are ignored
+        """
+        rows = list(rows or [])
+        row_models = np.array([r[0] for r in rows], dtype='int64')
+        row_dates = np.array([r[1] for r in rows], dtype='datetime64[D]')
+        row_values = np.array([r[2] for r in rows], dtype=float)
+        ids = np.array(model_ids, dtype='int64')
+        id_order = np.argsort(ids, kind='stable')
+        id_pos = np.searchsorted(ids[id_order], row_models)
+        known = id_pos < len(ids)
+        known[known] = ids[id_order][id_pos[known]] == row_models[known]
+        dates, date_idx = np.unique(row_dates[known], return_inverse=True)
+        values = np.full((len(ids), len(dates)), np.nan)
+        # Newest first, as in ScoreSeries
+        values[id_order[id_pos[known]], len(dates) - 1 - date_idx] = row_values[known]
+        return cls(model_ids, dates[::-1], values)
+
+    @property
+    def model_ids(self) -> Tuple[int, ...]:
+        """ Ids of the models, one per row """
+        return self._model_ids
+
+    @property
+    def dates(self) -> np.ndarray:
+        """ Date axis as a read-only array of numpy.datetime64 """
+        return self._dates
+
+    @property
+    def values(self) -> np.ndarray:
+        """ Scores as a read-only models x dates array """
+        return self._values
+
+    def weekly(self) -> 'ScoreMatrix':
+        """ Returns a new matrix with the dates falling on a Sunday """
+        mask = _is_sunday(self._dates)
+        return ScoreMatrix(self._model_ids, self._dates[mask], self._values[:, mask])
+
+    def series(self, model_id: int) -> ScoreSeries:
+        """ Returns the scores of a model as a series, leaving out the gaps """
+        values = self._values[self._model_ids.index(model_id)]
+        mask = ~np.isnan(values)
+        missing = np.full(int(mask.sum()), np.nan)
+        return ScoreSeries(self._dates[mask], values[mask], missing, missing)
+
+    def rows(self) -> List[List[Optional[float]]]:
+        """ Returns the scores as nested lists, with None for the gaps """
+        return np.where(np.isnan(self._values), None, self._values).tolist()
+
+    def __len__(self) -> int:
+        return len(self._dates)
+
+    def __reduce__(self):
+        return ScoreMatrix, (self._model_ids, self._dates, self._values)
+
+    def __repr__(self):
+        return '<ScoreMatrix %d models x %d dates>' % (len(self._model_ids), len(self))
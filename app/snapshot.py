@@ -0,0 +1,170 @@
+# i-sense flu api: REST API, and data processors for the i-sense flu service from UCL.
+# (c) 2019, UCL <https://www.ucl.ac.uk/
+#
+# This file is part of i-sense flu api
+#
+# i-sense flu api is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# i-sense flu api is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with i-sense flu api.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+ Static snapshots of the responses that are the same for every visitor (the default view
+ and the model catalogue). Snapshots are rendered after the scheduler stores new scores
+ and written to SNAPSHOT_DIR as versioned files, together with a gzip variant. Every file,
+ including the manifest pointing at the current versions, is written to a temporary file
+ and renamed into place so readers never see a partial write
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import time
+from logging import INFO, log
+from tempfile import NamedTemporaryFile
+from typing import Dict, Optional
+
+from flask import Request, Response, send_file
+from flask_api import FlaskAPI
+
+SNAPSHOT_PATHS = {
+    'root': '/',
+    'models': '/models'
+}
+
+MANIFEST_NAME = 'snapshots.json'
+
+# Set in the WSGI environ of the requests that render a snapshot, so they are not served
+# from the previous snapshot
+RENDER_ENVIRON_KEY = 'isenseflu.render_snapshot'
+
+_KEEP_VERSIONS = 2
+
+
+def publish_snapshots(app: FlaskAPI) -> Dict[str, Dict]:
+    """
+    Renders SNAPSHOT_PATHS with the app and publishes the ones returning content. The
+    paths are rendered through the cache: callers must invalidate the models whose scores
+    they stored (app.cache.Cache.invalidate) before publishing, or the snapshots are built
+    from stale cached data. The scheduler does so once the scores of a model are stored
+    """
+    snapshot_dir = app.config['SNAPSHOT_DIR']
+    os.makedirs(snapshot_dir, exist_ok=True)
+    manifest = {}
+    with app.test_client() as client:
+        for name, path in SNAPSHOT_PATHS.items():
+            response = client.get(
+                path,
+                headers={'Accept': 'application/json'},
+                environ_overrides={RENDER_ENVIRON_KEY: True}
+            )
+            if response.status_code != 200:
+                continue
+            content = response.get_data()
+            version = hashlib.sha256(content).hexdigest()[:16]
+            filename = '%s.%s.json' % (name, version)
+            _atomic_write(os.path.join(snapshot_dir, filename), content)
+            _atomic_write(
+                os.path.join(snapshot_dir, filename + '.gz'), _gzip_compress(content)
+            )
+            manifest[name] = {
+                'version': version,
+                'filename': filename,
+                'published': time.time()
+            }
+    _atomic_write(
+        os.path.join(snapshot_dir, MANIFEST_NAME), json.dumps(manifest).encode('utf-8')
+    )
+    _remove_old_versions(snapshot_dir, manifest)
+    log(INFO, 'Published snapshots %s', ', '.join(sorted(manifest)))
+    return manifest
+
+
+def get_fresh_snapshot(snapshot_dir: str, name: str, max_age: int) -> Optional[Dict]:
+    """
+    Returns the manifest entry of a snapshot, with the absolute path of the file, if it
+    was published less than max_age seconds ago
+    """
+    try:
+        with open(os.path.join(snapshot_dir, MANIFEST_NAME), 'rb') as manifest_file:
+            entry = json.loads(manifest_file.read().decode('utf-8')).get(name)
+    except (OSError, ValueError):
+        return None
+    if not entry or time.time() - entry['published'] > max_age:
+        return None
+    path = os.path.join(snapshot_dir, entry['filename'])
+    if not os.path.isfile(path):
+        return None
+    return dict(entry, path=path)
+
+
+def send_snapshot(snapshot: Dict, request: Request) -> Response:
+    """
+    Sends a snapshot file, choosing the gzip variant when the client accepts it. The
+    snapshot version is used as ETag so unchanged snapshots are answered with 304
+    """
+    path, etag = snapshot['path'], snapshot['version']
+    use_gzip = 'gzip' in request.headers.get('Accept-Encoding', '') \
+        and os.path.isfile(path + '.gz')
+    if use_gzip:
+        path, etag = path + '.gz', etag + '-gz'
+    response = send_file(path, mimetype='application/json', add_etags=False)
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+
+def discard_snapshots(snapshot_dir: str):
+    """ Stops serving the published snapshots until the next run of the scheduler """
+    try:
+        os.remove(os.path.join(snapshot_dir, MANIFEST_NAME))
+    except FileNotFoundError:
+        pass
+
+
+def _gzip_compress(data: bytes) -> bytes:
+    """ Compresses data with a fixed mtime, so that equal contents give equal files """
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0) as gzip_file:
+        gzip_file.write(data)
+    return buffer.getvalue()
+
+
+def _atomic_write(path: str, data: bytes):
+    with NamedTemporaryFile(dir=os.path.dirname(path), prefix='.tmp-', delete=False) as tmp:
+        tmp.write(data)
+        tmp.flush()
+        os.fsync(tmp.fileno())
+    os.chmod(tmp.name, 0o644)
+    os.replace(tmp.name, path)
+
+
+def _remove_old_versions(snapshot_dir: str, manifest: Dict[str, Dict]):
+    """ Keeps the current and previous version of each snapshot for readers in flight """
+    for name in SNAPSHOT_PATHS:
+        versions = sorted(
+            (
+                entry for entry in os.scandir(snapshot_dir)
+                if entry.name.startswith(name + '.') and entry.name.endswith('.json')
+            ),
+            key=lambda entry: entry.stat().st_mtime,
+            reverse=True
+        )
+        current = manifest.get(name, {}).get('filename')
+        for entry in versions[_KEEP_VERSIONS:]:
+            if entry.name != current:
+                os.remove(entry.path)
+                if os.path.exists(entry.path + '.gz'):
+                    os.remove(entry.path + '.gz')
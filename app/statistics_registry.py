@@ -0,0 +1,129 @@
+# i-sense flu api: REST API, and data processors for the i-sense flu service from UCL.
+# (c) 2019, UCL <https://www.ucl.ac.uk/
+#
+# This file is part of i-sense flu api
+#
+# i-sense flu api is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# i-sense flu api is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with i-sense flu api.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+ Registry of summary statistics and classifications computed over the score arrays of
+ a ScoreSeries
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.score_series import ScoreSeries
+
+# Flu seasons are reported from September to August
+SEASON_START_MONTH = 9
+
+# Epidemic rate bands, from below the low threshold to at or above the very high threshold
+THRESHOLD_BANDS = ['baseline', 'low', 'medium', 'high', 'very_high']
+
+_THRESHOLD_KEYS = ['low_value', 'medium_value', 'high_value', 'very_high_value']
+
+
+def build_series_statistics(series: ScoreSeries, rate_thresholds: Dict[str, Dict]) -> Dict:
+    """
+    Summarises a series: peak value and date, growth of the last week over the previous
+    week, number of days at or above each rate threshold and cumulative totals per season
+    :param series: scores of a model for a period
+    :param rate_thresholds: as returned by app.models_query_registry.get_rate_thresholds
+    :return: a dictionary with the statistics in serialisable form
+    """
+    if not len(series):
+        return {}
+    # Oldest first, so ties are resolved in favour of the earliest date
+    dates = series.dates[::-1]
+    values = series.values[::-1]
+    peak = int(np.argmax(values))
+    return {
+        'points': len(values),
+        'peak_value': float(values[peak]),
+        'peak_date': str(dates[peak]),
+        'week_over_week_growth': _week_over_week_growth(dates, values),
+        'days_above_threshold': {
+            name: int(np.count_nonzero(values >= threshold['value']))
+            for name, threshold in rate_thresholds.items()
+        },
+        'seasonal_totals': _seasonal_totals(dates, values)
+    }
+
+
+def classify_threshold_bands(
+        series: ScoreSeries,
+        rate_thresholds: Dict[str, Dict]
+) -> List[Optional[str]]:
+    """
+    Returns the epidemic rate band (one of THRESHOLD_BANDS) of each point of a series, in
+    the order of the series. A score equal to a threshold falls in the band it opens. All
+    bands are None if no rate thresholds apply
+    :param series: scores of a model for a period
+    :param rate_thresholds: as returned by app.models_query_registry.get_rate_thresholds
+    """
+    if not rate_thresholds:
+        return [None] * len(series)
+    thresholds = np.array([rate_thresholds[key]['value'] for key in _THRESHOLD_KEYS])
+    band_idx = np.searchsorted(thresholds, series.values, side='right')
+    return np.array(THRESHOLD_BANDS, dtype=object)[band_idx].tolist()
+
+
+def build_band_segments(series: ScoreSeries, bands: List[Optional[str]]) -> List[Dict]:
+    """
+    Run-length encodes the bands of a series into segments of consecutive points in the
+    same band, in the order of the series (newest first)
+    :param series: scores of a model for a period
+    :param bands: as returned by classify_threshold_bands
+    """
+    if not len(series) or bands[0] is None:
+        return []
+    band_array = np.array(bands, dtype=object)
+    starts = np.concatenate(([0], np.flatnonzero(band_array[1:] != band_array[:-1]) + 1))
+    ends = np.concatenate((starts[1:], [len(band_array)])) - 1
+    return [
+        {
+            'band': band_array[start],
+            'start_date': str(series.dates[end]),
+            'end_date': str(series.dates[start]),
+            'points': int(end - start + 1)
+        } for start, end in zip(starts, ends)
+    ]
+
+
+def _week_over_week_growth(dates: np.ndarray, values: np.ndarray) -> Optional[float]:
+    """ Relative change of the mean score over the last 7 days against the 7 days before """
+    days = dates.astype('int64')
+    last_week = values[days > days[-1] - 7]
+    previous_week = values[(days > days[-1] - 14) & (days <= days[-1] - 7)]
+    if not len(previous_week) or previous_week.mean() == 0:
+        return None
+    return float(last_week.mean() / previous_week.mean() - 1)
+
+
+def _seasonal_totals(dates: np.ndarray, values: np.ndarray) -> List[Dict]:
+    """ Sum of the daily scores per flu season, labelled as 2018/19 """
+    years = dates.astype('datetime64[Y]').astype('int64') + 1970
+    months = dates.astype('datetime64[M]').astype('int64') % 12 + 1
+    seasons, season_idx = np.unique(years - (months < SEASON_START_MONTH), return_inverse=True)
+    totals = np.bincount(season_idx, weights=values)
+    counts = np.bincount(season_idx)
+    return [
+        {
+            'season': '%d/%02d' % (season, (season + 1) % 100),
+            'total': float(total),
+            'days': int(count)
+        } for season, total, count in zip(seasons, totals, counts)
+    ]
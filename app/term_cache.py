@@ -0,0 +1,70 @@
+# i-sense flu api: REST API, and data processors for the i-sense flu service from UCL.
+# (c) 2019, UCL <https://www.ucl.ac.uk/
+#
+# This file is part of i-sense flu api
+#
+# i-sense flu api is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# i-sense flu api is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with i-sense flu api.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+ Dictionary of the Google terms, mapping their text to their id, kept for the lifetime of
+ the process. It is loaded from the database on first use and updated when terms are
+ inserted, so the ingestion of Google scores does not look up terms batch after batch
+"""
+
+from threading import Lock
+from typing import Dict, List
+
+from app.models_query_registry import get_google_term_ids, set_google_terms
+
+
+class TermCache:
+    """
+    Maps the text of the Google terms to their id. Terms missing from the dictionary are
+    looked up in the database before being reported as unknown, in case another process
+    inserted them
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._loaded = False
+        self._lock = Lock()
+
+    def get_ids(self, terms: List[str]) -> Dict[str, int]:
+        """ Returns the ids of the terms stored in the database, unknown terms are left out """
+        with self._lock:
+            if not self._loaded:
+                self._ids.update(get_google_term_ids())
+                self._loaded = True
+            missing = [term for term in set(terms) if term not in self._ids]
+            if missing:
+                self._ids.update(get_google_term_ids(missing))
+            return {term: self._ids[term] for term in terms if term in self._ids}
+
+    def ensure_terms(self, terms: List[str]) -> Dict[str, int]:
+        """ Inserts the terms not stored yet and returns the ids of all the terms """
+        term_ids = self.get_ids(terms)
+        missing = sorted(set(terms) - set(term_ids))
+        if missing:
+            set_google_terms(missing)
+            term_ids = self.get_ids(terms)
+        return term_ids
+
+    def clear(self):
+        """ Forgets all terms, the dictionary is loaded again on next use """
+        with self._lock:
+            self._ids.clear()
+            self._loaded = False
+
+    def __len__(self):
+        return len(self._ids)
@@ -30,6 +30,33 @@ class Config:  # pylint: disable=too-few-public-methods
     CSRF_ENABLED = True
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', '')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Server shared by all workers and nodes, e.g. redis://host:6379/0. In process if empty
+    CACHE_URL = os.getenv('CACHE_URL', '')
+    # On by default only with a shared server: invalidations of an in-process cache do not
+    # reach the other workers, which would keep serving stale scores and hidden models
+    CACHE_ENABLED = os.getenv('CACHE_ENABLED', 'True' if CACHE_URL else 'False') == 'True'
+    CACHE_TIMEOUT = int(os.getenv('CACHE_TIMEOUT', '3600'))
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '1024'))
+    # Directory for the file locks coalescing cache misses across workers, disabled if empty
+    CACHE_LOCK_DIR = os.getenv('CACHE_LOCK_DIR', '')
+    # Paths requested at start up to fill the cache, e.g. /plink?id=1&startDate=...&endDate=...
+    CACHE_WARMUP = os.getenv('CACHE_WARMUP', 'False') == 'True'
+    CACHE_WARMUP_QUERIES = [q for q in os.getenv('CACHE_WARMUP_QUERIES', '').split(',') if q]
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '10000'))
+    # Pace and concurrency of the calls to Google API made by the scheduler, 0 for no daily limit
+    GOOGLE_API_CALLS_PER_SECOND = float(os.getenv('GOOGLE_API_CALLS_PER_SECOND', '1'))
+    GOOGLE_API_CALLS_PER_DAY = int(os.getenv('GOOGLE_API_CALLS_PER_DAY', '0'))
+    GOOGLE_API_MAX_WORKERS = int(os.getenv('GOOGLE_API_MAX_WORKERS', '4'))
+    # Daily lines (terms times days) allowed to the API key, and retries of rate-limited calls
+    GOOGLE_API_LINES_PER_DAY = int(os.getenv('GOOGLE_API_LINES_PER_DAY', '0'))
+    GOOGLE_API_MAX_RETRIES = int(os.getenv('GOOGLE_API_MAX_RETRIES', '3'))
+    # Directory of the cache of raw Google API responses, disabled if empty
+    GOOGLE_RESPONSE_CACHE_DIR = os.getenv('GOOGLE_RESPONSE_CACHE_DIR', '')
+    # Number of model scores persisted per transaction by the scheduler, in capped INSERTs
+    MODEL_SCORE_CHUNK_SIZE = int(os.getenv('MODEL_SCORE_CHUNK_SIZE', '250'))
+    # Directory of the static snapshots published by the scheduler, disabled if empty
+    SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', '')
+    SNAPSHOT_MAX_AGE = int(os.getenv('SNAPSHOT_MAX_AGE', '172800'))
 
 
 class DevelopmentConfig(Config):  # pylint: disable=too-few-public-methods
@@ -47,6 +74,8 @@ class TestingConfig(Config):  # pylint: disable=too-few-public-methods
     TESTING = True
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    # Tests run in a single process, where the in-process cache is always up to date
+    CACHE_ENABLED = os.getenv('CACHE_ENABLED', 'True') == 'True'
 
 
 class StagingConfig(Config):  # pylint: disable=too-few-public-methods
@@ -23,11 +23,11 @@ Commandline options for database management and testing
 import os
 import unittest
 from datetime import datetime
+from logging import INFO, basicConfig, log
 from flask_script import Manager
 from flask_migrate import Migrate, MigrateCommand
 
 from app import create_app, DB
-from scheduler import Scheduler
 
 MIGRATE = Migrate()
 
@@ -52,6 +52,7 @@ def test():
 @MANAGER.command
 def run_model_sched(model_ids_input, cron):
     """ Runs a scheduler to calculate model scores. """
+    from scheduler import Scheduler
     scheduler = Scheduler(APP)
     model_ids = [int(m) for m in model_ids_input.split(',')]
     scheduler.run_model(model_ids, cron)
@@ -62,9 +63,37 @@ def init_model(model_id, start_date, end_date):
     """ Calculates the first batch of scores """
     start = datetime.strptime(start_date, '%Y-%m-%d').date()
     end = datetime.strptime(end_date, '%Y-%m-%d').date()
+    from scheduler import Scheduler
     scheduler = Scheduler(APP)
     scheduler.init_model(model_id, start, end)
 
 
+@MANAGER.command
+def replay_google_cache(cache_dir):
+    """ Stores the Google scores of a cache of API responses, without calling the API """
+    from scheduler.response_cache import ResponseCache
+    from scheduler.score_calculator import replay_google_responses
+    with APP.app_context():
+        replay_google_responses(ResponseCache(cache_dir))
+
+
+@MANAGER.command
+def run_trends_stub(port='8090', latency='0', error_rate='0', calls_per_day='0'):
+    """ Runs a local stand-in for Google Health Trends API until interrupted """
+    import time
+    from scheduler.trends_stub_server import LocalTrendsServer
+    server = LocalTrendsServer(
+        int(port), float(latency), float(error_rate), calls_per_day=int(calls_per_day)
+    )
+    basicConfig(format='%(asctime)s %(levelname)s : %(message)s', level=INFO)
+    with server:
+        log(INFO, 'Set GOOGLE_DISCOVERY_URL=%s', server.discovery_url)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
 if __name__ == '__main__':
     MANAGER.run()
@@ -25,8 +25,6 @@ import logging
 from datetime import date
 from typing import List
 
-from apscheduler.schedulers.blocking import BlockingScheduler
-from apscheduler.triggers.cron import CronTrigger
 from flask_api import FlaskAPI
 
 from app.models_query_registry import has_model
@@ -42,11 +40,13 @@ class Scheduler:
     """
 
     def __init__(self, app: FlaskAPI = None):
+        from apscheduler.schedulers.blocking import BlockingScheduler
         self.flask_app = app
         self.scheduler = BlockingScheduler()
 
     def run_model(self, model_id_list: List[int], crontab: str):
         """ Adds the calculattion of model scores for an id to the scheduler """
+        from apscheduler.triggers.cron import CronTrigger
         with self.flask_app.app_context():
             for model_id in model_id_list:
                 if not has_model(model_id):
@@ -22,12 +22,15 @@
 
 from os import getenv
 import json
+import random
 import time
 from typing import List, Dict, Union
 
 from datetime import date, datetime, timedelta, time as dtime
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+
+from .quota_ledger import QuotaLedger
+from .rate_limiter import TokenBucketLimiter
+from .response_cache import ResponseCache
 
 SERVICE_NAME = 'trends'
 SERVICE_VERSION = 'v1beta'
@@ -37,6 +40,9 @@ _GEORESTRICTION_REGION = 'GB-ENG'
 _GOOGLE_API_KEY = getenv("GOOGLE_API_KEY", "")
 _ISO_FORMAT = '%Y-%m-%d'
 _TIMELINE_RESOLUTION = 'day'
+_BACKOFF_BASE_SECONDS = 1.0
+_BACKOFF_MAX_SECONDS = 64.0
+_RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
 
 
 class GoogleApiClient:
@@ -45,26 +51,45 @@ class GoogleApiClient:
     timeline resolution of 1 day.
     """
 
-    def __init__(self):
+    limiter = None
+    ledger = None
+    max_retries = 0
+    response_cache = None
+
+    def __init__(
+            self,
+            limiter: TokenBucketLimiter = None,
+            ledger: QuotaLedger = None,
+            max_retries: int = 3,
+            response_cache: ResponseCache = None
+    ):
+        from googleapiclient.discovery import build
         self.service = build(
             serviceName=SERVICE_NAME,
             version=SERVICE_VERSION,
-            discoveryServiceUrl=_DISCOVERY_SERVICE_URL,
+            discoveryServiceUrl=getenv('GOOGLE_DISCOVERY_URL', _DISCOVERY_SERVICE_URL),
             developerKey=_GOOGLE_API_KEY,
             cache_discovery=False,
             static_discovery=False
         )
         self.block_until = None
+        self.limiter = limiter
+        self.ledger = ledger
+        self.max_retries = max_retries
+        self.response_cache = response_cache
 
-    def fetch_google_scores(
+    def fetch_google_scores(  # pylint: disable=too-many-locals
             self, terms: List[str],
             start: date,
             end: date
         ) -> List[Dict[str, Union[str, List[Dict[str, Union[str, float]]]]]]:
         """
-        Retrieves data from Google trends.getTimelinesForHealth endpoint. It sleeps for 1
-        second before running a request to help prevent hitting the limit with subsequent
-        calls.
+        Retrieves data from Google trends.getTimelinesForHealth endpoint. It waits for the
+        rate limiter, or sleeps for 1 second without one, before running a request to help
+        prevent hitting the limit with subsequent calls. Requests rejected by the per-second
+        rate limit or with a 5xx error are retried up to max_retries times, after an
+        exponential backoff with jitter. With a response cache, requests already answered
+        are read from the cache and new responses are written to it.
         The returned collection contains a list of data points per term as in the example
         below
         [
@@ -96,6 +121,12 @@ class GoogleApiClient:
             }
         ]
         """
+        from googleapiclient.errors import HttpError
+        request = (terms, _GEORESTRICTION_REGION, start, end, _TIMELINE_RESOLUTION)
+        if self.response_cache is not None:
+            cached = self.response_cache.get(*request)
+            if cached is not None:
+                return cached['lines']
         if not self.is_accepting_calls():
             raise RuntimeError('API client blocked until %s' % self.block_until)
         graph = self.service.getTimelinesForHealth(
@@ -105,20 +136,51 @@ class GoogleApiClient:
             time_endDate=end.strftime(_ISO_FORMAT),
             timelineResolution=_TIMELINE_RESOLUTION
         )
-        time.sleep(1)  # sleep for 1 second to avoid hitting the rate limit
-        try:
-            response = graph.execute()
-            return response['lines']
-        except HttpError as http_error:
-            data = json.loads(http_error.content.decode('utf-8'))
-            code = data['error']['code']
-            reason = data['error']['errors'][0]['reason']
-            if code == 403 and reason == 'dailyLimitExceeded':
-                self.block_until = datetime.combine(date.today() + timedelta(days=1), dtime.min)
-                raise RuntimeError('%s: blocked until %s' % (reason, self.block_until))
-            import logging
-            logging.warning(http_error)
-            return []
+        lines = len(terms) * ((end - start).days + 1)
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_rate_limit()
+            self._record_call(lines)
+            try:
+                response = graph.execute()
+                if self.response_cache is not None:
+                    self.response_cache.put(*request, response)
+                return response['lines']
+            except HttpError as http_error:
+                data = json.loads(http_error.content.decode('utf-8'))
+                code = data['error']['code']
+                reason = data['error']['errors'][0]['reason']
+                if code == 403 and reason == 'dailyLimitExceeded':
+                    self._block_until_tomorrow()
+                    raise RuntimeError('%s: blocked until %s' % (reason, self.block_until))
+                import logging
+                if attempt < self.max_retries and (code >= 500 or reason in _RATE_LIMIT_REASONS):
+                    delay = self._backoff_delay(attempt)
+                    logging.warning('%s, retrying in %.1f seconds', http_error, delay)
+                    time.sleep(delay)
+                    continue
+                logging.warning(http_error)
+                return []
+        return []
+
+    @staticmethod
+    def _backoff_delay(attempt: int) -> float:
+        """ Random delay up to a cap that doubles with each attempt (full jitter) """
+        return random.uniform(0, min(_BACKOFF_MAX_SECONDS, _BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+    def _record_call(self, lines: int):
+        if self.ledger is not None:
+            self.ledger.record(1, lines)
+
+    def _block_until_tomorrow(self):
+        self.block_until = datetime.combine(date.today() + timedelta(days=1), dtime.min)
+        if self.ledger is not None:
+            self.ledger.mark_exhausted()
+
+    def _wait_for_rate_limit(self):
+        if self.limiter is not None:
+            self.limiter.acquire()
+        else:
+            time.sleep(1)  # sleep for 1 second to avoid hitting the rate limit
 
     def is_accepting_calls(self):
         """
@@ -131,6 +193,7 @@ class GoogleApiClient:
         Checks whether the API returns a non-zero value for the term temperature
         for the end date
         """
+        from googleapiclient.errors import HttpError
         start = end - timedelta(days=1)
         graph = self.service.getTimelinesForHealth(
             terms=['temperature'],
@@ -139,7 +202,8 @@ class GoogleApiClient:
             time_endDate=end.strftime(_ISO_FORMAT),
             timelineResolution=_TIMELINE_RESOLUTION
         )
-        time.sleep(1)  # sleep for 1 second to avoid hitting the rate limit
+        self._wait_for_rate_limit()
+        self._record_call(2)
         try:
             response = graph.execute()
             temperature_lines = response['lines'][0]
@@ -152,7 +216,7 @@ class GoogleApiClient:
             code = data['error']['code']
             reason = data['error']['errors'][0]['reason']
             if code == 403 and reason == 'dailyLimitExceeded':
-                self.block_until = datetime.combine(date.today() + timedelta(days=1), dtime.min)
+                self._block_until_tomorrow()
                 raise RuntimeError('%s: blocked until %s' % (reason, self.block_until))
             import logging
             logging.warning(http_error)
@@ -27,55 +27,96 @@ from typing import Iterator, List, Tuple
 
 _GOOGLE_TERMS_BATCH_SIZE = 30
 _GOOGLE_MAX_LINES = 2000
-_GOOGLE_MAX_INTERVAL_PER_BATCH = timedelta(days=66)
 
 
 class GoogleBatch:  # pylint: disable=too-few-public-methods
     """
     Container of query parameters for running requests on Google API. It processes
-    entries to comply with the limits set by the API, such as number of data points
-    returned and number of query terms
+    entries to comply with the limits set by the API, that is up to 30 terms and up to
+    2,000 lines (terms times days) per request, in as few requests as possible
     """
 
     def __init__(self, google_terms: List[str], collect_dates: List[Tuple[date, date]]):
         self._google_terms = google_terms
         self._collect_dates = collect_dates
-        self._batch_size = -1
+        self._plan = None
 
     def get_batch(self) -> Iterator[Tuple[List[str], date, date]]:
         """
         Returns a generator of a list of Google terms and dates to be collected from the API
         organised in batches of up to 30 terms as per API documentation
         """
-        for idx in range(0, len(self._google_terms), _GOOGLE_TERMS_BATCH_SIZE):
-            batch = self._google_terms[idx:idx + _GOOGLE_TERMS_BATCH_SIZE]
-            for collect_date in self._get_filtered_date_ranges():
-                yield batch, collect_date[0], collect_date[1]
-
-    def _get_size(self) -> int:
-        if self._batch_size == -1:
-            day_counter = 0
-            for date_range in self._collect_dates:
-                datediff = abs(date_range[1] - date_range[0])
-                day_counter += datediff.days + 1
-            self._batch_size = _GOOGLE_MAX_INTERVAL_PER_BATCH.days * day_counter
-        return self._batch_size
-
-    def _get_filtered_date_ranges(self) -> List[Tuple[date, date]]:
-        if self._get_size() > 2000:
-            filtered_date_ranges = []
-            for date_range in self._collect_dates:
-                interval_in_days = date_range[1] - date_range[0]
-                if interval_in_days > _GOOGLE_MAX_INTERVAL_PER_BATCH:
-                    range_start = date_range[0]
-                    for _ in range(interval_in_days // _GOOGLE_MAX_INTERVAL_PER_BATCH):
-                        range_end = range_start + _GOOGLE_MAX_INTERVAL_PER_BATCH
-                        shortened_range = (range_start, range_end)
-                        filtered_date_ranges.append(shortened_range)
-                        range_start = range_end + timedelta(days=1)
-                    if interval_in_days % _GOOGLE_MAX_INTERVAL_PER_BATCH:
-                        filtered_date_ranges.append((range_start, date_range[1]))
-                else:
-                    filtered_date_ranges.append(date_range)
-            return filtered_date_ranges
-        return self._collect_dates
+        return iter(self._get_plan())
+
+    def get_call_count(self) -> int:
+        """ Returns the number of requests planned """
+        return len(self._get_plan())
+
+    def _get_plan(self) -> List[Tuple[List[str], date, date]]:
+        """
+        For each date range (after merging adjacent ones) it picks the number of terms per
+        request that needs the fewest requests, then spreads the terms and the days evenly
+        across requests so that the last ones are not left nearly empty
+        """
+        if self._plan is None:
+            self._plan = []
+            if self._google_terms:
+                for range_start, range_end in _merge_date_ranges(self._collect_dates):
+                    days = (range_end - range_start).days + 1
+                    term_groups, day_chunks = _get_request_grid(len(self._google_terms), days)
+                    for terms in _split_evenly(self._google_terms, term_groups):
+                        for offset, length in _split_days_evenly(days, day_chunks):
+                            start = range_start + timedelta(days=offset)
+                            self._plan.append((terms, start, start + timedelta(days=length - 1)))
+                # Grouped by term batch and then date range
+                position = {term: idx for idx, term in enumerate(self._google_terms)}
+                self._plan.sort(key=lambda request: (position[request[0][0]], request[1]))
+        return self._plan
+
+
+def _merge_date_ranges(collect_dates: List[Tuple[date, date]]) -> List[Tuple[date, date]]:
+    """ Sorts the date ranges and merges the ones that overlap or follow each other """
+    merged = []
+    for range_start, range_end in sorted(collect_dates):
+        if merged and range_start <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], range_end))
+        else:
+            merged.append((range_start, range_end))
+    return merged
+
+
+def _get_request_grid(term_count: int, days: int) -> Tuple[int, int]:
+    """
+    Returns the number of term groups and of day chunks whose product, the number of
+    requests, is the smallest. Ties go to fewer term groups
+    """
+    grids = []
+    for terms_per_request in range(min(term_count, _GOOGLE_TERMS_BATCH_SIZE), 0, -1):
+        term_groups = -(-term_count // terms_per_request)
+        day_chunks = -(-days // (_GOOGLE_MAX_LINES // terms_per_request))
+        grids.append((term_groups, day_chunks))
+    # min keeps the first of equal grids, the one with the fewest term groups
+    return min(grids, key=lambda grid: grid[0] * grid[1])
+
+
+def _split_evenly(items: List[str], parts: int) -> List[List[str]]:
+    """ Splits a list into parts whose sizes differ by one at most, keeping the order """
+    result, idx = [], 0
+    for length in _even_sizes(len(items), parts):
+        result.append(items[idx:idx + length])
+        idx += length
+    return result
+
+
+def _split_days_evenly(days: int, parts: int) -> List[Tuple[int, int]]:
+    """ Returns the (offset, length) of parts of a number of days, as even as possible """
+    result, offset = [], 0
+    for length in _even_sizes(days, parts):
+        result.append((offset, length))
+        offset += length
+    return result
+
+
+def _even_sizes(total: int, parts: int) -> List[int]:
+    size, extra = divmod(total, parts)
+    return [size + 1 if part < extra else size for part in range(parts)]
@@ -0,0 +1,71 @@
+# i-sense flu api: REST API, and data processors for the i-sense flu service from UCL.
+# (c) 2019, UCL <https://www.ucl.ac.uk/
+#
+# This file is part of i-sense flu api
+#
+# i-sense flu api is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# i-sense flu api is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with i-sense flu api.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+ Runs the requests of a GoogleBatch on Google API from a bounded pool of threads, paced
+ by a shared rate limiter
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from threading import local
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from .google_api_client import GoogleApiClient
+
+
+class GoogleFetcher:  # pylint: disable=too-few-public-methods
+    """
+    Fetches the scores of several requests concurrently with up to max_workers threads.
+    Each thread uses its own API client, built by client_factory, since the clients are
+    not thread-safe. Results are yielded in the order of the requests
+    """
+
+    def __init__(
+            self,
+            client_factory: Callable[[], GoogleApiClient],
+            max_workers: int = 4
+    ):
+        self.client_factory = client_factory
+        self.max_workers = max(1, max_workers)
+        self._local = local()
+
+    def fetch(self, requests: List[Tuple[List[str], date, date]]) -> Iterator[List[Dict]]:
+        """
+        Yields the lines returned for each request (terms, start, end), in request order,
+        as soon as they and the ones before are available. Requests not started yet are
+        cancelled if the caller stops iterating or a request fails
+        """
+        if not requests:
+            return
+        workers = min(self.max_workers, len(requests))
+        executor = ThreadPoolExecutor(max_workers=workers)
+        futures = [executor.submit(self._fetch_one, *request) for request in requests]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def _fetch_one(self, terms: List[str], start: date, end: date) -> List[Dict]:
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.client_factory()
+        return client.fetch_google_scores(terms, start, end)
@@ -27,10 +27,6 @@ MQ_USER and MQ_PASSWORD: The credentials to publish on the message queue
 from datetime import date
 from os import getenv
 
-from stompest.sync.client import Stomp
-from stompest.config import StompConfig
-from stompest.protocol import StompSpec
-
 _MQ_URI = getenv("MQ_URI")
 _MQ_DEST = getenv("MQ_DEST")
 _MQ_USER = getenv("MQ_USER")
@@ -42,7 +38,8 @@ class MessageClient:
     STOMP sync client
     """
 
-    def __init__(self, stomp_config: StompConfig):
+    def __init__(self, stomp_config: 'StompConfig'):
+        from stompest.sync.client import Stomp
         self.client = Stomp(stomp_config)
 
     def publish_model_score(self, score_date: date, score_value: float):
@@ -65,6 +62,8 @@ def build_message_client() -> MessageClient:
     """
     Builds an instance of MessageClient provided all environment variables are defined
     """
+    from stompest.config import StompConfig
+    from stompest.protocol import StompSpec
     if not _MQ_URI:
         raise KeyError('MQ_URI environment variable missing')
     if not _MQ_DEST:
@@ -0,0 +1,84 @@
+# i-sense flu api: REST API, and data processors for the i-sense flu service from UCL.
+# (c) 2019, UCL <https://www.ucl.ac.uk/
+#
+# This file is part of i-sense flu api
+#
+# i-sense flu api is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# i-sense flu api is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with i-sense flu api.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+ Buffer of the model scores computed during a run, persisted in bulk so that a backfill
+ does not pay a commit per day
+"""
+
+from datetime import date
+from logging import ERROR, log
+from typing import Dict, List, Tuple
+
+from app.models_query_registry import BULK_INSERT_CHUNK_SIZE, DEFAULT_REGION, set_model_scores
+
+
+class ModelScoreWriter:
+    """
+    Collects model scores and persists them in one transaction per chunk of chunk_size
+    scores. Used as a context manager, the scores still buffered are flushed on exit, also
+    when the run fails, so the scores computed so far are kept
+    """
+
+    def __init__(self, chunk_size: int = BULK_INSERT_CHUNK_SIZE):
+        self.chunk_size = max(1, chunk_size)
+        self._rows = []
+
+    def add(
+            self,
+            model_id: int,
+            score_date: date,
+            score_value: float,
+            confidence_interval: Tuple[float, float] = (None, None),
+            region: str = DEFAULT_REGION
+    ):
+        """ Buffers a model score, flushing the buffer once it holds a full chunk """
+        self._rows.append({
+            'flu_model_id': model_id,
+            'region': region,
+            'score_date': score_date,
+            'score_value': score_value,
+            'confidence_interval_lower': confidence_interval[0],
+            'confidence_interval_upper': confidence_interval[1]
+        })
+        if len(self._rows) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """ Persists the buffered scores """
+        rows, self._rows = self._rows, []
+        if rows:
+            set_model_scores(rows, self.chunk_size)
+
+    @property
+    def pending(self) -> List[Dict]:
+        """ Scores buffered and not yet persisted """
+        return list(self._rows)
+
+    def __enter__(self) -> 'ModelScoreWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+            return
+        try:
+            self.flush()
+        except Exception as error:  # pylint: disable=broad-except
+            # Do not mask the error that interrupted the run
+            log(ERROR, 'Failed to persist the model scores computed before the error: %s', error)
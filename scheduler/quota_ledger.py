@@ -0,0 +1,80 @@
+# i-sense flu api: REST API, and data processors for the i-sense flu service from UCL.
+# (c) 2019, UCL <https://www.ucl.ac.uk/
+#
+# This file is part of i-sense flu api
+#
+# i-sense flu api is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# i-sense flu api is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with i-sense flu api.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+ Ledger of the quota of Google API used per API key and per day. Usage is recorded by the
+ client threads and persisted by the scheduler, so it survives a restart of the process
+"""
+
+import hashlib
+from datetime import date
+from threading import Lock
+from typing import Callable
+
+from app.models_query_registry import add_google_api_usage, get_google_api_usage
+
+
+class QuotaLedger:
+    """
+    Counts the calls and lines (terms times days) requested with an API key. The daily
+    limits are given by daily_calls and daily_lines, 0 for no limit. Recording is thread-safe
+    and kept in memory until flush, which must run within the application context
+    """
+
+    def __init__(
+            self,
+            api_key: str,
+            daily_calls: int = 0,
+            daily_lines: int = 0,
+            today: Callable[[], date] = date.today
+    ):
+        self.key_id = hashlib.sha1(api_key.encode('utf-8')).hexdigest()[:16]
+        self.daily_calls = daily_calls
+        self.daily_lines = daily_lines
+        self._today = today
+        self._pending = {}
+        self._lock = Lock()
+
+    def record(self, calls: int = 1, lines: int = 0):
+        """ Counts calls made today and the lines they requested """
+        with self._lock:
+            entry = self._pending.setdefault(self._today(), [0, 0, False])
+            entry[0] += calls
+            entry[1] += lines
+
+    def mark_exhausted(self):
+        """ Records that the API rejected a call because the daily limit was reached """
+        with self._lock:
+            self._pending.setdefault(self._today(), [0, 0, False])[2] = True
+
+    def flush(self):
+        """ Persists the usage recorded since the last flush """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for usage_date, (calls, lines, is_exhausted) in sorted(pending.items()):
+            add_google_api_usage(self.key_id, usage_date, calls, lines, is_exhausted)
+
+    def has_quota(self, calls: int, lines: int = 0) -> bool:
+        """ Checks whether calls requesting that many lines fit in what is left for today """
+        self.flush()
+        used_calls, used_lines, is_exhausted = get_google_api_usage(self.key_id, self._today())
+        if is_exhausted:
+            return False
+        if self.daily_calls and used_calls + calls > self.daily_calls:
+            return False
+        return not self.daily_lines or used_lines + lines <= self.daily_lines
@@ -0,0 +1,93 @@
+# i-sense flu api: REST API, and data processors for the i-sense flu service from UCL.
+# (c) 2019, UCL <https://www.ucl.ac.uk/
+#
+# This file is part of i-sense flu api
+#
+# i-sense flu api is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# i-sense flu api is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with i-sense flu api.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+ Token-bucket limiter pacing the calls to Google API to the quota of the project
+"""
+
+import time
+from datetime import date
+from threading import Lock
+from typing import Callable
+
+
+class TokenBucketLimiter:  # pylint: disable=too-many-instance-attributes
+    """
+    Allows up to per_second calls per second, with bursts of the same size, and up to
+    per_day calls per calendar day. A limit of 0 disables it. Callers wait for a token
+    of the per-second bucket, and get a RuntimeError once the daily calls are used up
+    """
+
+    def __init__(
+            self,
+            per_second: float = 1.0,
+            per_day: int = 0,
+            clock: Callable[[], float] = time.monotonic,
+            sleep: Callable[[float], None] = time.sleep,
+            today: Callable[[], date] = date.today
+    ):
+        self.per_second = per_second
+        self.per_day = per_day
+        self._clock = clock
+        self._sleep = sleep
+        self._today = today
+        self._capacity = max(1.0, per_second)
+        self._tokens = self._capacity
+        self._refilled_at = clock()
+        self._day = today()
+        self._day_calls = 0
+        self._lock = Lock()
+
+    def acquire(self):
+        """ Blocks until a call is allowed and counts it """
+        with self._lock:
+            self._take_daily_call()
+            if not self.per_second:
+                return
+            while True:
+                now = self._clock()
+                self._tokens = min(
+                    self._capacity, self._tokens + (now - self._refilled_at) * self.per_second
+                )
+                self._refilled_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                # Holding the lock keeps the waiting callers in line
+                self._sleep((1 - self._tokens) / self.per_second)
+
+    @property
+    def remaining_today(self) -> float:
+        """ Calls left for the current day, infinite without a daily limit """
+        if not self.per_day:
+            return float('inf')
+        with self._lock:
+            self._roll_day()
+            return self.per_day - self._day_calls
+
+    def _take_daily_call(self):
+        self._roll_day()
+        if self.per_day and self._day_calls >= self.per_day:
+            raise RuntimeError('Daily limit of %d calls to Google API reached' % self.per_day)
+        self._day_calls += 1
+
+    def _roll_day(self):
+        today = self._today()
+        if today != self._day:
+            self._day = today
+            self._day_calls = 0
@@ -0,0 +1,142 @@
+# i-sense flu api: REST API, and data processors for the i-sense flu service from UCL.
+# (c) 2019, UCL <https://www.ucl.ac.uk/
+#
+# This file is part of i-sense flu api
+#
+# i-sense flu api is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# i-sense flu api is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with i-sense flu api.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+ On-disk cache of the raw responses of Google Health Trends API. Each response is stored
+ gzip-compressed under the digest of its request (terms, region, start, end, resolution),
+ so a request already answered is never sent again and past responses can be replayed
+ into the database. Responses ending in the last few days are not stored, as Google may
+ still revise their scores
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import os
+from datetime import date, timedelta
+from logging import WARNING, log
+from tempfile import NamedTemporaryFile
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+_ISO_FORMAT = '%Y-%m-%d'
+
+# Age in days from which the scores of a date are final, as for the scheduled runs
+_MIN_AGE_DAYS = 4
+
+
+class ResponseCache:
+    """
+    Directory of responses named <digest>.json.gz, spread over sub-directories named after
+    the first two characters of the digest. Each file holds the request and the response
+    """
+
+    def __init__(self, directory: str, today: Callable[[], date] = date.today):
+        self.directory = directory
+        self._today = today
+
+    def get(
+            self,
+            terms: List[str],
+            region: str,
+            start: date,
+            end: date,
+            resolution: str
+    ) -> Optional[Dict]:
+        """ Returns the response cached for a request, None if missing or unreadable """
+        path = self._path(_build_request(terms, region, start, end, resolution))
+        try:
+            with gzip.open(path, 'rb') as cache_file:
+                return json.loads(cache_file.read().decode('utf-8'))['response']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(  # pylint: disable=too-many-arguments
+            self,
+            terms: List[str],
+            region: str,
+            start: date,
+            end: date,
+            resolution: str,
+            response: Dict
+    ):
+        """
+        Stores the response of a request, replacing any previous one atomically. Responses
+        ending less than _MIN_AGE_DAYS days ago are not stored
+        """
+        if end > self._today() - timedelta(days=_MIN_AGE_DAYS):
+            return
+        request = _build_request(terms, region, start, end, resolution)
+        path = self._path(request)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        content = json.dumps({'request': request, 'response': response}).encode('utf-8')
+        tmp = NamedTemporaryFile(dir=os.path.dirname(path), prefix='.tmp-', delete=False)
+        try:
+            with tmp:
+                tmp.write(_gzip_compress(content))
+            os.replace(tmp.name, path)
+        except Exception:
+            os.remove(tmp.name)
+            raise
+
+    def entries(self) -> Iterator[Tuple[Dict, Dict]]:
+        """
+        Yields the (request, response) pairs of the cache, in the order of their digest.
+        Unreadable files are logged and skipped
+        """
+        if not os.path.isdir(self.directory):
+            return
+        for sub_directory in sorted(os.listdir(self.directory)):
+            sub_path = os.path.join(self.directory, sub_directory)
+            if not os.path.isdir(sub_path):
+                continue
+            for filename in sorted(os.listdir(sub_path)):
+                if not filename.endswith('.json.gz'):
+                    continue
+                file_path = os.path.join(sub_path, filename)
+                try:
+                    with gzip.open(file_path, 'rb') as cache_file:
+                        entry = json.loads(cache_file.read().decode('utf-8'))
+                    request, response = entry['request'], entry['response']
+                except (OSError, ValueError, KeyError) as error:
+                    log(WARNING, 'Skipped unreadable cached response %s: %s', file_path, error)
+                    continue
+                yield request, response
+
+    def _path(self, request: Dict) -> str:
+        digest = hashlib.sha256(json.dumps(request, sort_keys=True).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest + '.json.gz')
+
+
+def _gzip_compress(data: bytes) -> bytes:
+    """ Compresses data with a fixed mtime, so that equal responses give equal files """
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0) as gzip_file:
+        gzip_file.write(data)
+    return buffer.getvalue()
+
+
+def _build_request(terms: List[str], region: str, start: date, end: date, resolution: str) -> Dict:
+    """ Canonical form of a request, the order of the terms does not matter """
+    return {
+        'terms': sorted(terms),
+        'region': region,
+        'start': start.strftime(_ISO_FORMAT),
+        'end': end.strftime(_ISO_FORMAT),
+        'resolution': resolution
+    }
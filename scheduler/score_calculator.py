@@ -23,14 +23,22 @@
 from datetime import date, timedelta
 from logging import ERROR, INFO, WARNING, log, basicConfig
 from os import getenv
-from typing import List
+from typing import List, Tuple
 
+from flask import current_app
 from flask_api import FlaskAPI
 
-from app.models_query_registry import get_last_google_date
+from app.models_query_registry import BULK_INSERT_CHUNK_SIZE, get_last_google_date, \
+    get_last_google_dates, get_google_terms_missing_scores
+from app.snapshot import publish_snapshots
 from .calculator_builder import build_calculator, CalculatorType
 from .google_api_client import GoogleApiClient
+from .google_fetcher import GoogleFetcher
 from .message_client import build_message_client
+from .model_score_writer import ModelScoreWriter
+from .quota_ledger import QuotaLedger
+from .rate_limiter import TokenBucketLimiter
+from .response_cache import ResponseCache
 from .score_query_registry import get_date_ranges_google_score,\
     get_google_batch,\
     set_and_verify_google_dates,\
@@ -39,7 +47,12 @@ from .score_query_registry import get_date_ranges_google_score,\
     set_and_get_model_score, \
     get_matlab_function_attr,\
     get_moving_averages_or_scores,\
-    set_google_scores_except
+    set_google_scores_except,\
+    get_pending_google_requests,\
+    set_google_request_completed,\
+    clear_google_request_checkpoints,\
+    get_google_batch_for_terms,\
+    get_google_terms_of_models
 
 basicConfig(format='%(asctime)s %(levelname)s : %(message)s', level=INFO)
 
@@ -48,41 +61,38 @@ def run(model_id: int, start: date, end: date):  # pylint: disable=too-many-loca
     """ Calculate the model score for the date range specified """
     missing_google_range, missing_google_list = get_date_ranges_google_score(model_id, start, end)
     if missing_google_range and missing_google_list:
-        batch = get_google_batch(model_id, missing_google_range)
-        api_client = GoogleApiClient()
+        requests = list(get_google_batch(model_id, missing_google_range))
+        pending = get_pending_google_requests(requests)  # Resume after an interrupted run
+        log(INFO, 'Planned %d calls to Google API, %d pending', len(requests), len(pending))
+        ledger = _get_quota_ledger()
+        _check_quota(ledger, pending, extra_calls=1)  # The temperature check is one more call
+        api_client = GoogleApiClient(_get_rate_limiter(), ledger)
         if api_client.is_returning_non_zero_for_temperature(end):
-            for terms, start_date, end_date in batch:
-                batch_scores = api_client.fetch_google_scores(terms, start_date, end_date)
-                if not batch_scores:
-                    log(ERROR, 'Retrieval of Google scores failed')
-                    raise RuntimeError('Retry call to Google API')
-                set_google_scores(batch_scores)
-            set_and_verify_google_dates(model_id, missing_google_list)  # Raise an error if missing data
+            try:
+                for request, batch_scores in zip(pending, _build_fetcher().fetch(pending)):
+                    if not batch_scores:
+                        log(ERROR, 'Retrieval of Google scores failed')
+                        raise RuntimeError('Retry call to Google API')
+                    set_google_scores(batch_scores)
+                    set_google_request_completed(*request)
+                    ledger.flush()
+            finally:
+                ledger.flush()
+            try:
+                # Raise an error if missing data
+                set_and_verify_google_dates(model_id, missing_google_list)
+            finally:
+                clear_google_request_checkpoints(requests)
         else:
-            log(WARNING, 'Google API has returned zero for the term temperature. Not fetching scores')
+            log(
+                WARNING,
+                'Google API has returned zero for the term temperature. Not fetching scores'
+            )
     else:
         log(INFO, 'Google scores have already been collected for this time period')
     missing_model_dates = get_dates_missing_model_score(model_id, start, end)
     if missing_model_dates:
-        model_function = get_matlab_function_attr(model_id)
-        msg_score = None
-        msg_date = None
-        calculator_type = CalculatorType[getenv('CALCULATOR_TYPE', 'OCTAVE')]
-        calculator_engine = build_calculator(calculator_type)
-        for missing_model_date in missing_model_dates:
-            scores_or_averages = get_moving_averages_or_scores(
-                model_id,
-                model_function['average_window_size'],
-                missing_model_date
-            )
-            msg_score = set_and_get_model_score(
-                model_id,
-                calculator_engine,
-                (model_function['matlab_function'], model_function['has_confidence_interval']),
-                scores_or_averages,
-                missing_model_date
-            )
-            msg_date = missing_model_date
+        msg_date, msg_score = _calculate_model_scores(model_id, missing_model_dates)
         if getenv('TWITTER_ENABLED') and int(getenv('TWITTER_MODEL_ID')) == model_id:
             mq_client = build_message_client()
             mq_client.publish_model_score(msg_date, msg_score)
@@ -99,38 +109,24 @@ def _run_sched_for_model_no_set_dates(model_id:int):
     expected_end_date = date.today() - timedelta(days=4)  # TODO: remove end date from the API call
     start = last_score_date + timedelta(days=1)
     if last_score_date < expected_end_date:
-        missing_google_range, missing_google_list = get_date_ranges_google_score(model_id, start, expected_end_date)
+        missing_google_range, missing_google_list = get_date_ranges_google_score(
+            model_id, start, expected_end_date
+        )
         if missing_google_range and missing_google_list:
-            batch = get_google_batch(model_id, missing_google_range)
-            api_client = GoogleApiClient()
-            for terms, start_date, end_date in batch:
-                batch_scores = api_client.fetch_google_scores(terms, last_score_date, end_date)
-                assert batch_scores, 'Retrieval of Google scores failed. Retry call to Google API'
-                set_google_scores_except(batch_scores, last_score_date)
-            set_and_verify_google_dates(model_id, missing_google_list)
+            # Requests start on the last stored date, whose scores are fetched but not stored
+            requests = list(get_google_batch(model_id, [(last_score_date, expected_end_date)]))
+            # Terms shared with a model of the same run are already stored
+            requests = _drop_stored_terms(requests, start, expected_end_date)
+            _fetch_google_requests(requests, last_score_date)
+            try:
+                set_and_verify_google_dates(model_id, missing_google_list)
+            finally:
+                clear_google_request_checkpoints(requests)
     else:
         log(INFO, 'Google scores have already been collected for this time period')
     missing_model_dates = get_dates_missing_model_score(model_id, start, expected_end_date)
     if missing_model_dates:
-        model_function = get_matlab_function_attr(model_id)
-        msg_score = None
-        msg_date = None
-        calculator_type = CalculatorType[getenv('CALCULATOR_TYPE', 'OCTAVE')]
-        calculator_engine = build_calculator(calculator_type)
-        for missing_model_date in missing_model_dates:
-            scores_or_averages = get_moving_averages_or_scores(
-                model_id,
-                model_function['average_window_size'],
-                missing_model_date
-            )
-            msg_score = set_and_get_model_score(
-                model_id,
-                calculator_engine,
-                (model_function['matlab_function'], model_function['has_confidence_interval']),
-                scores_or_averages,
-                missing_model_date
-            )
-            msg_date = missing_model_date
+        msg_date, msg_score = _calculate_model_scores(model_id, missing_model_dates)
         if getenv('TWITTER_ENABLED') and int(getenv('TWITTER_MODEL_ID')) == model_id:
             mq_client = build_message_client()
             mq_client.publish_model_score(msg_date, msg_score)
@@ -139,8 +135,185 @@ def _run_sched_for_model_no_set_dates(model_id:int):
         log(INFO, 'Model scores have already been collected for this time period')
 
 
+def _fetch_google_requests(requests: List[Tuple[List[str], date, date]], except_date: date):
+    """
+    Fetches the requests to Google API without a checkpoint and stores their scores, except
+    the ones of except_date, recording a checkpoint after each request
+    """
+    pending = get_pending_google_requests(requests)  # Resume after an interrupted run
+    log(INFO, 'Planned %d calls to Google API, %d pending', len(requests), len(pending))
+    ledger = _get_quota_ledger()
+    _check_quota(ledger, pending)
+    try:
+        for request, batch_scores in zip(pending, _build_fetcher().fetch(pending)):
+            assert batch_scores, 'Retrieval of Google scores failed. Retry call to Google API'
+            set_google_scores_except(batch_scores, except_date)
+            set_google_request_completed(*request)
+            ledger.flush()
+    finally:
+        ledger.flush()
+
+
+def _drop_stored_terms(
+        requests: List[Tuple[List[str], date, date]],
+        start: date,
+        end: date
+) -> List[Tuple[List[str], date, date]]:
+    """ Removes from the requests the terms whose scores are all stored from start to end """
+    terms = sorted({term for request_terms, _, _ in requests for term in request_terms})
+    missing = set(get_google_terms_missing_scores(terms, start, end))
+    requests = [
+        ([term for term in request_terms if term in missing], request_start, request_end)
+        for request_terms, request_start, request_end in requests
+    ]
+    return [request for request in requests if request[0]]
+
+
+def _prefetch_shared_google_scores(model_id_list: List[int]):
+    """
+    Fetches once the Google scores missing for the union of the terms of the models, so
+    that terms shared by several models are not requested for each of them. Models are
+    grouped by their last Google date, which sets the window of their requests
+    """
+    expected_end_date = date.today() - timedelta(days=4)
+    windows = {}
+    last_google_dates = get_last_google_dates(model_id_list)
+    for model_id in model_id_list:
+        last_score_date = last_google_dates.get(model_id)
+        if last_score_date is None \
+                or not date.today() - timedelta(days=66) < last_score_date < expected_end_date:
+            continue  # Left to the run of the model
+        start = last_score_date + timedelta(days=1)
+        _, missing_google_list = get_date_ranges_google_score(model_id, start, expected_end_date)
+        if missing_google_list:
+            windows.setdefault(last_score_date, []).append(model_id)
+    for last_score_date, model_ids in sorted(windows.items()):
+        start = last_score_date + timedelta(days=1)
+        terms = get_google_terms_missing_scores(
+            get_google_terms_of_models(model_ids), start, expected_end_date
+        )
+        requests = list(get_google_batch_for_terms(terms, [(last_score_date, expected_end_date)]))
+        _fetch_google_requests(requests, last_score_date)
+        clear_google_request_checkpoints(requests)
+
+
+def _calculate_model_scores(model_id: int, missing_model_dates: List[date]) -> Tuple[date, float]:
+    """
+    Calculates the model scores for a list of dates and persists them in chunks of
+    MODEL_SCORE_CHUNK_SIZE. Returns the last date calculated and its score
+    """
+    model_function = get_matlab_function_attr(model_id)
+    msg_score = None
+    msg_date = None
+    calculator_type = CalculatorType[getenv('CALCULATOR_TYPE', 'OCTAVE')]
+    calculator_engine = build_calculator(calculator_type)
+    chunk_size = current_app.config.get('MODEL_SCORE_CHUNK_SIZE', BULK_INSERT_CHUNK_SIZE)
+    try:
+        with ModelScoreWriter(chunk_size) as writer:
+            for missing_model_date in missing_model_dates:
+                scores_or_averages = get_moving_averages_or_scores(
+                    model_id,
+                    model_function['average_window_size'],
+                    missing_model_date
+                )
+                msg_score = set_and_get_model_score(
+                    model_id,
+                    calculator_engine,
+                    (model_function['matlab_function'], model_function['has_confidence_interval']),
+                    scores_or_averages,
+                    missing_model_date,
+                    writer
+                )
+                msg_date = missing_model_date
+    finally:
+        # Scores flushed before an error are kept and must not be hidden by the cache
+        _invalidate_cached_scores(model_id)
+    return msg_date, msg_score
+
+
+def _get_rate_limiter() -> TokenBucketLimiter:
+    """ Rate limiter shared by all the calls to Google API made by the process """
+    limiter = current_app.extensions.get('google_rate_limiter')
+    if limiter is None:
+        limiter = current_app.extensions['google_rate_limiter'] = TokenBucketLimiter(
+            current_app.config.get('GOOGLE_API_CALLS_PER_SECOND', 1.0),
+            current_app.config.get('GOOGLE_API_CALLS_PER_DAY', 0)
+        )
+    return limiter
+
+
+def _get_quota_ledger() -> QuotaLedger:
+    """ Ledger of the quota used by the API key of the process """
+    ledger = current_app.extensions.get('google_quota_ledger')
+    if ledger is None:
+        ledger = current_app.extensions['google_quota_ledger'] = QuotaLedger(
+            getenv('GOOGLE_API_KEY', ''),
+            current_app.config.get('GOOGLE_API_CALLS_PER_DAY', 0),
+            current_app.config.get('GOOGLE_API_LINES_PER_DAY', 0)
+        )
+    return ledger
+
+
+def _check_quota(ledger: QuotaLedger, requests: List[Tuple[List[str], date, date]], extra_calls=0):
+    """ Raises an error if the quota left today cannot cover the requests of a run """
+    calls = len(requests) + extra_calls
+    lines = sum(len(terms) * ((end - start).days + 1) for terms, start, end in requests)
+    if not ledger.has_quota(calls, lines):
+        log(ERROR, 'Not enough Google API quota left today for %d calls and %d lines', calls, lines)
+        raise RuntimeError('Google API quota exhausted, retry tomorrow')
+
+
+def _build_fetcher() -> GoogleFetcher:
+    """ Fetcher running GOOGLE_API_MAX_WORKERS requests at a time under the rate limiter """
+    limiter = _get_rate_limiter()
+    ledger = _get_quota_ledger()
+    max_retries = current_app.config.get('GOOGLE_API_MAX_RETRIES', 3)
+    cache_dir = current_app.config.get('GOOGLE_RESPONSE_CACHE_DIR')
+    response_cache = ResponseCache(cache_dir) if cache_dir else None
+    return GoogleFetcher(
+        lambda: GoogleApiClient(limiter, ledger, max_retries, response_cache),
+        current_app.config.get('GOOGLE_API_MAX_WORKERS', 4)
+    )
+
+
+def replay_google_responses(response_cache: ResponseCache, batch_size: int = 50) -> int:
+    """
+    Stores the Google scores of every response of a cache, without calling the API, with
+    one bulk insert per batch_size responses. Returns the number of responses replayed
+    """
+    count = 0
+    lines = []
+    for _, response in response_cache.entries():
+        lines.extend(response.get('lines', []))
+        count += 1
+        if count % batch_size == 0:
+            set_google_scores(lines)
+            lines = []
+    if lines:
+        set_google_scores(lines)
+    log(INFO, 'Replayed %d cached Google API responses', count)
+    return count
+
+
+def _invalidate_cached_scores(model_id: int):
+    """ Fires the cache invalidation of a model once new scores have been stored """
+    current_app.extensions['cache'].invalidate(model_id)
+
+
 def runsched(model_id_list: List[int], app: FlaskAPI):
     """ Calculate the model score for the date range specified inside the scheduler """
+    from googleapiclient.errors import HttpError
     with app.app_context():
+        if len(model_id_list) > 1:
+            try:
+                _prefetch_shared_google_scores(model_id_list)
+            except (HttpError, OSError, RuntimeError, ValueError) as error:
+                log(
+                    WARNING,
+                    'Shared retrieval of Google scores failed, each model fetches its own: %s',
+                    error
+                )
         for model_id in model_id_list:
             _run_sched_for_model_no_set_dates(model_id)
+            if app.config.get('SNAPSHOT_DIR'):
+                publish_snapshots(app)
@@ -20,15 +20,20 @@
  Registry of data access functions used in the calculation of model scores
 """
 
+import hashlib
+import json
 from datetime import date, datetime as dt, timedelta
+from logging import ERROR, log
 from typing import Dict, Iterator, List, Tuple, Union
 
 from app.models_query_registry import get_existing_google_dates, get_google_terms_for_model_id, \
-    set_google_scores_for_term, set_google_date_for_model_id, get_existing_model_dates, \
+    set_google_scores_for_terms, set_google_dates_for_model_id, get_existing_model_dates, \
     get_google_terms_and_scores, get_google_terms_and_averages, set_model_score, \
-    set_model_score_confidence_interval, get_model_function
+    set_model_score_confidence_interval, get_model_function, get_google_batch_checkpoints, \
+    set_google_batch_checkpoint, delete_google_batch_checkpoints
 from .calculator_builder import Calculator
 from .google_batch import GoogleBatch
+from .model_score_writer import ModelScoreWriter
 
 
 def get_days_missing_google_score(model_id: int, start: date, end: date) -> int:
@@ -81,22 +86,68 @@ def get_google_batch(
     organised in batches of up to 30 terms as per API documentation
     """
     google_terms = [t[0] for t in get_google_terms_for_model_id(model_id)]
+    return get_google_batch_for_terms(google_terms, collect_dates)
+
+
+def get_google_batch_for_terms(
+        google_terms: List[str],
+        collect_dates: List[Tuple[date, date]]
+) -> Iterator[Tuple[List[str], date, date]]:
+    """
+    Returns a generator of batches of Google terms and dates, as get_google_batch, for
+    terms not tied to a single model
+    """
     google_batch = GoogleBatch(google_terms, collect_dates)
     return google_batch.get_batch()
 
 
+def get_google_terms_of_models(model_ids: List[int]) -> List[str]:
+    """ Returns the union of the Google terms of several models """
+    return sorted({t[0] for model_id in model_ids for t in get_google_terms_for_model_id(model_id)})
+
+
+def get_google_batch_key(terms: List[str], start: date, end: date) -> str:
+    """ Returns the key identifying a request to Google API in the batch checkpoints """
+    request = json.dumps([sorted(terms), start.isoformat(), end.isoformat()])
+    return hashlib.sha1(request.encode('utf-8')).hexdigest()
+
+
+def get_pending_google_requests(
+        requests: List[Tuple[List[str], date, date]]
+) -> List[Tuple[List[str], date, date]]:
+    """
+    Returns the requests to Google API (terms, start, end) without a checkpoint, that is
+    whose scores have not been persisted by an earlier, interrupted run
+    """
+    completed = set(get_google_batch_checkpoints([get_google_batch_key(*r) for r in requests]))
+    return [r for r in requests if get_google_batch_key(*r) not in completed]
+
+
+def set_google_request_completed(terms: List[str], start: date, end: date):
+    """ Records the checkpoint of a request to Google API whose scores have been persisted """
+    set_google_batch_checkpoint(get_google_batch_key(terms, start, end), start, end, len(terms))
+
+
+def clear_google_request_checkpoints(requests: List[Tuple[List[str], date, date]]):
+    """ Removes the checkpoints of the requests of a run once its dates have been verified """
+    delete_google_batch_checkpoints([get_google_batch_key(*r) for r in requests])
+
+
 def set_google_scores(
         google_scores: List[Dict[str, Union[str, List[Dict[str, Union[str, float]]]]]]
 ):
     """
     Iterates through the batch item to reformat the data points from dictionary to a tuple
-    before persisting the data. It parses the data converting it into a datetime.date
+    before persisting the data of all terms at once. It parses the data converting it into
+    a datetime.date
     """
+    term_points = []
     for batch_item in google_scores:
         points = [
             (dt.strptime(p['date'], '%b %d %Y').date(), p['value']) for p in batch_item['points']
         ]
-        set_google_scores_for_term(batch_item['term'], points)
+        term_points.append((batch_item['term'], points))
+    set_google_scores_for_terms(term_points)
 
 
 def set_google_scores_except(
@@ -105,9 +156,10 @@ def set_google_scores_except(
 ):
     """
     Iterates through the batch item to reformat the data points from dictionary to a tuple
-    before persisting the data. It parses the data converting it into a datetime.date
-    It skips the date set by except_date
+    before persisting the data of all terms at once. It parses the data converting it into
+    a datetime.date. It skips the date set by except_date
     """
+    term_points = []
     for batch_item in google_scores:
         points = [
             (
@@ -115,15 +167,22 @@ def set_google_scores_except(
                 p['value']
             ) for p in batch_item['points'] if dt.strptime(p['date'], '%b %d %Y').date() != except_date
         ]
-        set_google_scores_for_term(batch_item['term'], points)
+        term_points.append((batch_item['term'], points))
+    set_google_scores_for_terms(term_points)
 
 
 def set_and_verify_google_dates(model_id: int, google_dates: List[date]):
     """
-    Persists the date of a complete set of scores if retrieved for all terms in a model
+    Persists the dates of a complete set of scores if retrieved for all terms in a model.
+    Raises an error listing the dates missing the score of some terms
     """
-    for google_date in google_dates:
-        set_google_date_for_model_id(model_id, google_date)
+    incomplete = set_google_dates_for_model_id(model_id, google_dates)
+    if incomplete:
+        for google_date, terms in sorted(incomplete.items()):
+            log(ERROR, 'Terms with missing scores for date %s: %s', google_date, ', '.join(terms))
+        raise ValueError('Terms with missing scores for dates %s' % ', '.join(
+            str(google_date) for google_date in sorted(incomplete)
+        ))
 
 
 def get_dates_missing_model_score(model_id: int, start: date, end: date) -> List[date]:
@@ -151,26 +210,34 @@ def get_moving_averages_or_scores(
     return get_google_terms_and_averages(model_id, avg_window_size, for_date)
 
 
-def set_and_get_model_score(
+def set_and_get_model_score(  # pylint: disable=too-many-arguments
         model_id: int,
         calculator: Calculator,
         matlab_function: Tuple[str, bool],
         google_scores: List[Tuple[str, float]],
-        score_date: date
+        score_date: date,
+        writer: ModelScoreWriter = None
 ) -> float:
     """
-    Calculates and persists the model score for a date
+    Calculates and persists the model score for a date. With a writer, the score is
+    buffered and persisted when the writer flushes
     """
     with_confidence_interval = matlab_function[1]
     if not with_confidence_interval:
         score = calculator.calculate_model_score(matlab_function[0], google_scores)
-        set_model_score(model_id, score_date, score)
+        if writer is not None:
+            writer.add(model_id, score_date, score)
+        else:
+            set_model_score(model_id, score_date, score)
         return score
     score, lower, upper = calculator.calculate_model_score_and_confidence(
         matlab_function[0],
         google_scores
     )
-    set_model_score_confidence_interval(model_id, score_date, score, (lower, upper))
+    if writer is not None:
+        writer.add(model_id, score_date, score, (lower, upper))
+    else:
+        set_model_score_confidence_interval(model_id, score_date, score, (lower, upper))
     return score
 
 
@@ -0,0 +1,221 @@
+# i-sense flu api: REST API, and data processors for the i-sense flu service from UCL.
+# (c) 2019, UCL <https://www.ucl.ac.uk/
+#
+# This file is part of i-sense flu api
+#
+# i-sense flu api is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# i-sense flu api is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with i-sense flu api.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+ Local stand-in for Google Health Trends API, to measure the ingestion offline. It serves
+ the discovery document and getTimelinesForHealth, answering with synthetic lines that
+ only depend on the term and the date. Latency, server errors and quota limits can be
+ injected. Point GoogleApiClient at it with the GOOGLE_DISCOVERY_URL environment variable
+"""
+
+import hashlib
+import json
+import random
+import socketserver
+import time
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from threading import Lock
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from app.local_servers import LocalServer
+
+DISCOVERY_PATH = '/discovery/v1/apis/trends/v1beta/rest'
+TIMELINES_PATH = '/trends/v1beta/timelinesForHealth'
+
+_MAX_TERMS = 30
+_POINT_DATE_FORMAT = '%b %d %Y'
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class LocalTrendsServer(LocalServer):  # pylint: disable=too-many-instance-attributes
+    """
+    HTTP server standing in for Google Health Trends API on localhost, on a free port
+    unless one is given. Each request waits latency seconds and fails with a 500 error with
+    a probability of error_rate (drawn from a generator seeded with seed). Above
+    calls_per_second or calls_per_day (0 for no limit) requests are rejected as Google
+    does, and so are requests of more than 30 terms or max_lines lines (terms times days)
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+            self,
+            port: int = 0,
+            latency: float = 0.0,
+            error_rate: float = 0.0,
+            calls_per_second: int = 0,
+            calls_per_day: int = 0,
+            max_lines: int = 2000,
+            seed: int = 0
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls_per_second = calls_per_second
+        self.calls_per_day = calls_per_day
+        self.max_lines = max_lines
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._recent_calls = []
+        self._day = date.today()
+        self._day_calls = 0
+        self._lock = Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """ Serves the discovery document and the timelines """
+            def do_GET(self):  # pylint: disable=invalid-name
+                """ Sends the response built by LocalTrendsServer.reply as JSON """
+                status, body = server.reply(self.path)
+                content = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=UTF-8')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *_):
+                """ Requests are not logged, the benchmarks send thousands of them """
+
+        self._server = _ThreadingHTTPServer(('127.0.0.1', port), Handler)
+
+    @property
+    def url(self) -> str:
+        """ Root URL of the server """
+        return 'http://127.0.0.1:%d/' % self._server.server_address[1]
+
+    @property
+    def discovery_url(self) -> str:
+        """ URL to set in GOOGLE_DISCOVERY_URL """
+        return self.url.rstrip('/') + DISCOVERY_PATH
+
+    def reply(self, path: str) -> Tuple[int, Dict]:
+        """ Returns the status and the body of the response to a GET request """
+        parsed = urlparse(path)
+        if parsed.path == DISCOVERY_PATH:
+            return 200, self._discovery_document()
+        if parsed.path != TIMELINES_PATH:
+            return _error(404, 'notFound', 'Not Found')
+        query = parse_qs(parsed.query)
+        try:
+            terms = query['terms']
+            start = datetime.strptime(query['time.startDate'][0], '%Y-%m-%d').date()
+            end = datetime.strptime(query['time.endDate'][0], '%Y-%m-%d').date()
+        except (KeyError, ValueError):
+            return _error(400, 'badRequest', 'Invalid terms or dates')
+        if query.get('timelineResolution', ['week'])[0] != 'day':
+            return _error(400, 'badRequest', 'Only the day resolution is served')
+        days = (end - start).days + 1
+        if days < 1 or len(terms) > _MAX_TERMS or len(terms) * days > self.max_lines:
+            return _error(400, 'badRequest', 'Request beyond the limits of the API')
+        rejection = self._count_call()
+        if self.latency:
+            time.sleep(self.latency)
+        if rejection is not None:
+            return rejection
+        return 200, {'lines': [
+            {'term': term, 'points': build_points(term, start, end)} for term in terms
+        ]}
+
+    def _count_call(self):
+        """ Counts a call and returns the error response if it is rejected """
+        with self._lock:
+            self.calls += 1
+            now = time.monotonic()
+            today = date.today()
+            if today != self._day:
+                self._day, self._day_calls = today, 0
+            if self.calls_per_day and self._day_calls >= self.calls_per_day:
+                return _error(403, 'dailyLimitExceeded', 'Daily Limit Exceeded')
+            self._recent_calls = [t for t in self._recent_calls if t > now - 1]
+            if self.calls_per_second and len(self._recent_calls) >= self.calls_per_second:
+                return _error(403, 'rateLimitExceeded', 'Rate Limit Exceeded')
+            self._recent_calls.append(now)
+            self._day_calls += 1
+            if self._random.random() < self.error_rate:
+                return _error(500, 'backendError', 'Backend Error')
+        return None
+
+    def _discovery_document(self) -> Dict:
+        string = {'type': 'string', 'location': 'query'}
+        return {
+            'kind': 'discovery#restDescription',
+            'discoveryVersion': 'v1',
+            'id': 'trends:v1beta',
+            'name': 'trends',
+            'version': 'v1beta',
+            'protocol': 'rest',
+            'rootUrl': self.url,
+            'servicePath': 'trends/v1beta/',
+            'baseUrl': self.url + 'trends/v1beta/',
+            'basePath': '/trends/v1beta/',
+            'batchPath': 'batch/trends/v1beta',
+            'parameters': {'key': string, 'alt': dict(string, default='json', enum=['json'])},
+            'methods': {
+                'getTimelinesForHealth': {
+                    'id': 'trends.getTimelinesForHealth',
+                    'path': 'timelinesForHealth',
+                    'httpMethod': 'GET',
+                    'parameters': {
+                        'terms': dict(string, repeated=True),
+                        'geoRestriction.country': string,
+                        'geoRestriction.dma': string,
+                        'geoRestriction.region': string,
+                        'time.startDate': string,
+                        'time.endDate': string,
+                        'timelineResolution': dict(
+                            string, default='week', enum=['day', 'month', 'week', 'year']
+                        )
+                    },
+                    'response': {'$ref': 'Timelines'}
+                }
+            },
+            'schemas': {
+                'Timelines': {'id': 'Timelines', 'type': 'object', 'properties': {
+                    'lines': {'type': 'array', 'items': {'$ref': 'Timeline'}}
+                }},
+                'Timeline': {'id': 'Timeline', 'type': 'object', 'properties': {
+                    'points': {'type': 'array', 'items': {'$ref': 'TimelinePoint'}},
+                    'term': {'type': 'string'}
+                }},
+                'TimelinePoint': {'id': 'TimelinePoint', 'type': 'object', 'properties': {
+                    'date': {'type': 'string'},
+                    'value': {'type': 'number', 'format': 'double'}
+                }}
+            }
+        }
+
+
+def build_points(term: str, start: date, end: date) -> List[Dict]:
+    """ Synthetic points of a term, between 0 and 100 and only depending on term and date """
+    points = []
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        digest = hashlib.sha256(('%s|%s' % (term, day.isoformat())).encode('utf-8')).digest()
+        value = int.from_bytes(digest[:8], 'big') / 2 ** 64 * 100
+        points.append({'date': day.strftime(_POINT_DATE_FORMAT), 'value': value})
+    return points
+
+
+def _error(code: int, reason: str, message: str) -> Tuple[int, Dict]:
+    return code, {'error': {
+        'code': code, 'message': message, 'errors': [{'reason': reason, 'message': message}]
+    }}
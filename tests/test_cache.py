@@ -0,0 +1,222 @@
+"""
+ Tests the in-process cache used by the routes
+"""
+
+import importlib
+import os
+from datetime import date, datetime
+from tempfile import TemporaryDirectory
+from threading import Event, Thread
+from unittest import TestCase
+from unittest.mock import patch, Mock
+
+from app import create_app, DB
+from app.cache import Cache, make_key, warm_up
+from app.cache_backends import RedisBackend
+from app.models import FluModel, ModelScore, ModelFunction, DefaultFluModel
+from instance import config
+
+
+class CacheTestCase(TestCase):
+    """ Test case for module app.cache """
+
+    def test_get_or_set(self):
+        """
+        Scenario: A value is computed once and then returned from the cache
+        """
+        cache = Cache()
+        compute = Mock(return_value={})
+        self.assertEqual(cache.get_or_set('key', compute), {})
+        self.assertEqual(cache.get_or_set('key', compute), {})
+        self.assertEqual(compute.call_count, 1)
+
+    def test_expiry(self):
+        """
+        Scenario: An expired value is not returned
+        """
+        cache = Cache(timeout=10)
+        with patch('app.cache_backends.time.monotonic', return_value=100.0):
+            cache.set('key', 1)
+        with patch('app.cache_backends.time.monotonic', return_value=111.0):
+            self.assertIsNone(cache.get('key'))
+
+    def test_max_entries(self):
+        """
+        Scenario: The oldest entry is evicted once max_entries is reached
+        """
+        cache = Cache(max_entries=2)
+        for idx in range(3):
+            cache.set(idx, idx)
+        self.assertIsNone(cache.get(0))
+        self.assertEqual(cache.get(2), 2)
+        self.assertEqual(len(cache), 2)
+
+    def test_memoize(self):
+        """
+        Scenario: Calls with equal arguments share a cache entry, lists included
+        """
+        cache = Cache()
+        func = Mock(return_value=1, __name__='func')
+        memoized = cache.memoize(func)
+        memoized(1, ['e', 'w'], smoothing=3)
+        memoized(1, ('e', 'w'), smoothing=3)
+        memoized(1, ['e'], smoothing=3)
+        self.assertEqual(func.call_count, 2)
+        self.assertEqual(
+            make_key('func', (1, ['e']), {'smoothing': 3}), ('func', 1, ('e',), ('smoothing', 3))
+        )
+
+    def test_disabled(self):
+        """
+        Scenario: A disabled cache does not store values
+        """
+        cache = Cache(enabled=False)
+        cache.set('key', 1)
+        self.assertIsNone(cache.get('key'))
+
+    def test_invalidate(self):
+        """
+        Scenario: Invalidating a model orphans its values and the values not tied to a
+        model, keeps the values of other models and calls the invalidation hooks
+        """
+        cache = Cache()
+        hook = Mock()
+        cache.on_invalidate(hook)
+        cache.set('series', 1, model_id=1)
+        cache.set('series', 2, model_id=2)
+        cache.set('catalogue', 3)
+        cache.invalidate(1)
+        self.assertIsNone(cache.get('series', model_id=1))
+        self.assertEqual(cache.get('series', model_id=2), 2)
+        self.assertIsNone(cache.get('catalogue'))
+        hook.assert_called_once_with(1)
+
+    def test_concurrent_misses(self):
+        """
+        Scenario: Threads missing the same key while it is being computed wait for the
+        value instead of computing it again
+        """
+        cache = Cache()
+        release = Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return 'value'
+        results = []
+        threads = [
+            Thread(target=lambda: results.append(cache.get_or_set('key', compute)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertListEqual(results, ['value'] * 5)
+
+    def test_failed_computation(self):
+        """
+        Scenario: A failed computation is not cached and the next call computes again
+        """
+        cache = Cache()
+        with self.assertRaises(ValueError):
+            cache.get_or_set('key', Mock(side_effect=ValueError))
+        self.assertEqual(cache.get_or_set('key', lambda: 1), 1)
+
+    def test_enabled_with_shared_backend(self):
+        """
+        Scenario: The cache is on by default only when its invalidations reach every worker
+        """
+        environ = {k: v for k, v in os.environ.items() if k not in ('CACHE_ENABLED', 'CACHE_URL')}
+        try:
+            with patch.dict(os.environ, environ, clear=True):
+                self.assertFalse(importlib.reload(config).ProductionConfig.CACHE_ENABLED)
+            with patch.dict(os.environ, dict(environ, CACHE_URL='redis://cache:6379/0'), clear=True):
+                self.assertTrue(importlib.reload(config).ProductionConfig.CACHE_ENABLED)
+            with patch.dict(os.environ, dict(environ, CACHE_ENABLED='True'), clear=True):
+                self.assertTrue(importlib.reload(config).ProductionConfig.CACHE_ENABLED)
+        finally:
+            importlib.reload(config)
+
+    def test_long_timeout_with_shared_backend(self):
+        """
+        Scenario: Legacy ids and twlink data are kept for a week only in a shared cache
+        """
+        def timeouts():
+            with patch.object(Cache, 'memoize', autospec=True) as memoize:
+                create_app('testing')
+            return {
+                call[0][1].__name__: call[1].get('timeout') for call in memoize.call_args_list
+            }
+        self.assertIsNone(timeouts()['get_legacy_model_ids'])
+        self.assertIsNone(timeouts()['get_twlink_model_data'])
+        with patch('app.cache_backends.build_backend', return_value=RedisBackend('redis://cache')):
+            self.assertEqual(timeouts()['get_legacy_model_ids'], 7 * 24 * 3600)
+            self.assertEqual(timeouts()['get_twlink_model_data'], 7 * 24 * 3600)
+
+    def test_process_lock(self):
+        """
+        Scenario: Misses hold one of a fixed set of file locks when lock_dir is set
+        """
+        with TemporaryDirectory() as lock_dir:
+            cache = Cache(lock_dir=lock_dir)
+            self.assertEqual(cache.get_or_set(('func', 1), lambda: 1), 1)
+            self.assertEqual(len(os.listdir(lock_dir)), 1)
+            for value in range(500):
+                cache.get_or_set(('func', value), lambda: 1)
+            self.assertLessEqual(len(os.listdir(lock_dir)), 64)
+
+
+class WarmUpTestCase(TestCase):
+    """ Test case for the cache warm-up (app.cache.warm_up) """
+
+    def setUp(self):
+        self.app = create_app(config_name='testing')
+        DB.create_all(app=self.app)
+
+    def test_warm_up(self):
+        """
+        Scenario: Warm up the cache with the default view and a hot query
+        Then the warmed responses are served without reading the database
+        """
+        flumodel = FluModel()
+        flumodel.name = 'Test Model'
+        flumodel.is_public = True
+        flumodel.is_displayed = True
+        flumodel.source_type = 'google'
+        flumodel.calculation_parameters = 'matlab_model,1'
+        datapoint = ModelScore()
+        datapoint.region = 'e'
+        datapoint.score_date = date(2018, 6, 29)
+        datapoint.calculation_timestamp = datetime.now()
+        datapoint.score_value = 1.23
+        flumodel.model_scores = [datapoint]
+        model_function = ModelFunction()
+        model_function.function_name = 'matlab_model'
+        model_function.average_window_size = 1
+        model_function.flu_model_id = 1
+        model_function.has_confidence_interval = False
+        default_model = DefaultFluModel()
+        default_model.flu_model_id = 1
+        with self.app.app_context():
+            flumodel.save()
+            model_function.save()
+            DB.session.add(default_model)
+            DB.session.commit()
+        hot_query = '/plink?id=1&startDate=2018-06-01&endDate=2018-06-30'
+        self.app.config['CACHE_WARMUP_QUERIES'] = [hot_query]
+        with patch('app.cache.DB'):
+            warm_up(self.app)
+        self.assertEqual(len(self.app.extensions['cache']), 4)
+        with patch('app.models_query_registry.DB') as patched_db, \
+                patch('app.models_query_registry.FluModel') as patched_model:
+            self.assertEqual(self.app.test_client().get('/').status_code, 200)
+            self.assertEqual(self.app.test_client().get(hot_query).status_code, 200)
+            patched_db.session.query.assert_not_called()
+            patched_model.query.filter_by.assert_not_called()
+
+    def tearDown(self):
+        DB.drop_all(app=self.app)
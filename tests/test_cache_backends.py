@@ -0,0 +1,100 @@
+"""
+ Tests the storage backends of the cache
+"""
+
+from datetime import date
+from unittest import TestCase
+from unittest.mock import patch
+
+from app.cache import Cache
+from app.cache_backends import RedisBackend, build_backend, MemoryBackend
+from app.local_servers import LocalRespServer
+from app.score_series import ScoreSeries
+
+
+class RedisBackendTestCase(TestCase):
+    """ Test case for module app.cache_backends, against the local stand-in server """
+
+    def setUp(self):
+        self.server = LocalRespServer().start()
+
+    def test_shared_values(self):
+        """
+        Scenario: A value cached by one worker is read by another worker
+        """
+        series = ScoreSeries.from_rows([(date(2018, 6, 1), 1.0, None, 2.0)])
+        Cache(backend=RedisBackend(self.server.url)).set('series', series, model_id=1)
+        result = Cache(backend=RedisBackend(self.server.url)).get('series', model_id=1)
+        self.assertListEqual(list(result), list(series))
+        self.assertFalse(result.values.flags.writeable)
+
+    def test_invalidate(self):
+        """
+        Scenario: A model invalidated by the scheduler is invalidated for every worker
+        """
+        worker = Cache(backend=RedisBackend(self.server.url))
+        scheduler = Cache(backend=RedisBackend(self.server.url))
+        worker.set('series', 1, model_id=1)
+        worker.set('series', 2, model_id=2)
+        scheduler.invalidate(1)
+        self.assertIsNone(worker.get('series', model_id=1))
+        self.assertEqual(worker.get('series', model_id=2), 2)
+        worker.clear()
+        self.assertIsNone(worker.get('series', model_id=2))
+
+    def test_expiry(self):
+        """
+        Scenario: Values are stored with the cache timeout as expiry
+        """
+        backend = RedisBackend(self.server.url)
+        with patch('app.cache_backends.time.monotonic', return_value=100.0):
+            backend.set('key', 1, 0)
+            backend.set('expired', 1, 10)
+        with patch('app.cache_backends.time.monotonic', return_value=111.0):
+            self.assertEqual(backend.get('key'), 1)
+            self.assertIsNone(backend.get('expired'))
+
+    def test_server_unavailable(self):
+        """
+        Scenario: The cache falls back to computing the values when the server is down
+        """
+        stopped_server = LocalRespServer().start()
+        stopped_server.stop()
+        cache = Cache(backend=RedisBackend(stopped_server.url))
+        with self.assertLogs(level='WARNING'):
+            self.assertEqual(cache.get_or_set('key', lambda: 1), 1)
+
+    def test_invalidate_server_unavailable(self):
+        """
+        Scenario: The scheduler invalidates the models while the cache server is down
+        """
+        stopped_server = LocalRespServer().start()
+        stopped_server.stop()
+        cache = Cache(backend=RedisBackend(stopped_server.url))
+        with self.assertLogs(level='WARNING'):
+            cache.invalidate(1)
+            cache.delete('key')
+        self.assertEqual(len(cache), 0)
+
+    def test_reconnect_after_fork(self):
+        """
+        Scenario: A worker forked after the warm-up opens its own connection
+        """
+        backend = RedisBackend(self.server.url)
+        backend.set('key', 1, 0)
+        inherited = backend._local.connection
+        with patch('app.cache_backends.os.getpid', return_value=backend._local.pid + 1):
+            self.assertEqual(backend.get('key'), 1)
+        self.assertIsNot(backend._local.connection, inherited)
+        backend.close()
+        self.assertIsNone(backend._local.connection)
+
+    def test_build_backend(self):
+        """
+        Scenario: Choose the backend from the CACHE_URL setting
+        """
+        self.assertIsInstance(build_backend('', 10), MemoryBackend)
+        self.assertIsInstance(build_backend(self.server.url, 10), RedisBackend)
+
+    def tearDown(self):
+        self.server.stop()
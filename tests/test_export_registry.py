@@ -0,0 +1,63 @@
+"""
+ Tests serialisation functions used in bulk exports of model scores
+"""
+
+import io
+import json
+from datetime import date
+from unittest import TestCase, skipUnless
+
+from app.export_registry import ndjson_stream, arrow_stream, parquet_stream, has_columnar_support
+
+BATCHES = [
+    [(1, 'e', date(2018, 1, 1), 0.5, 0.1, 0.9), (1, 'e', date(2018, 1, 2), 0.6, None, None)],
+    [(2, 'e', date(2018, 1, 1), 1.5, 1.1, 1.9)]
+]
+
+
+class ExportRegistryTestCase(TestCase):
+    """ Test case for module app.export_registry """
+
+    def test_ndjson_stream(self):
+        """
+        Scenario: Serialise two batches as NDJSON
+        Then there is one chunk per batch and one line per row
+        """
+        chunks = list(ndjson_stream(iter(BATCHES)))
+        self.assertEqual(len(chunks), 2)
+        lines = b''.join(chunks).decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertDictEqual(json.loads(lines[1]), {
+            'model_id': 1,
+            'region': 'e',
+            'score_date': '2018-01-02',
+            'score_value': 0.6,
+            'confidence_interval_lower': None,
+            'confidence_interval_upper': None
+        })
+
+    @skipUnless(has_columnar_support(), 'pyarrow is not installed')
+    def test_arrow_stream(self):
+        """
+        Scenario: Serialise two batches in the Arrow IPC streaming format and read them back
+        """
+        import pyarrow as pa
+        data = b''.join(arrow_stream(iter(BATCHES)))
+        table = pa.ipc.open_stream(data).read_all()
+        self.assertEqual(table.num_rows, 3)
+        self.assertListEqual(table.column('model_id').to_pylist(), [1, 1, 2])
+        self.assertIsNone(table.column('confidence_interval_lower').to_pylist()[1])
+
+    @skipUnless(has_columnar_support(), 'pyarrow is not installed')
+    def test_parquet_stream(self):
+        """
+        Scenario: Serialise two batches as Parquet and read them back
+        """
+        import pyarrow.parquet as pq
+        data = b''.join(parquet_stream(iter(BATCHES)))
+        table = pq.read_table(io.BytesIO(data))
+        self.assertEqual(table.num_rows, 3)
+        self.assertListEqual(
+            table.column('score_date').to_pylist(),
+            [date(2018, 1, 1), date(2018, 1, 2), date(2018, 1, 1)]
+        )
@@ -4,14 +4,16 @@
 
 from datetime import date, datetime, timedelta, time
 from os import path
+from tempfile import TemporaryDirectory
 from unittest import TestCase
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
 from googleapiclient.discovery import build
 from googleapiclient.http import HttpMock, RequestMockBuilder
 from httplib2 import Response
 
 from scheduler.google_api_client import GoogleApiClient, SERVICE_NAME, SERVICE_VERSION
+from scheduler.response_cache import ResponseCache
 
 DATA_DIR = path.join(path.dirname(__file__), 'data')
 
@@ -62,6 +64,42 @@ class GoogleApiClientTestCase(TestCase):
             self.assertIn('term', result[0])
             self.assertIn('points', result[0])
 
+    def test_fetch_google_scores_response_cache(self):
+        """
+        Scenario: Read and write the raw responses in a response cache
+        Given a client with an empty response cache
+        When the same request is sent twice
+        Then the API is called once and the second response is read from the cache
+        """
+        http = HttpMock(datafile('trends_discovery.json'), {'status': '200'})
+        response = b'{"lines": [ { "term" : "a flu" , "points" : [] } ]}'
+        request_builder = RequestMockBuilder(
+            {
+                'trends.getTimelinesForHealth': (None, response)
+            }
+        )
+        with patch.object(GoogleApiClient, '__init__', lambda x: None), TemporaryDirectory() as cache_dir:
+            instance = GoogleApiClient()
+            instance.service = build(
+                serviceName=SERVICE_NAME,
+                version=SERVICE_VERSION,
+                http=http,
+                developerKey='APIKEY',
+                requestBuilder=request_builder,
+                cache_discovery=False,
+                static_discovery=False
+            )
+            instance.block_until = None
+            instance.limiter = Mock()
+            instance.response_cache = ResponseCache(cache_dir)
+            start = date.today() - timedelta(days=5)
+            end = start + timedelta(days=1)
+            first = instance.fetch_google_scores(['a flu'], start, end)
+            instance.service = None
+            second = instance.fetch_google_scores(['a flu'], start, end)
+            self.assertListEqual(first, second)
+            self.assertEqual(instance.limiter.acquire.call_count, 1)
+
     def test_403_error(self):
         """
         Scenario: Evaluate generation of error raising logic when calls to
@@ -145,6 +183,49 @@ class GoogleApiClientTestCase(TestCase):
                 ['WARNING:root:<HttpError 500 when requesting None returned "Backend Error". Details: "Backend Error">']
             )
 
+    def test_backend_error_retries(self):
+        """
+        Scenario: Retry a request failing with http/500 after a backoff
+        Given a client allowed 2 retries and recording calls in a quota ledger
+        When Google API keeps returning HTTP 500
+        Then the request is sent 3 times with 2 pauses in between
+        And the 3 calls are recorded with the lines they requested
+        """
+        http = HttpMock(datafile('trends_discovery.json'), {'status': '200'})
+        error_bytes = b'{"error" : { ' \
+                      b'"code" : 500, ' \
+                      b'"message" : "Backend Error", ' \
+                      b'"errors" : [{ "reason" : "backendError" }] } }'
+        request_builder = RequestMockBuilder(
+            {
+                'trends.getTimelinesForHealth': (Response({'status': 500}), error_bytes)
+            }
+        )
+        with patch.object(GoogleApiClient, '__init__', lambda x: None):
+            instance = GoogleApiClient()
+            instance.service = build(
+                serviceName=SERVICE_NAME,
+                version=SERVICE_VERSION,
+                http=http,
+                developerKey='APIKEY',
+                requestBuilder=request_builder,
+                cache_discovery=False,
+                static_discovery=False
+            )
+            instance.block_until = None
+            instance.limiter = Mock()
+            instance.ledger = Mock()
+            instance.max_retries = 2
+            start = date.today() - timedelta(days=5)
+            with patch('scheduler.google_api_client.time.sleep') as patched_sleep, \
+                    self.assertLogs(level='WARNING'):
+                result = instance.fetch_google_scores(['flu', 'cold'], start, start + timedelta(days=1))
+            self.assertListEqual(result, [])
+            self.assertEqual(patched_sleep.call_count, 2)
+            self.assertEqual(instance.limiter.acquire.call_count, 3)
+            self.assertEqual(instance.ledger.record.call_count, 3)
+            instance.ledger.record.assert_called_with(1, 4)
+
     def test_http_error(self):
         """
         Scenario: Evaluate generation of error raising logic when calls to
@@ -15,27 +15,27 @@ class GoogleBatchTestCase(TestCase):
         """
         Scenario: Evaluate GoogleBatch under a date range within the allowed interval
         Given a list of Google terms with 30 items
-        When the date_collect tuple has a date range of 66 days
+        When the date_collect tuple has a date range of 66 days (1,980 lines)
         Then batch has a size of 1
         And the date range tuple is the same as the one used in the constructor
         """
         google_terms = ['Term %d' % t for t in range(1, 31)]
         start_date = date(2018, 1, 1)
-        collect_dates = [(start_date, start_date + timedelta(days=66))]
+        collect_dates = [(start_date, start_date + timedelta(days=65))]
         instance = GoogleBatch(google_terms, collect_dates)
         batch = list(instance.get_batch())
         self.assertEqual(len(batch), 1)
         self.assertEqual(batch[0][1], start_date)
-        self.assertEqual(batch[0][2], start_date + timedelta(days=66))
+        self.assertEqual(batch[0][2], start_date + timedelta(days=65))
 
     def test_get_batch_outside_interval(self):
         """
         Scenario: Evaluate GoogleBatch under a date range outside the allowed interval
         Given a list of Google terms with 30 items
-        When the date_collect tuple has a date range of 67 days
+        When the date_collect tuple has a date range of 68 days (2,040 lines)
         Then the batch has a size of 2
-        And the date range tuple for the last item in the batch have values
-        for start_date and end_date of start_date + 67 days
+        And the days are split evenly, the last item covering start_date + 34 days
+        to start_date + 67 days
         """
         google_terms = ['Term %d' % t for t in range(1, 31)]
         start_date = date(2018, 1, 1)
@@ -43,5 +43,43 @@ class GoogleBatchTestCase(TestCase):
         instance = GoogleBatch(google_terms, collect_dates)
         batch = list(instance.get_batch())
         self.assertEqual(len(batch), 2)
-        self.assertEqual(batch[1][1], start_date + timedelta(days=67))
+        self.assertEqual(instance.get_call_count(), 2)
+        self.assertEqual(batch[1][1], start_date + timedelta(days=34))
         self.assertEqual(batch[1][2], start_date + timedelta(days=67))
+
+    def test_get_batch_packing(self):
+        """
+        Scenario: Pack terms and dates in the fewest requests
+        Given a list of Google terms with 35 items
+        When the date_collect tuples are two adjacent ranges of 50 days in total
+        Then the ranges are merged
+        And the terms are split into 2 balanced requests of 18 and 17 terms
+        And every request stays within 30 terms and 2,000 lines
+        """
+        google_terms = ['Term %d' % t for t in range(1, 36)]
+        start_date = date(2018, 1, 1)
+        collect_dates = [
+            (start_date + timedelta(days=20), start_date + timedelta(days=49)),
+            (start_date, start_date + timedelta(days=19))
+        ]
+        batch = list(GoogleBatch(google_terms, collect_dates).get_batch())
+        self.assertListEqual([len(terms) for terms, _, _ in batch], [18, 17])
+        self.assertListEqual(sum((terms for terms, _, _ in batch), []), google_terms)
+        for terms, start, end in batch:
+            self.assertEqual((start, end), (start_date, start_date + timedelta(days=49)))
+            self.assertLessEqual(len(terms) * ((end - start).days + 1), 2000)
+
+    def test_get_batch_many_days(self):
+        """
+        Scenario: Prefer smaller term groups when they save requests
+        Given a list of Google terms with 31 items
+        When the date_collect tuple has a date range of 130 days
+        Then 3 requests are planned instead of the 4 of groups of 30 terms
+        """
+        google_terms = ['Term %d' % t for t in range(1, 32)]
+        start_date = date(2018, 1, 1)
+        instance = GoogleBatch(google_terms, [(start_date, start_date + timedelta(days=129))])
+        self.assertEqual(instance.get_call_count(), 3)
+        for terms, start, end in instance.get_batch():
+            self.assertLessEqual(len(terms), 30)
+            self.assertLessEqual(len(terms) * ((end - start).days + 1), 2000)
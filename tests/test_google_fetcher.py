@@ -0,0 +1,53 @@
+"""
+ Tests the concurrent retrieval of Google scores
+"""
+
+import time
+from datetime import date
+from threading import Lock
+from unittest import TestCase
+from unittest.mock import Mock
+
+from scheduler.google_fetcher import GoogleFetcher
+
+
+class GoogleFetcherTestCase(TestCase):
+    """ Test case for module scheduler.google_fetcher """
+
+    def test_fetch_in_order(self):
+        """
+        Scenario: Fetch batches concurrently and get the results in request order
+        Given 6 requests whose responses come back in reverse order
+        When they are fetched with 3 workers
+        Then the results are in the order of the requests
+        And no more than 3 API clients are built
+        """
+        lock = Lock()
+        clients = []
+
+        def build_client():
+            client = Mock()
+            client.fetch_google_scores.side_effect = lambda terms, start, end: \
+                time.sleep(0.01 * (6 - int(terms[0]))) or [{'term': terms[0], 'points': []}]
+            with lock:
+                clients.append(client)
+            return client
+
+        requests = [([str(idx)], date(2018, 1, 1), date(2018, 1, 2)) for idx in range(6)]
+        result = list(GoogleFetcher(build_client, max_workers=3).fetch(requests))
+        self.assertListEqual([lines[0]['term'] for lines in result], [str(idx) for idx in range(6)])
+        self.assertLessEqual(len(clients), 3)
+
+    def test_fetch_failure(self):
+        """
+        Scenario: Raise the error of a failed request
+        Given a client raising a RuntimeError on the second request
+        Then the first result is yielded and the error is raised next
+        """
+        client = Mock()
+        client.fetch_google_scores.side_effect = [[{'term': 'a'}], RuntimeError('blocked')]
+        fetcher = GoogleFetcher(lambda: client, max_workers=1)
+        results = fetcher.fetch([(['a'], date(2018, 1, 1), date(2018, 1, 1))] * 2)
+        self.assertListEqual(next(results), [{'term': 'a'}])
+        with self.assertRaises(RuntimeError):
+            next(results)
@@ -1,4 +1,5 @@
 from unittest import TestCase
+from unittest.mock import patch
 from datetime import date, datetime
 
 from app import create_app, DB
@@ -231,6 +232,182 @@ class InitRoutesTestCase(TestCase):
         }
         self.assertEqual(result, expected)
 
+    def test_get_scores_regions(self):
+        flumodel = FluModel()
+        flumodel.name = 'Test Model'
+        flumodel.is_public = True
+        flumodel.is_displayed = True
+        flumodel.source_type = 'google'
+        flumodel.calculation_parameters = 'matlab_model,1'
+        datapoints = []
+        for region in ['e', 'w']:
+            for d in [date(2018, 6, 19), date(2018, 6, 20)]:
+                entry = ModelScore()
+                entry.region = region
+                entry.score_date = d
+                entry.calculation_timestamp = datetime.now()
+                entry.score_value = 1.23 if region == 'e' else 2.46
+                datapoints.append(entry)
+        flumodel.model_scores = datapoints
+        model_function = ModelFunction()
+        model_function.id = 1
+        model_function.function_name = 'matlab_model'
+        model_function.average_window_size = 1
+        model_function.flu_model_id = 1
+        model_function.has_confidence_interval = False
+        with self.app.app_context():
+            flumodel.save()
+            model_function.save()
+        response = self.client().get('/scores?id=1&startDate=2018-06-01&endDate=2018-06-30')
+        result = response.get_json()
+        self.assertEqual(len(result['model_data']), 1)
+        self.assertNotIn('region', result['model_data'][0])
+        self.assertEqual(len(result['model_data'][0]['data_points']), 2)
+        response = self.client().get(
+            '/scores?id=1&startDate=2018-06-01&endDate=2018-06-30&region=e&region=w'
+        )
+        result = response.get_json()
+        self.assertListEqual([m['region'] for m in result['model_data']], ['e', 'w'])
+        self.assertListEqual([m['average_score'] for m in result['model_data']], [1.23, 2.46])
+
+    def test_get_scores_since(self):
+        """
+        Scenario: A delta request only returns the points calculated after since, and the
+        latest calculation timestamp as watermark
+        """
+        flumodel = FluModel()
+        flumodel.name = 'Test Model'
+        flumodel.is_public = True
+        flumodel.is_displayed = True
+        flumodel.source_type = 'google'
+        flumodel.calculation_parameters = 'matlab_model,1'
+        datapoints = []
+        for day, timestamp in [(18, datetime(2018, 6, 20)), (19, datetime(2018, 6, 21, 8, 30))]:
+            entry = ModelScore()
+            entry.region = 'e'
+            entry.score_date = date(2018, 6, day)
+            entry.calculation_timestamp = timestamp
+            entry.score_value = 1.23
+            datapoints.append(entry)
+        flumodel.model_scores = datapoints
+        model_function = ModelFunction()
+        model_function.id = 1
+        model_function.function_name = 'matlab_model'
+        model_function.average_window_size = 1
+        model_function.flu_model_id = 1
+        model_function.has_confidence_interval = False
+        with self.app.app_context():
+            flumodel.save()
+            model_function.save()
+        url = '/scores?id=1&startDate=2018-06-01&endDate=2018-06-30&since=%s'
+        result = self.client().get(url % '2018-06-21T00:00:00').get_json()
+        self.assertListEqual(
+            [p['score_date'] for p in result['model_data'][0]['data_points']], ['2018-06-19']
+        )
+        self.assertEqual(result['watermark'], '2018-06-21T08:30:00.000000')
+        result = self.client().get(url % result['watermark']).get_json()
+        self.assertListEqual(result['model_data'][0]['data_points'], [])
+        self.assertEqual(result['watermark'], '2018-06-21T08:30:00.000000')
+        self.assertEqual(self.client().get(url % 'yesterday').status_code, 400)
+
+    def test_get_stats(self):
+        """
+        Scenario: Get the statistics of a model instead of its scores
+        """
+        flumodel = FluModel()
+        flumodel.name = 'Test Model'
+        flumodel.is_public = True
+        flumodel.is_displayed = True
+        flumodel.source_type = 'google'
+        flumodel.calculation_parameters = 'matlab_model,1'
+        datapoints = []
+        for day in range(1, 11):
+            entry = ModelScore()
+            entry.region = 'e'
+            entry.score_date = date(2018, 6, day)
+            entry.calculation_timestamp = datetime.now()
+            entry.score_value = float(day)
+            datapoints.append(entry)
+        flumodel.model_scores = datapoints
+        model_function = ModelFunction()
+        model_function.id = 1
+        model_function.function_name = 'matlab_model'
+        model_function.average_window_size = 1
+        model_function.flu_model_id = 1
+        model_function.has_confidence_interval = False
+        rate_thresholds = RateThresholdSet()
+        rate_thresholds.low_value = 2.0
+        rate_thresholds.medium_value = 4.0
+        rate_thresholds.high_value = 6.0
+        rate_thresholds.very_high_value = 8.0
+        rate_thresholds.valid_from = date(2010, 1, 1)
+        with self.app.app_context():
+            flumodel.save()
+            model_function.save()
+            rate_thresholds.save()
+        response = self.client().get('/stats?id=1&startDate=2018-06-01&endDate=2018-06-30')
+        result = response.get_json()['model_data'][0]
+        self.assertEqual(result['name'], 'Test Model')
+        self.assertEqual(result['peak_date'], '2018-06-10')
+        self.assertEqual(result['days_above_threshold']['very_high_value'], 3)
+        self.assertNotIn('data_points', result)
+        response = self.client().get('/stats?id=2&startDate=2018-06-01&endDate=2018-06-30')
+        self.assertEqual(response.status_code, 204)
+
+    def test_get_scores_bands(self):
+        """
+        Scenario: Get the rate threshold band of each point, or the band segments
+        """
+        flumodel = FluModel()
+        flumodel.name = 'Test Model'
+        flumodel.is_public = True
+        flumodel.is_displayed = True
+        flumodel.source_type = 'google'
+        flumodel.calculation_parameters = 'matlab_model,1'
+        datapoints = []
+        for day, value in [(1, 0.5), (2, 1.5), (3, 1.7)]:
+            entry = ModelScore()
+            entry.region = 'e'
+            entry.score_date = date(2018, 6, day)
+            entry.calculation_timestamp = datetime.now()
+            entry.score_value = value
+            datapoints.append(entry)
+        flumodel.model_scores = datapoints
+        model_function = ModelFunction()
+        model_function.id = 1
+        model_function.function_name = 'matlab_model'
+        model_function.average_window_size = 1
+        model_function.flu_model_id = 1
+        model_function.has_confidence_interval = False
+        rate_thresholds = RateThresholdSet()
+        rate_thresholds.low_value = 1.0
+        rate_thresholds.medium_value = 2.0
+        rate_thresholds.high_value = 3.0
+        rate_thresholds.very_high_value = 4.0
+        rate_thresholds.valid_from = date(2010, 1, 1)
+        with self.app.app_context():
+            flumodel.save()
+            model_function.save()
+            rate_thresholds.save()
+        url = '/scores?id=1&startDate=2018-06-01&endDate=2018-06-03&bands=%s'
+        result = self.client().get(url % 'points').get_json()['model_data'][0]
+        self.assertListEqual([p['band'] for p in result['data_points']], ['low', 'low', 'baseline'])
+        result = self.client().get(url % 'segments').get_json()['model_data'][0]
+        self.assertListEqual(
+            [(s['band'], s['points']) for s in result['band_segments']], [('low', 2), ('baseline', 1)]
+        )
+        response = self.client().get('/csv?id=1&startDate=2018-06-01&endDate=2018-06-03&bands=points')
+        self.assertIn(b'2018-06-01,0.5,baseline', response.data)
+        self.assertEqual(self.client().get(url % 'colours').status_code, 400)
+        result = self.client().get(
+            '/scores?id=1&startDate=2018-06-01&endDate=2018-06-03&maxPoints=2'
+        )
+        self.assertEqual(result.status_code, 400)
+        result = self.client().get(
+            '/scores?id=1&startDate=2018-06-01&endDate=2018-06-03&maxPoints=-5'
+        )
+        self.assertEqual(result.status_code, 400)
+
     def test_csv(self):
         flumodel = FluModel()
         flumodel.id = 1
@@ -266,6 +443,73 @@ class InitRoutesTestCase(TestCase):
             self.assertEquals(response.data, expected_data)
             self.assertRegexpMatches(response.headers['Content-Disposition'], expected_header)
 
+    def test_matrix_and_csv(self):
+        """
+        Scenario: Align the scores of two models with gaps, as a matrix and as a CSV file
+        """
+        with self.app.app_context():
+            for idx, days in [(1, [1, 2]), (2, [2, 3])]:
+                flumodel = FluModel()
+                flumodel.name = 'Model %d' % idx
+                flumodel.is_public = True
+                flumodel.is_displayed = True
+                flumodel.source_type = 'google'
+                flumodel.calculation_parameters = 'matlab_model,1'
+                datapoints = []
+                for day in days:
+                    entry = ModelScore()
+                    entry.region = 'e'
+                    entry.score_date = date(2018, 6, day)
+                    entry.calculation_timestamp = datetime.now()
+                    entry.score_value = idx + day / 10
+                    datapoints.append(entry)
+                flumodel.model_scores = datapoints
+                flumodel.save()
+        response = self.client().get('/matrix?id=2&id=1&startDate=2018-06-01&endDate=2018-06-30')
+        result = response.get_json()
+        self.assertListEqual([m['name'] for m in result['models']], ['Model 2', 'Model 1'])
+        self.assertListEqual(result['dates'], ['2018-06-03', '2018-06-02', '2018-06-01'])
+        self.assertListEqual(result['values'], [[2.3, 2.2, None], [None, 1.2, 1.1]])
+        response = self.client().get('/csv?id=1&id=2&startDate=2018-06-01&endDate=2018-06-30')
+        self.assertEqual(response.data, (
+            b'score_date,score_Model 1,score_Model 2\r\n2018-06-03,,2.3\r\n'
+            b'2018-06-02,1.2,2.2\r\n2018-06-01,1.1,\r\n'
+        ))
+
+    def test_export_ndjson(self):
+        with self.app.app_context():
+            for idx in [1, 2]:
+                flumodel = FluModel()
+                flumodel.name = 'Test Model %d' % idx
+                flumodel.is_public = idx == 1
+                flumodel.is_displayed = True
+                flumodel.source_type = 'google'
+                flumodel.calculation_parameters = 'matlab_model,1'
+                datapoints = []
+                for d in [date(2018, 6, 1), date(2018, 6, 2)]:
+                    entry = ModelScore()
+                    entry.region = 'e'
+                    entry.score_date = d
+                    entry.calculation_timestamp = datetime.now()
+                    entry.score_value = 1.23 * idx
+                    datapoints.append(entry)
+                flumodel.model_scores = datapoints
+                flumodel.save()
+        response = self.client().get('/export?id=1&id=2&format=ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lines = response.data.decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn('"score_date": "2018-06-01"', lines[0])
+        response = self.client().get('/export?id=1&format=xml')
+        self.assertEqual(response.status_code, 400)
+        response = self.client().get('/export?id=2')
+        self.assertEqual(response.status_code, 204)
+        with patch.dict('sys.modules', {'pyarrow': None}):
+            response = self.client().get('/export?id=1&format=parquet')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(b'pyarrow', response.data)
+
     def test_post_config(self):
         flumodel = FluModel()
         flumodel.id = 1
@@ -373,6 +617,16 @@ class InitRoutesTestCase(TestCase):
             'very_high_value': {'label': 'Very high epidemic rate', 'value': 0.4}
         }
         self.assertDictEqual(response.get_json()['rate_thresholds'], expected)
+        with patch('app.models_query_registry.DB') as patched_db, \
+                patch('app.models_query_registry.FluModel') as patched_model:
+            response = self.client().get(
+                '/twlink?model_regions-0=1-e&start=2018-06-01&end=2018-06-10'
+            )
+            self.assertEqual(len(response.get_json()['model_data'][0]['data_points']), 10)
+            patched_db.session.query.assert_not_called()
+            patched_model.query.filter_by.assert_not_called()
+        response = self.client().get('/twlink?model_regions-0=2-e&start=2018-06-01&end=2018-06-10')
+        self.assertEqual(response.status_code, 204)
 
     def test_get_twlink_current_link(self):
         flumodel = FluModel()
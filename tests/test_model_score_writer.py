@@ -0,0 +1,85 @@
+"""
+ Tests the buffered persistence of model scores
+"""
+
+from datetime import date, timedelta
+from unittest import TestCase
+from unittest.mock import patch
+
+from app import create_app, DB
+from app.models import ModelScore
+from app.models_query_registry import set_model_scores
+from scheduler.model_score_writer import ModelScoreWriter
+
+
+class ModelScoreWriterTestCase(TestCase):
+    """ Test case for module scheduler.model_score_writer """
+
+    def setUp(self):
+        self.app = create_app(config_name='testing')
+        DB.create_all(app=self.app)
+
+    def test_flush_in_chunks(self):
+        """
+        Scenario: Persist buffered model scores in chunks
+        Given a writer with a chunk size of 2
+        When 5 model scores are added
+        Then 4 are persisted in two transactions and 1 is still buffered
+        And all 5 are persisted when the writer exits, with their calculation timestamp
+        """
+        with self.app.app_context():
+            with patch('scheduler.model_score_writer.set_model_scores',
+                       wraps=set_model_scores) as patched_set:
+                with ModelScoreWriter(chunk_size=2) as writer:
+                    for day in range(5):
+                        writer.add(1, date(2018, 1, 1) + timedelta(days=day), 0.1 + day)
+                    self.assertEqual(patched_set.call_count, 2)
+                    self.assertEqual(ModelScore.query.count(), 4)
+                    self.assertEqual(len(writer.pending), 1)
+                self.assertEqual(patched_set.call_count, 3)
+            scores = ModelScore.query.order_by(ModelScore.score_date).all()
+            self.assertEqual(len(scores), 5)
+            self.assertEqual(scores[-1].score_value, 4.1)
+            self.assertIsNotNone(scores[-1].calculation_timestamp)
+            self.assertIsNone(scores[-1].confidence_interval_lower)
+
+    def test_bound_parameters_per_insert(self):
+        """
+        Scenario: Keep each INSERT under the 999 bound parameters of older SQLite
+        Given 300 model scores persisted with a chunk size of 250
+        Then each statement binds at most 999 parameters
+        And all 300 are persisted
+        """
+        rows = [
+            {'flu_model_id': 1, 'score_date': date(2018, 1, 1) + timedelta(days=day),
+             'score_value': 1.0, 'region': 'e'} for day in range(300)
+        ]
+        with self.app.app_context():
+            with patch.object(DB.session, 'execute', wraps=DB.session.execute) as patched_execute:
+                set_model_scores(rows, 250)
+            for call in patched_execute.call_args_list:
+                self.assertLessEqual(len(call[0][0].compile(DB.engine).params), 999)
+            self.assertEqual(patched_execute.call_count, 3)
+            self.assertEqual(ModelScore.query.count(), 300)
+
+    def test_keep_partial_progress(self):
+        """
+        Scenario: Keep the model scores computed before a failure
+        Given a writer with two buffered model scores
+        When the run fails
+        Then the two model scores are persisted and the error is raised
+        """
+        with self.app.app_context():
+            with self.assertRaises(RuntimeError):
+                with ModelScoreWriter() as writer:
+                    writer.add(1, date(2018, 1, 1), 1.0, (0.5, 1.5))
+                    writer.add(1, date(2018, 1, 2), 2.0, (1.5, 2.5))
+                    raise RuntimeError('Calculation failed')
+            scores = ModelScore.query.order_by(ModelScore.score_date).all()
+            self.assertListEqual(
+                [(s.score_value, s.confidence_interval_upper) for s in scores],
+                [(1.0, 1.5), (2.0, 2.5)]
+            )
+
+    def tearDown(self):
+        DB.drop_all(app=self.app)
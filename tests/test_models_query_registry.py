@@ -9,11 +9,12 @@ from app import create_app, DB
 from app.models import FluModelGoogleTerm, GoogleDate, GoogleScore, GoogleTerm, ModelScore, FluModel, \
     ModelFunction, DefaultFluModel, RateThresholdSet
 from app.models_query_registry import get_existing_google_dates, get_google_terms_for_model_id, \
-    set_google_date_for_model_id, set_google_scores_for_term, get_existing_model_dates, set_model_score, \
+    set_google_date_for_model_id, set_google_dates_for_model_id, set_google_scores_for_term, set_google_scores_for_terms, \
+    get_existing_model_dates, set_model_score, get_last_google_dates, \
     get_model_function, get_google_terms_and_scores, get_google_terms_and_averages, \
     get_flu_model_for_id, get_public_flu_models, get_default_flu_model, get_default_flu_model_half_year, \
     get_rate_thresholds, get_flu_models_for_ids, get_all_flu_models, get_flu_model_for_model_region_and_dates, \
-    get_flu_model_for_model_id_and_dates
+    get_flu_model_for_model_id_and_dates, get_flu_model_series_for_regions
 
 
 class ModelsTestCase(TestCase):
@@ -95,6 +96,18 @@ class ModelsTestCase(TestCase):
             result = get_existing_google_dates(1, date(2018, 1, 1), date(2018, 1, 2))
             self.assertListEqual(result, [(date(2018, 1, 2),)])
 
+    def test_get_last_google_dates(self):
+        """
+        Scenario: Get the last Google date of several models at once
+        Given model 1 with Google dates '2018-01-02' and '2018-01-05'
+        And model 2 without Google dates
+        Then only model 1 is returned, with '2018-01-05'
+        """
+        with self.app.app_context():
+            for day in (2, 5):
+                GoogleDate(1, date(2018, 1, day)).save()
+            self.assertDictEqual(get_last_google_dates([1, 2]), {1: date(2018, 1, 5)})
+
     def test_get_google_terms_for_model(self):
         """
         Scenario: Get list of Google terms for which a particular flu model was created against
@@ -134,6 +147,30 @@ class ModelsTestCase(TestCase):
             result = GoogleScore.query.filter_by(term_id=1, score_date=date(2018, 1, 1)).count()
             self.assertEqual(result, 1)
 
+    def test_set_google_scores_for_terms(self):
+        """
+        Scenario: Persist the scores of several terms in chunks
+        Given a score already stored for Term 1 on 2018-01-01
+        Then the stored score is left untouched and the other scores are added
+        """
+        with self.app.app_context():
+            for i in [1, 2]:
+                google_term = GoogleTerm()
+                google_term.id = i
+                google_term.term = 'Term %d' % i
+                google_term.save()
+            GoogleScore(1, date(2018, 1, 1), 0.5).save()
+            set_google_scores_for_terms([
+                ('Term 1', [(date(2018, 1, 1), 0.1), (date(2018, 1, 2), 0.2)]),
+                ('Term 2', [(date(2018, 1, 1), 0.3)])
+            ], chunk_size=2)
+            result = DB.session.query(
+                GoogleScore.term_id, GoogleScore.score_date, GoogleScore.score_value
+            ).order_by(GoogleScore.term_id, GoogleScore.score_date).all()
+            self.assertListEqual(result, [
+                (1, date(2018, 1, 1), 0.5), (1, date(2018, 1, 2), 0.2), (2, date(2018, 1, 1), 0.3)
+            ])
+
     def test_set_google_date_for_model(self):
         """
         Scenario: Persist the date of retrieval of a complete set of scores from Google
@@ -174,6 +211,32 @@ class ModelsTestCase(TestCase):
             with self.assertRaises(ValueError):
                 set_google_date_for_model_id(1, date(2018, 1, 1))
 
+    def test_set_google_dates_for_model(self):
+        """
+        Scenario: Persist in one go the dates with a complete set of scores from Google
+        Given a flu model with a set of three terms
+        And a score for each of them on '2018-01-01'
+        And a score for only the first term on '2018-01-02'
+        Then '2018-01-01' is persisted on the database
+        And '2018-01-02' is returned with the two terms missing a score
+        """
+        with self.app.app_context():
+            for i in range(3):
+                flu_model_google_term = FluModelGoogleTerm()
+                flu_model_google_term.flu_model_id = 1
+                flu_model_google_term.google_term_id = i
+                flu_model_google_term.save()
+                google_term = GoogleTerm()
+                google_term.id = i
+                google_term.term = 'Term %d' % i
+                google_term.save()
+                GoogleScore(i, date(2018, 1, 1), 0.5 + i).save()
+            GoogleScore(0, date(2018, 1, 2), 0.5).save()
+            result = set_google_dates_for_model_id(1, [date(2018, 1, 1), date(2018, 1, 2)])
+            self.assertDictEqual(result, {date(2018, 1, 2): ['Term 1', 'Term 2']})
+            saved = DB.session.query(GoogleDate.score_date).filter_by(flu_model_id=1).all()
+            self.assertListEqual(saved, [(date(2018, 1, 1),)])
+
     def test_get_existing_model_dates(self):
         """
         Scenario: Get list of existing dates from ModelScore
@@ -461,5 +524,46 @@ class ModelsTestCase(TestCase):
             self.assertEqual(result[0]['id'], 1)
             self.assertEqual(len(result[1]), 30)
 
+    def test_get_flu_model_series_for_regions(self):
+        """
+        Scenario: Get model data and scores for model_id and dates in several regions
+        Given scores for regions 'e' and 'w' on the same dates
+        Then each region has its own series and metadata
+        And regions without scores are left out
+        """
+        with self.app.app_context():
+            flu_model = FluModel()
+            flu_model.id = 1
+            flu_model.is_displayed = True
+            flu_model.is_public = True
+            flu_model.calculation_parameters = ''
+            flu_model.name = 'Model 1'
+            flu_model.source_type = 'google'
+            flu_model.save()
+            model_function = ModelFunction()
+            model_function.flu_model_id = 1
+            model_function.has_confidence_interval = False
+            model_function.function_name = 'Function name'
+            model_function.average_window_size = 7
+            model_function.save()
+            for region, value in (('e', 1.0), ('w', 2.0)):
+                for i in range(1, 11):
+                    model_score = ModelScore()
+                    model_score.flu_model_id = 1
+                    model_score.score_date = date(2018, 1, i)
+                    model_score.score_value = value
+                    model_score.region = region
+                    model_score.save()
+            result = get_flu_model_series_for_regions(
+                1, date(2018, 1, 2), date(2018, 1, 5), ['e', 'w', 's']
+            )
+            self.assertListEqual(list(result.keys()), ['e', 'w'])
+            self.assertEqual(result['e'][0]['average_score'], 1.0)
+            self.assertEqual(result['w'][0]['average_score'], 2.0)
+            self.assertEqual(result['w'][0]['start_date'], date(2018, 1, 2))
+            self.assertEqual(len(result['w'][1]), 4)
+            single = get_flu_model_for_model_id_and_dates(1, date(2018, 1, 2), date(2018, 1, 5))
+            self.assertEqual(len(single[1]), 4)
+
     def tearDown(self):
         DB.drop_all(app=self.app)
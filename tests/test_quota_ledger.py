@@ -0,0 +1,61 @@
+"""
+ Tests the ledger of the quota used on Google API
+"""
+
+from datetime import date
+from unittest import TestCase
+
+from app import create_app, DB
+from app.models import GoogleApiUsage
+from scheduler.quota_ledger import QuotaLedger
+
+
+class QuotaLedgerTestCase(TestCase):
+    """ Test case for module scheduler.quota_ledger """
+
+    def setUp(self):
+        self.app = create_app(config_name='testing')
+        DB.create_all(app=self.app)
+
+    def test_record_and_flush(self):
+        """
+        Scenario: Persist the usage of an API key
+        Given a ledger allowing 5 calls and 100 lines a day
+        When 3 calls of 20 lines are recorded and flushed twice
+        Then the day has 6 calls and 120 lines persisted
+        And the usage survives a new ledger for the same key
+        """
+        today = date(2018, 1, 1)
+        with self.app.app_context():
+            ledger = QuotaLedger('APIKEY', 5, 100, today=lambda: today)
+            for _ in range(2):
+                for _ in range(3):
+                    ledger.record(1, 20)
+                ledger.flush()
+            usage = GoogleApiUsage.query.one()
+            self.assertEqual((usage.usage_date, usage.calls, usage.lines), (today, 6, 120))
+            self.assertNotIn('APIKEY', usage.key_id)
+            restarted = QuotaLedger('APIKEY', 10, 200, today=lambda: today)
+            self.assertTrue(restarted.has_quota(4, 80))
+            self.assertFalse(restarted.has_quota(5, 20))
+            self.assertFalse(restarted.has_quota(1, 81))
+            self.assertTrue(QuotaLedger('OTHERKEY', 10, 200, today=lambda: today).has_quota(10, 200))
+
+    def test_mark_exhausted(self):
+        """
+        Scenario: Stop the runs of the day once the API reported the daily limit
+        Given a ledger without limits
+        When the daily limit is reported by the API
+        Then there is no quota left today, and quota again tomorrow
+        """
+        days = [date(2018, 1, 1)]
+        with self.app.app_context():
+            ledger = QuotaLedger('APIKEY', today=lambda: days[0])
+            self.assertTrue(ledger.has_quota(1000, 10 ** 6))
+            ledger.mark_exhausted()
+            self.assertFalse(ledger.has_quota(1))
+            days[0] = date(2018, 1, 2)
+            self.assertTrue(ledger.has_quota(1))
+
+    def tearDown(self):
+        DB.drop_all(app=self.app)
@@ -0,0 +1,60 @@
+"""
+ Tests the token-bucket limiter of the calls to Google API
+"""
+
+from datetime import date
+from unittest import TestCase
+
+from scheduler.rate_limiter import TokenBucketLimiter
+
+
+class FakeClock:
+    """ Monotonic clock advanced by the calls to sleep """
+
+    def __init__(self):
+        self.now = 0.0
+        self.today = date(2018, 1, 1)
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TokenBucketLimiterTestCase(TestCase):
+    """ Test case for module scheduler.rate_limiter """
+
+    def test_acquire_per_second(self):
+        """
+        Scenario: Pace the calls to the rate per second
+        Given a limiter of 2 calls per second
+        When 6 calls are made at once
+        Then the first 2 go through and the next 4 take 2 seconds
+        """
+        clock = FakeClock()
+        limiter = TokenBucketLimiter(2, clock=lambda: clock.now, sleep=clock.sleep)
+        for _ in range(2):
+            limiter.acquire()
+        self.assertEqual(clock.now, 0.0)
+        for _ in range(4):
+            limiter.acquire()
+        self.assertAlmostEqual(clock.now, 2.0)
+
+    def test_acquire_per_day(self):
+        """
+        Scenario: Stop the calls once the daily limit is reached
+        Given a limiter of 2 calls per day
+        When a third call is made on the same day
+        Then a RuntimeError is raised
+        And calls are allowed again the next day
+        """
+        clock = FakeClock()
+        limiter = TokenBucketLimiter(
+            0, 2, clock=lambda: clock.now, sleep=clock.sleep, today=lambda: clock.today
+        )
+        limiter.acquire()
+        limiter.acquire()
+        self.assertEqual(limiter.remaining_today, 0)
+        with self.assertRaises(RuntimeError):
+            limiter.acquire()
+        clock.today = date(2018, 1, 2)
+        limiter.acquire()
+        self.assertEqual(limiter.remaining_today, 1)
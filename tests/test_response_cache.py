@@ -0,0 +1,95 @@
+"""
+ Tests the on-disk cache of Google API responses
+"""
+
+import gzip
+import os
+from datetime import date
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+
+from scheduler.response_cache import ResponseCache
+
+
+class ResponseCacheTestCase(TestCase):
+    """ Test case for module scheduler.response_cache """
+
+    def test_put_and_get(self):
+        """
+        Scenario: Store a response under its request
+        Given a response stored for terms 'a flu' and 'flu season'
+        Then it is found for the same terms in any order
+        And not for another date range
+        And it is written as a gzip file named after its digest
+        """
+        response = {'lines': [{'term': 'a flu', 'points': []}, {'term': 'flu season', 'points': []}]}
+        start, end = date(2018, 1, 1), date(2018, 1, 31)
+        with TemporaryDirectory() as cache_dir:
+            cache = ResponseCache(cache_dir)
+            self.assertIsNone(cache.get(['a flu'], 'GB-ENG', start, end, 'day'))
+            cache.put(['a flu', 'flu season'], 'GB-ENG', start, end, 'day', response)
+            self.assertDictEqual(cache.get(['flu season', 'a flu'], 'GB-ENG', start, end, 'day'), response)
+            self.assertIsNone(cache.get(['a flu', 'flu season'], 'GB-ENG', start, date(2018, 2, 1), 'day'))
+            files = [os.path.join(root, name) for root, _, names in os.walk(cache_dir) for name in names]
+            self.assertEqual(len(files), 1)
+            self.assertTrue(files[0].endswith('.json.gz'))
+            with gzip.open(files[0], 'rb') as cache_file:
+                self.assertIn(b'flu season', cache_file.read())
+
+    def test_entries(self):
+        """
+        Scenario: List the cached requests and responses for replay
+        Given two cached responses
+        Then both are listed with their request
+        """
+        with TemporaryDirectory() as cache_dir:
+            cache = ResponseCache(cache_dir)
+            for day in (1, 2):
+                cache.put(['flu'], 'GB-ENG', date(2018, 1, day), date(2018, 1, day), 'day', {'lines': [day]})
+            entries = sorted(cache.entries(), key=lambda entry: entry[0]['start'])
+            self.assertListEqual([(request['start'], response['lines']) for request, response in entries], [
+                ('2018-01-01', [1]), ('2018-01-02', [2])
+            ])
+            self.assertListEqual(list(ResponseCache(os.path.join(cache_dir, 'missing')).entries()), [])
+
+    def test_recent_response_not_stored(self):
+        """
+        Scenario: Scores of the last days may still be revised by Google
+        Given today is 2018-02-10
+        Then a response ending on 2018-02-07 is not stored
+        And a response ending on 2018-02-06 is stored
+        """
+        with TemporaryDirectory() as cache_dir:
+            cache = ResponseCache(cache_dir, today=lambda: date(2018, 2, 10))
+            start = date(2018, 2, 1)
+            cache.put(['flu'], 'GB-ENG', start, date(2018, 2, 7), 'day', {'lines': []})
+            self.assertIsNone(cache.get(['flu'], 'GB-ENG', start, date(2018, 2, 7), 'day'))
+            cache.put(['flu'], 'GB-ENG', start, date(2018, 2, 6), 'day', {'lines': []})
+            self.assertDictEqual(cache.get(['flu'], 'GB-ENG', start, date(2018, 2, 6), 'day'), {'lines': []})
+
+    def test_unreadable_entry_skipped(self):
+        """
+        Scenario: A corrupted file does not stop the replay of the other responses
+        """
+        with TemporaryDirectory() as cache_dir:
+            cache = ResponseCache(cache_dir)
+            cache.put(['flu'], 'GB-ENG', date(2018, 1, 1), date(2018, 1, 1), 'day', {'lines': [1]})
+            os.makedirs(os.path.join(cache_dir, '00'))
+            with open(os.path.join(cache_dir, '00', '00.json.gz'), 'wb') as corrupted:
+                corrupted.write(b'not gzip')
+            with self.assertLogs(level='WARNING'):
+                entries = list(cache.entries())
+            self.assertListEqual([response for _, response in entries], [{'lines': [1]}])
+
+    def test_failed_write_removes_temporary_file(self):
+        """
+        Scenario: A response that cannot be written leaves no temporary file behind
+        """
+        with TemporaryDirectory() as cache_dir:
+            cache = ResponseCache(cache_dir)
+            with patch('scheduler.response_cache.os.replace', side_effect=OSError('disk full')):
+                with self.assertRaises(OSError):
+                    cache.put(['flu'], 'GB-ENG', date(2018, 1, 1), date(2018, 1, 1), 'day', {})
+            files = [name for _, _, names in os.walk(cache_dir) for name in names]
+            self.assertListEqual(files, [])
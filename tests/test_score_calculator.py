@@ -4,13 +4,16 @@
 
 from datetime import date, timedelta
 from os import environ
+from tempfile import TemporaryDirectory
 from unittest import TestCase
 from unittest.mock import patch, DEFAULT, Mock
 
 from app import create_app, DB
-from app.models import FluModelGoogleTerm, GoogleDate, GoogleTerm, ModelFunction, ModelScore
+from app.models import FluModelGoogleTerm, GoogleBatchCheckpoint, GoogleDate, GoogleScore, GoogleTerm, \
+    ModelFunction, ModelScore
 from scheduler import score_calculator
 from scheduler.google_api_client import GoogleApiClient
+from scheduler.response_cache import ResponseCache
 
 
 class ScoreCalculatorTestCase(TestCase):
@@ -164,6 +167,17 @@ class ScoreCalculatorTestCase(TestCase):
             score_calculator.runsched([1, 2], self.app)
             self.assertEqual(patched_run.call_count, 2)
 
+    def test_runsched_publish_snapshots(self):
+        """
+        Scenario: Test runsched function publishes the snapshots after each model when
+        SNAPSHOT_DIR is set
+        """
+        self.app.config['SNAPSHOT_DIR'] = '/tmp/snapshots'
+        with patch('scheduler.score_calculator._run_sched_for_model_no_set_dates'), \
+                patch('scheduler.score_calculator.publish_snapshots') as patched_publish:
+            score_calculator.runsched([1, 2], self.app)
+            self.assertEqual(patched_publish.call_count, 2)
+
     def test_runsched_date_assert_trigger(self):
         """
         Test runsched function to trigger an assertion error when number of days since
@@ -228,7 +242,7 @@ class ScoreCalculatorTestCase(TestCase):
             with patch('scheduler.score_calculator.get_google_batch') as patched_call:
                 patched_call.return_value = []
                 score_calculator.runsched([1], self.app)
-                patched_call.assert_called_with(1, [(end_date, end_date)])
+                patched_call.assert_called_with(1, [(last_date, end_date)])
 
     @patch('scheduler.score_calculator.GoogleApiClient')
     @patch('scheduler.score_calculator.set_and_verify_google_dates')
@@ -279,5 +293,118 @@ class ScoreCalculatorTestCase(TestCase):
                 score_calculator.runsched([1], self.app)
                 patched_run.assert_called_with(1)
 
+    @patch('scheduler.score_calculator.GoogleApiClient')
+    @patch.multiple(
+        'scheduler.score_calculator',
+        get_google_batch=DEFAULT,
+        set_google_scores=DEFAULT,
+        set_and_verify_google_dates=DEFAULT,
+        get_dates_missing_model_score=DEFAULT
+    )
+    def test_run_resumes_from_checkpoints(self, mock_client, **mock_dict):
+        """
+        Scenario: Resume an interrupted run after the last batch persisted
+        Given two batches of terms for the same dates
+        When the second batch fails on the first run
+        Then the second run only fetches the second batch
+        And the checkpoints are removed once the dates are verified
+        """
+        day = date(2018, 1, 1)
+        mock_dict['get_google_batch'].return_value = [(['a'], day, day), (['b'], day, day)]
+        mock_dict['get_dates_missing_model_score'].return_value = []
+        failing = {'b'}
+        fetch = mock_client.return_value.fetch_google_scores
+        fetch.side_effect = lambda terms, start, end: \
+            [] if terms[0] in failing else [{'term': terms[0], 'points': []}]
+        with self.app.app_context():
+            with self.assertRaises(RuntimeError), self.assertLogs(level='ERROR'):
+                score_calculator.run(1, day, day)
+            self.assertEqual(GoogleBatchCheckpoint.query.count(), 1)
+            failing.clear()
+            fetch.reset_mock()
+            score_calculator.run(1, day, day)
+            fetch.assert_called_once_with(['b'], day, day)
+            self.assertEqual(mock_dict['set_and_verify_google_dates'].call_count, 1)
+            self.assertEqual(GoogleBatchCheckpoint.query.count(), 0)
+
+    @patch('scheduler.score_calculator.GoogleApiClient')
+    @patch('scheduler.score_calculator.get_dates_missing_model_score')
+    def test_runsched_shared_terms(self, mock_missing_model_dates, mock_client):
+        """
+        Scenario: Fetch the terms shared by the scheduled models once
+        Given model 1 with 'Term 1' and model 2 with 'Term 1' and 'Term 2'
+        And both with a last Google date of date.today() - timedelta(days=5)
+        Then Google API is called once for both terms
+        And the Google date is verified for both models from the stored scores
+        """
+        last_date = date.today() - timedelta(days=5)
+        end_date = date.today() - timedelta(days=4)
+        mock_missing_model_dates.return_value = []
+        fetch = mock_client.return_value.fetch_google_scores
+        fetch.side_effect = lambda terms, start, end: [
+            {'term': term, 'points': [
+                {'date': day.strftime('%b %d %Y'), 'value': 1.0} for day in (start, end)
+            ]} for term in terms
+        ]
+        with self.app.app_context():
+            for idx in (1, 2):
+                GoogleDate(idx, last_date).save()
+                GoogleTerm(id=idx, term='Term %d' % idx).save()
+            for model_id, term_id in ((1, 1), (2, 1), (2, 2)):
+                flu_model_google_term = FluModelGoogleTerm()
+                flu_model_google_term.flu_model_id = model_id
+                flu_model_google_term.google_term_id = term_id
+                flu_model_google_term.save()
+            score_calculator.runsched([1, 2], self.app)
+            fetch.assert_called_once_with(['Term 1', 'Term 2'], last_date, end_date)
+            for model_id in (1, 2):
+                self.assertEqual(score_calculator.get_last_google_date(model_id), end_date)
+
+    @patch('scheduler.score_calculator._fetch_google_requests')
+    def test_prefetch_skips_model_without_google_dates(self, mock_fetch):
+        """
+        Scenario: A model without Google dates is left to its own run by the shared retrieval
+        Given model 1 with a last Google date of date.today() - timedelta(days=5)
+        And model 2 without Google dates
+        Then the shared retrieval only plans the requests of model 1
+        """
+        with self.app.app_context():
+            GoogleDate(1, date.today() - timedelta(days=5)).save()
+            score_calculator._prefetch_shared_google_scores([1, 2])
+        self.assertEqual(mock_fetch.call_count, 1)
+
+    @patch('scheduler.score_calculator._run_sched_for_model_no_set_dates')
+    @patch('scheduler.score_calculator._prefetch_shared_google_scores')
+    def test_runsched_shared_terms_failure(self, mock_prefetch, mock_run_model):
+        """
+        Scenario: The models fetch their own scores when the shared retrieval fails
+        """
+        mock_prefetch.side_effect = RuntimeError('Google API quota exhausted, retry tomorrow')
+        with self.assertLogs(level='WARNING'):
+            score_calculator.runsched([1, 2], self.app)
+        self.assertEqual(mock_run_model.call_count, 2)
+        mock_prefetch.side_effect = KeyError('bug')
+        with self.assertRaises(KeyError):
+            score_calculator.runsched([1, 2], self.app)
+
+    def test_replay_google_responses(self):
+        """
+        Scenario: Store the scores of cached Google API responses without calling the API
+        Given 3 cached responses with a point each for 'Term 1'
+        When they are replayed in batches of 2 responses
+        Then the 3 scores are stored
+        """
+        with self.app.app_context(), TemporaryDirectory() as cache_dir:
+            GoogleTerm(id=1, term='Term 1').save()
+            cache = ResponseCache(cache_dir)
+            for day in range(1, 4):
+                score_date = date(2018, 1, day)
+                cache.put(['Term 1'], 'GB-ENG', score_date, score_date, 'day', {'lines': [
+                    {'term': 'Term 1', 'points': [{'date': score_date.strftime('%b %d %Y'), 'value': day}]}
+                ]})
+            self.assertEqual(score_calculator.replay_google_responses(cache, batch_size=2), 3)
+            scores = GoogleScore.query.order_by(GoogleScore.score_date).all()
+            self.assertListEqual([s.score_value for s in scores], [1.0, 2.0, 3.0])
+
     def tearDown(self):
         DB.drop_all(app=self.app)
@@ -4,7 +4,7 @@
 
 from datetime import date
 from unittest import TestCase
-from unittest.mock import call, patch, Mock
+from unittest.mock import patch, Mock
 
 from app import create_app, DB
 from app.models import FluModelGoogleTerm, GoogleDate, GoogleScore, GoogleTerm, ModelScore
@@ -58,6 +58,7 @@ class ScoreQueryRegistryTestCase(TestCase):
         And a list of 31 terms for such FluModel id
         When querying for a list of missing date ranges
         Then the generator returns items grouped by term batch and then date range
+        And the terms are spread evenly over the two batches
         """
         with self.app.app_context():
             terms_expected = []
@@ -77,7 +78,7 @@ class ScoreQueryRegistryTestCase(TestCase):
                 (date(2018, 1, 11), date(2018, 1, 15))
             ]
             result = list(get_google_batch(1, missing_dates))
-            terms_grouped = (terms_expected[0:30], terms_expected[30:31])
+            terms_grouped = (terms_expected[0:16], terms_expected[16:31])
             counter = 0
             for terms_grouped_item in terms_grouped:
                 for missing_dates_tuple in missing_dates:
@@ -116,8 +117,8 @@ class ScoreQueryRegistryTestCase(TestCase):
         """
         Scenario: Persist a batch of Google score data
         Given a list of data points containing data for two terms
-        Then function app.models_query_registry#set_google_scores_for_term_id is
-        called twice
+        Then function app.models_query_registry#set_google_scores_for_terms is
+        called once with the points of both terms
         """
         data_points = [
             {
@@ -151,20 +152,18 @@ class ScoreQueryRegistryTestCase(TestCase):
             ('a flu', [(date(2018, 7, 1), 60.587), (date(2018, 7, 2), 83.017)]),
             ('flu season', [(date(2018, 7, 1), 0.0), (date(2018, 7, 2), 15.144)])
         ]
-        with patch('scheduler.score_query_registry.set_google_scores_for_term') as patched_f:
+        with patch('scheduler.score_query_registry.set_google_scores_for_terms') as patched_f:
             patched_f.return_value = None
             set_google_scores(data_points)
-            self.assertEqual(patched_f.call_count, 2)
-            calls = [call(expected[0][0], expected[0][1]), call(expected[1][0], expected[1][1])]
-            patched_f.assert_has_calls(calls)
+            patched_f.assert_called_once_with(expected)
 
     def test_set_google_scores_except(self):
         """
         Scenario: Persist a batch of Google score data
         Given a list of data points containing data for three terms with one data points containing a date to be
         filtered out
-        Then function app.models_query_registry#set_google_scores_for_term_id is
-        called twice
+        Then function app.models_query_registry#set_google_scores_for_terms is
+        called once with the points of both terms
         """
         data_points = [
             {
@@ -206,12 +205,10 @@ class ScoreQueryRegistryTestCase(TestCase):
             ('a flu', [(date(2018, 7, 1), 60.587), (date(2018, 7, 2), 83.017)]),
             ('flu season', [(date(2018, 7, 1), 0.0), (date(2018, 7, 2), 15.144)])
         ]
-        with patch('scheduler.score_query_registry.set_google_scores_for_term') as patched_f:
+        with patch('scheduler.score_query_registry.set_google_scores_for_terms') as patched_f:
             patched_f.return_value = None
             set_google_scores_except(data_points, date(2018, 6, 30))
-            self.assertEqual(patched_f.call_count, 2)
-            calls = [call(expected[0][0], expected[0][1]), call(expected[1][0], expected[1][1])]
-            patched_f.assert_has_calls(calls)
+            patched_f.assert_called_once_with(expected)
 
     def test_get_days_missing_model(self):
         """
@@ -0,0 +1,142 @@
+"""
+ Tests the immutable series of model scores
+"""
+
+from datetime import date
+from unittest import TestCase
+
+import numpy as np
+
+from app.models import ModelScore
+from app.score_series import ScoreMatrix, ScoreSeries
+
+
+class ScoreSeriesTestCase(TestCase):
+    """ Test case for module app.score_series """
+
+    @staticmethod
+    def build_series(days, with_interval=True):
+        return ScoreSeries.from_rows(
+            (
+                date(2018, 6, d),
+                1.23 / d,
+                0.81 if with_interval else None,
+                1.65 if with_interval else None
+            ) for d in days
+        )
+
+    def test_from_model_scores(self):
+        """
+        Scenario: Build a series from ModelScore entities
+        Given scores in ascending date order
+        Then the series keeps the points newest first
+        And the ModelScore entities are left untouched
+        """
+        model_scores = []
+        for day in (1, 2):
+            model_score = ModelScore()
+            model_score.score_date = date(2018, 6, day)
+            model_score.score_value = float(day)
+            model_scores.append(model_score)
+        result = list(ScoreSeries.from_model_scores(model_scores))
+        self.assertListEqual([p.score_date for p in result], [date(2018, 6, 2), date(2018, 6, 1)])
+        self.assertIsNone(result[0].confidence_interval_lower)
+        self.assertEqual(model_scores[0].score_value, 1.0)
+
+    def test_read_only(self):
+        """
+        Scenario: Arrays held by the series cannot be modified
+        """
+        series = self.build_series(range(1, 5))
+        with self.assertRaises(ValueError):
+            series.values[0] = 0.0
+
+    def test_smoothed(self):
+        """
+        Scenario: Smooth a series over a 3 day window
+        Then each point is the average of itself and its neighbours
+        And the original series is unchanged
+        """
+        series = self.build_series(range(1, 30))
+        result = series.smoothed(3).clipped(date(2018, 6, 1), date(2018, 6, 5))
+        self.assertListEqual(
+            [round(p.score_value, 6) for p in result],
+            [0.252833, 0.321167, 0.444167, 0.751667, 0.922500]
+        )
+        self.assertEqual(result.lower[0], 0.81)
+        self.assertEqual(series.values[-1], 1.23)
+
+    def test_smoothed_gap(self):
+        """
+        Scenario: Smooth a series with a missing date
+        Then the window only averages the dates present
+        """
+        series = self.build_series((1, 3), with_interval=False)
+        result = list(series.smoothed(3))
+        self.assertListEqual([p.score_value for p in result], [1.23 / 3, 1.23])
+        self.assertEqual(result[0].confidence_interval_lower, 0.0)
+
+    def test_weekly(self):
+        """
+        Scenario: Select the Sundays of June 2018
+        """
+        result = self.build_series(range(1, 30)).weekly()
+        self.assertListEqual(
+            [p.score_date.day for p in result], [24, 17, 10, 3]
+        )
+
+    def test_near(self):
+        """
+        Scenario: Keep the points within one day of June 10th and June 20th 2018
+        """
+        result = self.build_series(range(1, 30)).near([date(2018, 6, 20), date(2018, 6, 10)], 1)
+        self.assertListEqual([p.score_date.day for p in result], [21, 20, 19, 11, 10, 9])
+        self.assertEqual(len(self.build_series(range(1, 30)).near([])), 0)
+
+    def test_downsampled(self):
+        """
+        Scenario: Downsample 1,000 daily points to 100, keeping the ends and the peak with
+        its confidence interval
+        """
+        values = np.sin(np.arange(1000) / 50.0)
+        values[500] = 5.0
+        series = ScoreSeries(
+            np.arange(1000).astype('datetime64[D]'), values, values - 1, values + 1
+        )
+        result = series.downsampled(100)
+        self.assertEqual(len(result), 100)
+        self.assertEqual(result.dates[0], series.dates[0])
+        self.assertEqual(result.dates[-1], series.dates[-1])
+        self.assertIn(5.0, result.values)
+        np.testing.assert_allclose(result.upper - result.values, np.ones(100))
+        self.assertIs(series.downsampled(1000), series)
+
+    def test_empty(self):
+        """
+        Scenario: Derived series of an empty series are empty
+        """
+        series = ScoreSeries.from_model_scores(None)
+        self.assertEqual(len(series.smoothed(3).weekly()), 0)
+
+
+class ScoreMatrixTestCase(TestCase):
+    """ Test case for app.score_series.ScoreMatrix """
+
+    def test_from_rows(self):
+        """
+        Scenario: Align the scores of two models with a gap on a single date axis
+        """
+        matrix = ScoreMatrix.from_rows([2, 1], [
+            (1, date(2018, 6, 3), 1.3),
+            (2, date(2018, 6, 3), 2.3),
+            (1, date(2018, 6, 2), 1.2),
+            (2, date(2018, 6, 1), 2.1),
+            (3, date(2018, 5, 1), 3.0)
+        ])
+        self.assertListEqual(
+            [str(d) for d in matrix.dates], ['2018-06-03', '2018-06-02', '2018-06-01']
+        )
+        self.assertListEqual(matrix.rows(), [[2.3, None, 2.1], [1.3, 1.2, None]])
+        self.assertListEqual([p.score_value for p in matrix.series(1)], [1.3, 1.2])
+        self.assertListEqual([str(d) for d in matrix.weekly().dates], ['2018-06-03'])
+        self.assertEqual(len(ScoreMatrix.from_rows([1], [])), 0)
@@ -0,0 +1,97 @@
+"""
+ Tests the static snapshots of the default view and the model catalogue
+"""
+
+import gzip
+import json
+import os
+from datetime import date, datetime
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from app import create_app, DB
+from app.models import FluModel, ModelScore, ModelFunction, DefaultFluModel
+from app.snapshot import publish_snapshots, get_fresh_snapshot, discard_snapshots, MANIFEST_NAME
+
+
+class SnapshotTestCase(TestCase):
+    """ Test case for module app.snapshot """
+
+    def setUp(self):
+        self.snapshot_dir = TemporaryDirectory()
+        self.app = create_app(config_name='testing')
+        self.app.config['SNAPSHOT_DIR'] = self.snapshot_dir.name
+        self.client = self.app.test_client
+        DB.create_all(app=self.app)
+        flumodel = FluModel()
+        flumodel.name = 'Test Model'
+        flumodel.is_public = True
+        flumodel.is_displayed = True
+        flumodel.source_type = 'google'
+        flumodel.calculation_parameters = 'matlab_model,1'
+        datapoint = ModelScore()
+        datapoint.region = 'e'
+        datapoint.score_date = date(2018, 6, 29)
+        datapoint.calculation_timestamp = datetime.now()
+        datapoint.score_value = 1.23
+        flumodel.model_scores = [datapoint]
+        model_function = ModelFunction()
+        model_function.function_name = 'matlab_model'
+        model_function.average_window_size = 1
+        model_function.flu_model_id = 1
+        model_function.has_confidence_interval = False
+        default_model = DefaultFluModel()
+        default_model.flu_model_id = 1
+        with self.app.app_context():
+            flumodel.save()
+            model_function.save()
+            DB.session.add(default_model)
+            DB.session.commit()
+
+    def test_publish_snapshots(self):
+        """
+        Scenario: Publish the default view and the model catalogue
+        Then each snapshot has a versioned file and a gzip variant listed in the manifest
+        """
+        with self.app.app_context():
+            manifest = publish_snapshots(self.app)
+        self.assertListEqual(sorted(manifest), ['models', 'root'])
+        root_path = os.path.join(self.snapshot_dir.name, manifest['root']['filename'])
+        with open(root_path, 'rb') as root_file:
+            content = root_file.read()
+        with open(root_path + '.gz', 'rb') as gzip_file:
+            self.assertEqual(gzip.decompress(gzip_file.read()), content)
+        self.assertEqual(json.loads(content.decode('utf-8')), self.client().get('/').get_json())
+        with open(os.path.join(self.snapshot_dir.name, MANIFEST_NAME)) as manifest_file:
+            self.assertDictEqual(json.load(manifest_file), manifest)
+
+    def test_serve_snapshot(self):
+        """
+        Scenario: The root route serves a fresh snapshot without reading the database
+        """
+        with self.app.app_context():
+            manifest = publish_snapshots(self.app)
+            DB.drop_all(app=self.app)
+        response = self.client().get('/', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.data))['model_list'][0]['id'], 1)
+        response = self.client().get(
+            '/', headers={'If-None-Match': '"%s"' % manifest['root']['version']}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_stale_snapshot(self):
+        """
+        Scenario: Snapshots older than the maximum age or discarded are not served
+        """
+        with self.app.app_context():
+            publish_snapshots(self.app)
+        self.assertIsNotNone(get_fresh_snapshot(self.snapshot_dir.name, 'root', 60))
+        self.assertIsNone(get_fresh_snapshot(self.snapshot_dir.name, 'root', -1))
+        discard_snapshots(self.snapshot_dir.name)
+        self.assertIsNone(get_fresh_snapshot(self.snapshot_dir.name, 'root', 60))
+
+    def tearDown(self):
+        DB.drop_all(app=self.app)
+        self.snapshot_dir.cleanup()
@@ -0,0 +1,69 @@
+"""
+ Tests the statistics computed over model scores
+"""
+
+from datetime import date, timedelta
+from unittest import TestCase
+
+from app.score_series import ScoreSeries
+from app.statistics_registry import build_series_statistics, classify_threshold_bands, \
+    build_band_segments
+
+
+class StatisticsRegistryTestCase(TestCase):
+    """ Test case for module app.statistics_registry """
+
+    rate_thresholds = {
+        'low_value': {'label': 'Low epidemic rate', 'value': 10.0},
+        'high_value': {'label': 'High epidemic rate', 'value': 20.0}
+    }
+
+    def test_build_series_statistics(self):
+        """
+        Scenario: Summarise 14 days of scores across two flu seasons
+        """
+        start = date(2018, 8, 25)
+        values = [5.0] * 7 + [10.0] * 3 + [30.0, 10.0, 30.0, 10.0]
+        series = ScoreSeries.from_rows(
+            (start + timedelta(days=idx), value, None, None) for idx, value in enumerate(values)
+        )
+        result = build_series_statistics(series, self.rate_thresholds)
+        self.assertEqual(result['points'], 14)
+        self.assertEqual(result['peak_value'], 30.0)
+        self.assertEqual(result['peak_date'], '2018-09-04')
+        self.assertAlmostEqual(result['week_over_week_growth'], 110 / 35 - 1)
+        self.assertDictEqual(result['days_above_threshold'], {'low_value': 7, 'high_value': 2})
+        self.assertListEqual(result['seasonal_totals'], [
+            {'season': '2017/18', 'total': 35.0, 'days': 7},
+            {'season': '2018/19', 'total': 110.0, 'days': 7}
+        ])
+
+    def test_short_series(self):
+        """
+        Scenario: Growth is not available without a previous week, and an empty series has
+        no statistics
+        """
+        series = ScoreSeries.from_rows([(date(2018, 1, 1), 1.0, None, None)])
+        self.assertIsNone(build_series_statistics(series, {})['week_over_week_growth'])
+        self.assertDictEqual(build_series_statistics(ScoreSeries.from_rows([]), {}), {})
+
+    def test_threshold_bands(self):
+        """
+        Scenario: Classify scores against the rate thresholds and encode the runs of bands
+        """
+        rate_thresholds = {
+            key: {'label': key, 'value': value} for key, value in
+            zip(['low_value', 'medium_value', 'high_value', 'very_high_value'], [1, 2, 3, 4])
+        }
+        series = ScoreSeries.from_rows(
+            (date(2018, 6, day), value, None, None)
+            for day, value in enumerate([0.5, 0.7, 1.0, 2.5, 4.0], start=1)
+        )
+        bands = classify_threshold_bands(series, rate_thresholds)
+        self.assertListEqual(bands, ['very_high', 'medium', 'low', 'baseline', 'baseline'])
+        segments = build_band_segments(series, bands)
+        self.assertEqual(len(segments), 4)
+        self.assertDictEqual(segments[-1], {
+            'band': 'baseline', 'start_date': '2018-06-01', 'end_date': '2018-06-02', 'points': 2
+        })
+        self.assertListEqual(classify_threshold_bands(series, {}), [None] * 5)
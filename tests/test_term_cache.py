@@ -0,0 +1,54 @@
+"""
+ Tests the dictionary of Google terms kept by the process
+"""
+
+from unittest import TestCase
+from unittest.mock import patch
+
+from app import create_app, DB
+from app.models import GoogleTerm
+from app.models_query_registry import ensure_google_terms, get_google_term_ids
+
+
+class TermCacheTestCase(TestCase):
+    """ Test case for module app.term_cache """
+
+    def setUp(self):
+        self.app = create_app(config_name='testing')
+        DB.create_all(app=self.app)
+
+    def test_get_ids(self):
+        """
+        Scenario: Look up the terms in the database once
+        Given two GoogleTerm entries
+        When their ids are requested twice
+        Then the database is queried only the first time
+        And a term inserted afterwards is found too
+        """
+        with self.app.app_context():
+            for idx in range(2):
+                GoogleTerm(id=idx + 1, term='Term %d' % idx).save()
+            term_cache = self.app.extensions['term_cache']
+            with patch('app.term_cache.get_google_term_ids', wraps=get_google_term_ids) as patched:
+                self.assertDictEqual(term_cache.get_ids(['Term 0', 'Term 1']), {'Term 0': 1, 'Term 1': 2})
+                self.assertDictEqual(term_cache.get_ids(['Term 1']), {'Term 1': 2})
+                self.assertEqual(patched.call_count, 1)
+            GoogleTerm(id=3, term='Term 2').save()
+            self.assertDictEqual(term_cache.get_ids(['Term 2', 'Unknown']), {'Term 2': 3})
+
+    def test_ensure_google_terms(self):
+        """
+        Scenario: Register the terms of a new model
+        Given a GoogleTerm entry for 'Term 0'
+        When 'Term 0' and 'Term 1' are ensured to exist
+        Then 'Term 1' is inserted and both ids are returned
+        """
+        with self.app.app_context():
+            GoogleTerm(id=1, term='Term 0').save()
+            result = ensure_google_terms(['Term 0', 'Term 1'])
+            self.assertEqual(result['Term 0'], 1)
+            self.assertEqual(GoogleTerm.query.filter_by(term='Term 1').one().id, result['Term 1'])
+            self.assertEqual(len(self.app.extensions['term_cache']), 2)
+
+    def tearDown(self):
+        DB.drop_all(app=self.app)
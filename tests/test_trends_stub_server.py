@@ -0,0 +1,90 @@
+"""
+ Tests the local stand-in for Google Health Trends API
+"""
+
+from datetime import date, timedelta
+from os import environ
+from unittest import TestCase
+from unittest.mock import patch
+
+from app import create_app, DB
+from app.models import FluModelGoogleTerm, GoogleDate, GoogleScore, GoogleTerm
+from scheduler import score_calculator
+from scheduler.google_api_client import GoogleApiClient
+from scheduler.rate_limiter import TokenBucketLimiter
+from scheduler.trends_stub_server import LocalTrendsServer, build_points
+
+
+class LocalTrendsServerTestCase(TestCase):
+    """ Test case for module scheduler.trends_stub_server """
+
+    def setUp(self):
+        self.server = LocalTrendsServer().start()
+        self.env = patch.dict(environ, {'GOOGLE_DISCOVERY_URL': self.server.discovery_url})
+        self.env.start()
+
+    def test_fetch_google_scores(self):
+        """
+        Scenario: Fetch synthetic scores through GoogleApiClient
+        Given the stand-in server
+        When the scores of two terms are fetched twice for 3 days
+        Then each term has 3 points between 0 and 100, the same on both calls
+        """
+        client = GoogleApiClient(TokenBucketLimiter(0))
+        start, end = date(2018, 1, 1), date(2018, 1, 3)
+        lines = client.fetch_google_scores(['a flu', 'flu season'], start, end)
+        self.assertListEqual([line['term'] for line in lines], ['a flu', 'flu season'])
+        self.assertListEqual(lines[0]['points'], build_points('a flu', start, end))
+        self.assertEqual(len(lines[1]['points']), 3)
+        self.assertTrue(all(0 <= p['value'] < 100 for p in lines[1]['points']))
+        self.assertListEqual(client.fetch_google_scores(['a flu', 'flu season'], start, end), lines)
+        self.assertEqual(self.server.calls, 2)
+
+    def test_injected_errors(self):
+        """
+        Scenario: Reproduce the errors of Google API
+        Given the stand-in server failing every request, then allowing one call a day
+        Then the client logs the server error, then is blocked after the first call
+        """
+        client = GoogleApiClient(TokenBucketLimiter(0), max_retries=0)
+        day = date(2018, 1, 1)
+        self.server.error_rate = 1.0
+        with self.assertLogs(level='WARNING'):
+            self.assertListEqual(client.fetch_google_scores(['flu'], day, day), [])
+        self.server.error_rate = 0.0
+        self.server.calls_per_day = 2
+        self.assertEqual(len(client.fetch_google_scores(['flu'], day, day)), 1)
+        with self.assertRaisesRegex(RuntimeError, '^dailyLimitExceeded'):
+            client.fetch_google_scores(['flu'], day, day)
+
+    def test_run_end_to_end(self):
+        """
+        Scenario: Ingest the scores of a model from the stand-in server
+        Given a model with 2 terms and no Google scores
+        When the model is run for 5 days
+        Then the scores of both terms and the Google dates are stored
+        """
+        app = create_app(config_name='testing')
+        app.config['GOOGLE_API_CALLS_PER_SECOND'] = 0
+        DB.create_all(app=app)
+        start = date.today() - timedelta(days=9)
+        end = start + timedelta(days=4)
+        try:
+            with app.app_context():
+                for idx in (1, 2):
+                    GoogleTerm(id=idx, term='Term %d' % idx).save()
+                    flu_model_google_term = FluModelGoogleTerm()
+                    flu_model_google_term.flu_model_id = 1
+                    flu_model_google_term.google_term_id = idx
+                    flu_model_google_term.save()
+                with patch('scheduler.score_calculator.get_dates_missing_model_score') as patched:
+                    patched.return_value = []
+                    score_calculator.run(1, start, end)
+                self.assertEqual(GoogleScore.query.count(), 10)
+                self.assertEqual(GoogleDate.query.filter_by(flu_model_id=1).count(), 5)
+        finally:
+            DB.drop_all(app=app)
+
+    def tearDown(self):
+        self.env.stop()
+        self.server.stop()
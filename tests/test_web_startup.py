@@ -0,0 +1,67 @@
+"""
+ Guards the cold start of a web worker: import time, memory and modules loaded by run.py
+"""
+
+import json
+import subprocess
+import sys
+from os import environ, path
+from unittest import TestCase
+
+ROOT_DIR = path.dirname(path.dirname(path.abspath(__file__)))
+
+# Budgets for importing run.py in a fresh interpreter, generous enough for a CI runner
+MAX_IMPORT_SECONDS = 3.0
+MAX_RSS_MB = 150
+
+SCHEDULER_ONLY_MODULES = [
+    'scheduler',
+    'apscheduler.schedulers',
+    'googleapiclient.discovery',
+    'oct2py',
+    'stompest.sync'
+]
+
+_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import run
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'seconds': elapsed,
+    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'modules': sorted(sys.modules)
+}))
+"""
+
+
+class WebStartupTestCase(TestCase):
+    """ Test case for the start up of the web entry point (run.py) """
+
+    @classmethod
+    def setUpClass(cls):
+        env = dict(environ, APP_CONFIG='testing')
+        output = subprocess.run(
+            [sys.executable, '-c', _PROBE],
+            cwd=ROOT_DIR, env=env, check=True, stdout=subprocess.PIPE
+        ).stdout
+        cls.probe = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+    def test_no_scheduler_modules(self):
+        """
+        Scenario: Importing run.py does not load any of the scheduler dependencies
+        """
+        loaded = [m for m in SCHEDULER_ONLY_MODULES if m in self.probe['modules']]
+        self.assertListEqual(loaded, [])
+
+    def test_import_time(self):
+        """
+        Scenario: Importing run.py stays within the cold start time budget
+        """
+        self.assertLess(self.probe['seconds'], MAX_IMPORT_SECONDS)
+
+    def test_memory(self):
+        """
+        Scenario: Importing run.py stays within the resident memory budget
+        """
+        self.assertLess(self.probe['max_rss_kb'] / 1024, MAX_RSS_MB)